@@ -1,18 +1,47 @@
-from flask import Flask, request, render_template, send_file, send_from_directory
+from flask import (
+    Flask, Request, Response, request, render_template, send_file, send_from_directory, jsonify, stream_with_context
+)
+from werkzeug.exceptions import RequestEntityTooLarge
+import atexit
+import hashlib
+import hmac
+import json
 import os
-import pandas as pd
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 import zipfile
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from urllib.parse import quote
 from functions import (
     generate_cover_pdf,
-    parse_via_pdf,
+    parse_via_pdf_cached,
     fill_template,
     fill_conflict_docs_for_one,
-    merge_custom_pages_by_index,
-    paginate_pdf,
-    is_name_match,
-    STRENGTH_DATA
+    assemble_workbook,
+    build_team_page,
+    match_names,
+    run_batch_jobs,
+    score_conflict_csv,
+    workbook_output_path,
+    start_libreoffice_pool,
+    stop_libreoffice_pool,
+    metric_labels,
+    metrics_snapshot,
+    combine_metric_snapshots,
+    profile_run,
+    render_prometheus_metrics,
+    CohortManifest,
+    COVER_TEMPLATE_DOCX,
+    STRENGTH_DATA,
+    TEAM_PAGE_FILENAME,
+    TEAM_TEMPLATE,
+    WORKBOOK_TEMPLATES
 )
 
 app = Flask(__name__)
@@ -22,10 +51,147 @@ BIG_TEMPLATE_PDF = os.path.join("resources", "bigTemplate.pdf")
 CONFLICT_TEMPLATE_DOCX = os.path.join("resources", "Conflict_Template.docx")
 SWEET_SPOT_TEMPLATE_DOCX = os.path.join("resources", "Sweet_Spot_Template.docx")
 
-# Define output folder
-OUTPUT_FOLDER = "output"
+# Define output folder; every folder below lives inside it.
+OUTPUT_FOLDER = os.environ.get("WORKBOOK_OUTPUT_DIR") or "output"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Every /generate request gets its own workspace folder for its workbooks
+# and batch archive. They stay until the janitor evicts the workspace,
+# WORKSPACE_TTL_SECONDS after it was last used, or sooner (least recently
+# used first) when finished workspaces exceed WORKSPACE_QUOTA_BYTES.
+# Uploads are not kept in the workspace; see the blob store below.
+WORKSPACES_FOLDER = os.path.join(OUTPUT_FOLDER, "workspaces")
+os.makedirs(WORKSPACES_FOLDER, exist_ok=True)
+WORKSPACE_TTL_SECONDS = int(os.environ.get("WORKSPACE_TTL_SECONDS", str(24 * 3600)))
+WORKSPACE_QUOTA_BYTES = int(os.environ.get("WORKSPACE_QUOTA_BYTES", str(5 * 1024 ** 3)))
+# Unfinished workspaces this old belong to jobs that died; evict them too.
+WORKSPACE_STALE_SECONDS = int(os.environ.get("WORKSPACE_STALE_SECONDS", str(24 * 3600)))
+JANITOR_INTERVAL_SECONDS = int(os.environ.get("JANITOR_INTERVAL_SECONDS", "60"))
+WORKSPACE_FINISHED_MARKER = ".finished"
+
+# Uploaded files are streamed straight into a content-addressed blob store
+# while the request body is parsed: each file is hashed as it is written and
+# then stored as <BLOBS_FOLDER>/<sha256[:2]>/<sha256>. A file that is
+# already there is not stored again, so the same VIA PDF uploaded twice
+# costs one copy on disk and, through parse_via_pdf_cached(), one parse.
+# Blobs unused for WORKSPACE_TTL_SECONDS are evicted by the janitor.
+BLOBS_FOLDER = os.path.join(OUTPUT_FOLDER, "blobs")
+BLOBS_TMP_FOLDER = os.path.join(BLOBS_FOLDER, "tmp")
+os.makedirs(BLOBS_TMP_FOLDER, exist_ok=True)
+UPLOAD_MAX_FILE_BYTES = int(os.environ.get("UPLOAD_MAX_FILE_BYTES", str(50 * 1024 ** 2)))
+# Maximum VIA PDFs per request; the conflict CSV is allowed on top.
+UPLOAD_MAX_FILES = int(os.environ.get("UPLOAD_MAX_FILES", "1000"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Requests whose Content-Length is over this are refused before any parsing.
+app.config["MAX_CONTENT_LENGTH"] = int(os.environ.get("UPLOAD_MAX_REQUEST_BYTES", str(2 * 1024 ** 3)))
+
+
+class BlobUploadStream:
+    """
+    The file object Werkzeug writes one uploaded file into. Bytes go to a
+    temporary file in the blob store and into a SHA-256 digest; the size
+    limit is checked on every write, so an oversized upload is refused as
+    soon as it crosses UPLOAD_MAX_FILE_BYTES.
+    """
+
+    def __init__(self):
+        self.file = tempfile.NamedTemporaryFile(dir=BLOBS_TMP_FOLDER, delete=False)
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.blob_path = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > UPLOAD_MAX_FILE_BYTES:
+            self.close()
+            raise RequestEntityTooLarge(f"Each file must be at most {UPLOAD_MAX_FILE_BYTES} bytes.")
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def readline(self, *args):
+        return self.file.readline(*args)
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def commit(self):
+        """
+        Moves the upload into the blob store, or drops it if a blob with the
+        same content exists, and returns (blob path, sha256).
+        """
+        sha256 = self.digest.hexdigest()
+        if self.blob_path is None:
+            self.file.close()
+            blob_path = os.path.join(BLOBS_FOLDER, sha256[:2], sha256)
+            if os.path.exists(blob_path):
+                os.remove(self.file.name)
+                os.utime(blob_path)
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(self.file.name, blob_path)
+            self.blob_path = blob_path
+        return self.blob_path, sha256
+
+    def close(self):
+        # Uploads that were never committed (e.g. a refused request) are dropped.
+        if self.blob_path is None and not self.file.closed:
+            self.file.close()
+            try:
+                os.remove(self.file.name)
+            except FileNotFoundError:
+                pass
+
+
+class BlobUploadRequest(Request):
+    """
+    Request that streams every uploaded file into a BlobUploadStream and
+    refuses the request once it carries more than UPLOAD_MAX_FILES VIA PDFs
+    plus the conflict CSV. Werkzeug does not pass the field name here, so
+    the CSV is allowed for as one extra file.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if not hasattr(self, "upload_streams"):
+            self.upload_streams = []
+        if len(self.upload_streams) >= UPLOAD_MAX_FILES + 1:
+            raise RequestEntityTooLarge(
+                f"At most {UPLOAD_MAX_FILES} VIA PDFs and a conflict CSV can be uploaded at once."
+            )
+        if content_length and content_length > UPLOAD_MAX_FILE_BYTES:
+            raise RequestEntityTooLarge(f"Each file must be at most {UPLOAD_MAX_FILE_BYTES} bytes.")
+        stream = BlobUploadStream()
+        self.upload_streams.append(stream)
+        return stream
+
+    def close(self):
+        # Also drops the temporary files of a request refused mid-upload.
+        super().close()
+        for stream in getattr(self, "upload_streams", []):
+            stream.close()
+
+
+app.request_class = BlobUploadRequest
+
+
+def store_upload(file_storage):
+    """
+    Returns (blob path, sha256) for an uploaded file.
+    """
+    stream = file_storage.stream
+    if isinstance(stream, BlobUploadStream):
+        return stream.commit()
+    # Not parsed by BlobUploadRequest (e.g. a FileStorage built by hand).
+    blob = BlobUploadStream()
+    for chunk in iter(lambda: stream.read(UPLOAD_CHUNK_BYTES), b""):
+        blob.write(chunk)
+    return blob.commit()
+
 @app.route("/", methods=["GET"])
 def index():
     return render_template("upload.html")
@@ -36,192 +202,681 @@ def generate():
     template_version = request.form.get("template")  # Read the selected template version
 
     # Define the template file based on the selected version
-    if template_version == "Open":
-        template_pdf = os.path.join("resources", "bigTemplate.pdf")
-    elif template_version == "Team":
-        template_pdf = os.path.join("resources", "teamTemplate.pdf")
-    elif template_version == "Tiny":
-        template_pdf = os.path.join("resources", "tinyTemplate.pdf")
-    else:
+    template_pdf = WORKBOOK_TEMPLATES.get(template_version)
+    if template_pdf is None:
         return "Invalid template selected."
 
     if mode == "individual":
+        workspace_id = create_workspace()
+
         # 1. Get form inputs
         participant_name = request.form.get("participantName").strip()
         term = request.form.get("date").strip()
         cohort = request.form.get("cohort").strip()
         
-        # 2. Save uploaded files
-        via_file = request.files["viaFile"]
-        conflict_csv_file = request.files["conflictCSV"]
-
-        via_filepath = os.path.join(OUTPUT_FOLDER, f"{participant_name}_via.pdf")
-        conflict_csv_path = os.path.join(OUTPUT_FOLDER, f"{participant_name}_conflict.csv")
-
-        via_file.save(via_filepath)
-        conflict_csv_file.save(conflict_csv_path)
-
-        # 3. Generate Cover Page
-        cover_pdf = generate_cover_pdf(participant_name, term, cohort, OUTPUT_FOLDER)
-
-        # 4. Parse VIA Survey
-        parsed_name, results = parse_via_pdf(via_filepath)
-        final_name = participant_name
-
-        # 5. Fill Sweet Spot Template
-        sweet_output_docx = os.path.join(OUTPUT_FOLDER, f"{final_name}_SweetSpot.docx")
-        sweet_pdf = fill_template(
-            results,
-            STRENGTH_DATA,
-            final_name,
-            SWEET_SPOT_TEMPLATE_DOCX,
-            sweet_output_docx
-        )
-
-        # 6. Process Conflict Resolution
-        conflict_pdf = fill_conflict_docs_for_one(
-            conflict_csv_path,
-            CONFLICT_TEMPLATE_DOCX,
-            OUTPUT_FOLDER,
-            final_name
-        )
+        # 2. Store uploaded files
+        via_filepath, _ = store_upload(request.files["viaFile"])
+        conflict_csv_path, _ = store_upload(request.files["conflictCSV"])
 
-        # 7. Merge PDFs
-        merged_pdf = os.path.join(OUTPUT_FOLDER, f"{final_name.replace(' ', '_')}_merged.pdf")
-        merge_custom_pages_by_index(
-            template_pdf=template_pdf,  # Use the selected template
-            cover_pdf=cover_pdf,
-            via_pdf=via_filepath,
-            sweet_pdf=sweet_pdf,
-            conflict_pdf=conflict_pdf,
-            output_pdf=merged_pdf
+        job = partial(
+            run_individual, workspace_id, template_pdf, participant_name, term, cohort, via_filepath,
+            conflict_csv_path
         )
 
-        # 8. Paginate the Merged PDF
-        final_workbook_pdf = os.path.join(OUTPUT_FOLDER, f"{final_name.replace(' ', '_')}_workbook.pdf")
-        paginate_pdf(merged_pdf, final_workbook_pdf, start_page_index=3, start_page_number=3)
-
-        # 9. Generate the report for individual mode
-        report_html = generate_individual_report(final_name, final_workbook_pdf)
-        
-        # Render the report HTML directly in the browser
-        return report_html
-
     elif mode == "batch":
-        # Initialize a list to track generated files
-        generated_files = []
+        workspace_id = create_workspace()
 
         # 1. Get form inputs
         term = request.form.get("batchDate").strip()
         cohort = request.form.get("batchCohort").strip()
         
-        # 2. Save uploaded files
-        via_files = request.files.getlist("viaFiles")
-        conflict_csv_file = request.files["conflictCSVBatch"]
-
-        conflict_csv_path = os.path.join(OUTPUT_FOLDER, "batch_conflict.csv")
-        conflict_csv_file.save(conflict_csv_path)
-
-        # 3. Parse the CSV to get participant names
-        df = pd.read_csv(conflict_csv_path)
-        csv_names = set(df["First and Last Name"].str.strip().dropna().unique())
-
-        # 4. Parse the VIA PDFs to get participant names
-        pdf_names = {}
-        for via_file in via_files:
-            via_filepath = os.path.join(OUTPUT_FOLDER, via_file.filename)
-            via_file.save(via_filepath)
-            participant_name, _ = parse_via_pdf(via_filepath)
-            pdf_names[via_file.filename] = participant_name
-
-        # 5. Track mismatches and skipped participants
-        matched_pairs = []
-        missing_pdf = []
-        missing_csv = []
-        name_mismatches = []
-
-        # 6. Match names between CSV and PDFs
-        for csv_name in csv_names:
-            matched = False
-            for pdf_filename, pdf_name in pdf_names.items():
-                if is_name_match(csv_name, pdf_name):
-                    matched_pairs.append((csv_name, pdf_name, pdf_filename))
-                    matched = True
-                    break
-            if not matched:
-                missing_pdf.append(csv_name)
-
-        for pdf_filename, pdf_name in pdf_names.items():
-            matched = False
-            for csv_name in csv_names:
-                if is_name_match(csv_name, pdf_name):
-                    matched = True
-                    break
-            if not matched:
-                missing_csv.append(pdf_name)
-
-        # 7. Generate workbooks for matched pairs
-        for csv_name, pdf_name, pdf_filename in matched_pairs:
-            via_filepath = os.path.join(OUTPUT_FOLDER, pdf_filename)
-            conflict_pdf = fill_conflict_docs_for_one(
-                conflict_csv_path,
-                CONFLICT_TEMPLATE_DOCX,
-                OUTPUT_FOLDER,
-                csv_name
-            )
-            if not conflict_pdf:
-                name_mismatches.append((csv_name, pdf_name))
+        # 2. Store uploaded files; a file uploaded twice is only used once
+        conflict_csv_path, _ = store_upload(request.files["conflictCSVBatch"])
+
+        via_uploads = []
+        seen_hashes = set()
+        seen_filenames = set()
+        for via_file in request.files.getlist("viaFiles"):
+            blob_path, sha256 = store_upload(via_file)
+            if sha256 in seen_hashes:
                 continue
+            seen_hashes.add(sha256)
+            via_filename = os.path.basename(via_file.filename or "") or "upload.pdf"
+            if via_filename in seen_filenames:
+                via_filename = f"{sha256[:8]}_{via_filename}"
+            seen_filenames.add(via_filename)
+            via_uploads.append({"filename": via_filename, "path": blob_path, "sha256": sha256})
 
-            # Generate cover page
-            cover_pdf = generate_cover_pdf(csv_name, term, cohort, OUTPUT_FOLDER)
+        incremental = request.form.get("incremental", "").lower() in ("1", "true", "yes", "on")
+        job = partial(
+            run_batch, workspace_id, template_pdf, term, cohort, via_uploads, conflict_csv_path,
+            incremental=incremental
+        )
+    else:
+        return "Invalid mode selected."
 
-            # Parse VIA PDF
-            parsed_name, results = parse_via_pdf(via_filepath)
+    job = workspace_job(labelled_job(job, template=template_version, mode=mode), workspace_id)
 
-            # Fill Sweet Spot Template
-            sweet_output_docx = os.path.join(OUTPUT_FOLDER, f"{csv_name.replace(' ', '_')}_SweetSpot.docx")
-            sweet_pdf = fill_template(
-                results,
-                STRENGTH_DATA,
-                csv_name,
-                SWEET_SPOT_TEMPLATE_DOCX,
-                sweet_output_docx
-            )
+    headers = {}
+    if is_profiled_request():
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{mode}_{uuid.uuid4().hex[:8]}"
+        job = profiled_job(job, profile_id)
+        headers["X-Profile-Id"] = profile_id
 
-            # Merge PDFs
-            merged_pdf = os.path.join(OUTPUT_FOLDER, f"{csv_name.replace(' ', '_')}_merged.pdf")
-            merge_custom_pages_by_index(
-                template_pdf=template_pdf,  # Use the selected template
-                cover_pdf=cover_pdf,
-                via_pdf=via_filepath,
-                sweet_pdf=sweet_pdf,
-                conflict_pdf=conflict_pdf,
-                output_pdf=merged_pdf
-            )
+    if is_async_request(mode):
+        job_id = submit_job(mode, job, job_id=workspace_id)
+        return render_job_page(job_id), headers
 
-            # Paginate the Merged PDF
-            final_workbook_pdf = os.path.join(OUTPUT_FOLDER, f"{csv_name.replace(' ', '_')}_workbook.pdf")
-            paginate_pdf(merged_pdf, final_workbook_pdf, start_page_index=3, start_page_number=3)
+    # Render the report HTML directly in the browser
+    return job(), headers
 
-            # Add the generated workbook to the list
-            generated_files.append(final_workbook_pdf)
 
-        # 8. Generate the report for batch mode
-        report_html = generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, generated_files)
-        
-        # Render the report HTML directly in the browser
-        return report_html
-    else:
-        return "Invalid mode selected."
+def is_workspace_id(workspace_id):
+    return re.fullmatch(r"[0-9a-f]{32}", workspace_id) is not None
+
+
+def workspace_path(workspace_id, *parts):
+    return os.path.join(WORKSPACES_FOLDER, workspace_id, *parts)
+
+
+def create_workspace():
+    """
+    Creates an empty workspace and returns its id.
+    """
+    workspace_id = uuid.uuid4().hex
+    os.makedirs(workspace_path(workspace_id))
+    return workspace_id
+
+
+def finish_workspace(workspace_id):
+    """
+    Marks the workspace finished, which starts its TTL.
+    """
+    touch_workspace(workspace_id, create=True)
+
+
+def touch_workspace(workspace_id, create=False):
+    # The finished marker's mtime is the workspace's last use, for TTL and LRU.
+    marker = workspace_path(workspace_id, WORKSPACE_FINISHED_MARKER)
+    try:
+        if create:
+            open(marker, "a").close()
+        os.utime(marker)
+    except FileNotFoundError:
+        pass
+
+
+def remove_workspace(workspace_id):
+    shutil.rmtree(workspace_path(workspace_id), ignore_errors=True)
+    for path in (job_state_path(workspace_id), job_report_path(workspace_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def folder_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def evict_workspaces(now=None):
+    """
+    Removes finished workspaces unused for WORKSPACE_TTL_SECONDS and
+    unfinished ones older than WORKSPACE_STALE_SECONDS, then the least
+    recently used finished workspaces until the rest fit in
+    WORKSPACE_QUOTA_BYTES.
+
+    Returns:
+      {"evicted": number of workspaces removed, "bytes_freed": their size}
+    """
+    now = time.time() if now is None else now
+    expired = []
+    finished = []
+    for entry in os.scandir(WORKSPACES_FOLDER):
+        if not entry.is_dir() or not is_workspace_id(entry.name):
+            continue
+        try:
+            last_used = os.path.getmtime(os.path.join(entry.path, WORKSPACE_FINISHED_MARKER))
+        except FileNotFoundError:
+            # Still running, unless its job died long ago.
+            if now - entry.stat().st_mtime > WORKSPACE_STALE_SECONDS:
+                expired.append((entry.name, folder_size(entry.path)))
+            continue
+        size = folder_size(entry.path)
+        if now - last_used > WORKSPACE_TTL_SECONDS:
+            expired.append((entry.name, size))
+        else:
+            finished.append((last_used, entry.name, size))
+
+    total = sum(size for _, _, size in finished)
+    for _, workspace_id, size in sorted(finished):
+        if total <= WORKSPACE_QUOTA_BYTES:
+            break
+        expired.append((workspace_id, size))
+        total -= size
+
+    for workspace_id, _ in expired:
+        remove_workspace(workspace_id)
+    return {"evicted": len(expired), "bytes_freed": sum(size for _, size in expired)}
+
+
+def evict_blobs(now=None):
+    """
+    Removes uploaded blobs unused for WORKSPACE_TTL_SECONDS, and temporary
+    upload files older than WORKSPACE_STALE_SECONDS.
+
+    Returns:
+      {"evicted": number of files removed, "bytes_freed": their size}
+    """
+    now = time.time() if now is None else now
+    evicted = 0
+    bytes_freed = 0
+    for root, _, files in os.walk(BLOBS_FOLDER):
+        max_age = WORKSPACE_STALE_SECONDS if root == BLOBS_TMP_FOLDER else WORKSPACE_TTL_SECONDS
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > max_age:
+                    os.remove(path)
+                    evicted += 1
+                    bytes_freed += stat.st_size
+            except FileNotFoundError:
+                pass
+    return {"evicted": evicted, "bytes_freed": bytes_freed}
+
+
+def run_janitor():
+    while True:
+        time.sleep(JANITOR_INTERVAL_SECONDS)
+        for kind, evict in (("workspaces", evict_workspaces), ("uploaded files", evict_blobs)):
+            try:
+                evicted = evict()
+            except Exception as e:
+                print(f"Janitor failed to evict {kind}: {e}")
+                continue
+            if evicted["evicted"]:
+                print(f"Janitor evicted {evicted['evicted']} {kind} ({evicted['bytes_freed']} bytes)")
+
+
+def workspace_job(job, workspace_id):
+    """
+    Wraps a /generate job so its workspace is finished when the job ends,
+    whether it succeeded or not.
+    """
+    def run(progress=None):
+        try:
+            return job(progress=progress)
+        finally:
+            finish_workspace(workspace_id)
+    return run
+
+
+def labelled_job(job, **labels):
+    """
+    Wraps a /generate job so the metrics it records carry the request's
+    template and mode labels, and are saved for /metrics when it ends.
+    """
+    def run(progress=None):
+        try:
+            with metric_labels(**labels):
+                return job(progress=progress)
+        finally:
+            save_worker_metrics()
+    return run
+
+
+# On-demand profiling. When WORKBOOK_PROFILE_TOKEN is set, a /generate request
+# carrying that token in an X-Profile header or a "profile" query field is run
+# under the profiler, and its artifacts are saved in PROFILES_FOLDER.
+PROFILE_TOKEN = os.environ.get("WORKBOOK_PROFILE_TOKEN")
+PROFILES_FOLDER = os.environ.get("WORKBOOK_PROFILE_DIR") or os.path.join(OUTPUT_FOLDER, "profiles")
+
+
+def is_profiled_request():
+    if not PROFILE_TOKEN:
+        return False
+    token = request.headers.get("X-Profile") or request.args.get("profile")
+    return token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def profiled_job(job, profile_id):
+    """
+    Wraps a /generate job so it runs under profile_run(); see functions.py
+    for the files written.
+    """
+    def run(progress=None):
+        with profile_run(os.path.join(PROFILES_FOLDER, profile_id)):
+            return job(progress=progress)
+    return run
+
+
+def run_individual(workspace_id, template_pdf, participant_name, term, cohort, via_filepath, conflict_csv_path,
+                   progress=None):
+    """
+    Builds one participant's workbook from the saved uploads into the
+    workspace and returns the report HTML.
+    """
+    # 3. Generate Cover Page (in memory; only the final workbook is written to disk)
+    cover_pdf = generate_cover_pdf(participant_name, term, cohort, in_memory=True)
+
+    # 4. Parse VIA Survey
+    parsed_name, results = parse_via_pdf_cached(via_filepath)
+    final_name = participant_name
+
+    # 5. Fill Sweet Spot Template
+    sweet_pdf = fill_template(
+        results,
+        STRENGTH_DATA,
+        final_name,
+        SWEET_SPOT_TEMPLATE_DOCX,
+        in_memory=True
+    )
+
+    # 6. Process Conflict Resolution
+    conflict_pdf = fill_conflict_docs_for_one(
+        conflict_csv_path,
+        CONFLICT_TEMPLATE_DOCX,
+        None,
+        final_name,
+        in_memory=True
+    )
+
+    # 7. Merge and paginate the workbook in one pass
+    final_workbook_pdf = workbook_output_path(workspace_path(workspace_id), final_name)
+    assemble_workbook(
+        template_pdf=template_pdf,  # Use the selected template
+        cover_pdf=cover_pdf,
+        via_pdf=via_filepath,
+        sweet_pdf=sweet_pdf,
+        conflict_pdf=conflict_pdf,
+        output_pdf=final_workbook_pdf
+    )
+    if progress:
+        progress(1, 1, [final_workbook_pdf])
+
+    # 8. Generate the report for individual mode
+    return generate_individual_report(final_name, final_workbook_pdf)
+
+
+def run_batch(workspace_id, template_pdf, term, cohort, via_uploads, conflict_csv_path, progress=None,
+              incremental=False):
+    """
+    Matches the uploaded VIA PDFs against the conflict CSV, builds every
+    matched participant's workbook into the workspace and returns the batch
+    report HTML.
+
+    via_uploads is a list of {"filename", "path", "sha256"} dicts, one per
+    distinct uploaded PDF, as built by /generate from the blob store.
+
+    progress, if given, is called as progress(done, total, generated_files).
+    With incremental=True, workbooks whose inputs are unchanged since the
+    cohort's last run (per its CohortManifest) are reused instead of rebuilt.
+    With the Team template, the cohort's team page is appended to every
+    workbook and also offered on its own.
+    """
+    # Initialize a list to track generated files
+    generated_files = []
+    output_folder = workspace_path(workspace_id)
+    uploads = {upload["filename"]: upload for upload in via_uploads}
+
+    # 3. Score the CSV once to get participant names and conflict contexts
+    conflict_contexts = score_conflict_csv(conflict_csv_path)
+    csv_names = set(conflict_contexts)
+
+    # 4. Parse the VIA PDFs to get participant names
+    pdf_names = {}
+    for via_filename, upload in uploads.items():
+        participant_name, _ = parse_via_pdf_cached(upload["path"], sha256=upload["sha256"])
+        pdf_names[via_filename] = participant_name
+
+    # 5. Match names between CSV and PDFs (one-to-one)
+    matched_pairs, missing_pdf, missing_csv = match_names(csv_names, pdf_names)
+
+    # 6. Track participants whose workbook could not be built
+    name_mismatches = []
+
+    # 7. Generate workbooks for matched pairs across the worker pool
+    participants = [
+        {
+            "name": csv_name,
+            "pdf_name": pdf_name,
+            "via_pdf": uploads[pdf_filename]["path"],
+            "via_sha256": uploads[pdf_filename]["sha256"],
+            "conflict_context": conflict_contexts[csv_name],
+        }
+        for csv_name, pdf_name, pdf_filename in matched_pairs
+    ]
+    team_pdf = team_page_path = None
+    if template_pdf == WORKBOOK_TEMPLATES[TEAM_TEMPLATE]:
+        _, team_pdf = build_team_page(participants, term, cohort)
+        team_page_path = os.path.join(output_folder, TEAM_PAGE_FILENAME)
+        with open(team_page_path, "wb") as f:
+            f.write(team_pdf)
+    reused = []
+    if incremental:
+        manifest = CohortManifest(
+            OUTPUT_FOLDER, term, cohort, template_pdf,
+            [COVER_TEMPLATE_DOCX, SWEET_SPOT_TEMPLATE_DOCX, CONFLICT_TEMPLATE_DOCX], conflict_csv_path,
+            team_pdf=team_pdf
+        )
+        participants, reused = manifest.split(participants)
+    reused_files = [manifest.reuse(participant, output_folder) for participant in reused]
+
+    # Finished workbooks are appended to the cohort archive as they arrive,
+    # so "Download All" is ready as soon as the last one is done.
+    archive = CohortArchive(workspace_id)
+    archive.add(reused_files + ([team_page_path] if team_page_path else []))
+
+    def on_progress(done, total, workbooks):
+        archive.add(workbooks)
+        if progress:
+            progress(done, total, workbooks)
+
+    results = run_batch_jobs(
+        participants,
+        template_pdf=template_pdf,  # Use the selected template
+        term=term,
+        cohort=cohort,
+        csv_path=conflict_csv_path,
+        conflict_template_path=CONFLICT_TEMPLATE_DOCX,
+        sweet_template_path=SWEET_SPOT_TEMPLATE_DOCX,
+        output_folder=output_folder,
+        progress=on_progress,
+        team_pdf=team_pdf,
+    )
+    bytes_saved = {}
+    for result in results:
+        if result["workbook"]:
+            generated_files.append(result["workbook"])
+            bytes_saved[result["workbook"]] = result.get("bytes_saved")
+        else:
+            name_mismatches.append((result["name"], result["pdf_name"]))
+    archive.add(generated_files)
+    archive.finish()
+    if incremental:
+        manifest.record(participants, results)
+        manifest.save()
+
+    # 8. Generate the report for batch mode
+    return generate_report(
+        matched_pairs, missing_pdf, missing_csv, name_mismatches, reused_files + generated_files, archive.url,
+        bytes_saved, reused=[participant["name"] for participant in reused] if incremental else None,
+        team_page=team_page_path
+    )
+
+
+# Background job queue for /generate. Job state lives in JSON files under
+# JOBS_FOLDER so that any gunicorn worker can answer a status poll.
+JOBS_FOLDER = os.path.join(OUTPUT_FOLDER, "jobs")
+os.makedirs(JOBS_FOLDER, exist_ok=True)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+# Requests that do not say whether to run in the background: "batch" runs batch
+# mode as a job, since its run time grows with the cohort and no worker timeout
+# can cover it, "1" runs every request as a job and "0" none.
+ASYNC_JOBS_DEFAULT = os.environ.get("GENERATE_ASYNC", "batch")
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="generate-job")
+job_state_lock = threading.Lock()
+
+# Per-worker background services are started after the fork, never at import,
+# so the app can be preloaded by the gunicorn master.
+_worker_services_pid = None
+_worker_services_lock = threading.Lock()
+
+
+def start_worker_services():
+    """
+    Starts this worker's services: warm LibreOffice instances for the life of
+    the worker (when LIBREOFFICE_POOL_SIZE > 0) and the workspace janitor
+    (unless JANITOR_INTERVAL_SECONDS=0). The metrics files of workers that
+    have exited are retired first. Does nothing if the services are already
+    running in this process.
+    """
+    global _worker_services_pid
+    with _worker_services_lock:
+        if _worker_services_pid == os.getpid():
+            return
+        _worker_services_pid = os.getpid()
+    retire_worker_metrics()
+    start_libreoffice_pool()
+    atexit.register(stop_libreoffice_pool)
+    if JANITOR_INTERVAL_SECONDS > 0:
+        threading.Thread(target=run_janitor, name="workspace-janitor", daemon=True).start()
+
+
+@app.before_request
+def ensure_worker_services():
+    # gunicorn starts them in post_fork; this covers other servers.
+    start_worker_services()
+
+
+def is_async_request(mode):
+    """
+    A /generate request runs as a background job when it asks for one with
+    an "async" form or query field. Without one, batch requests do and
+    individual requests do not, unless GENERATE_ASYNC says otherwise.
+    """
+    flag = request.values.get("async")
+    if flag is None:
+        return ASYNC_JOBS_DEFAULT == "1" or (ASYNC_JOBS_DEFAULT == "batch" and mode == "batch")
+    return flag.lower() in ("1", "true", "yes", "on")
+
+
+def job_state_path(job_id):
+    return os.path.join(JOBS_FOLDER, f"{job_id}.json")
+
+
+def job_report_path(job_id):
+    return os.path.join(JOBS_FOLDER, f"{job_id}.html")
+
+
+def load_job(job_id):
+    try:
+        with open(job_state_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def update_job(job_id, **fields):
+    with job_state_lock:
+        state = load_job(job_id) or {"id": job_id}
+        state.update(fields)
+        # Write then rename so pollers never read a half-written file.
+        tmp_path = job_state_path(job_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, job_state_path(job_id))
+    return state
+
+
+def submit_job(mode, job, job_id=None):
+    """
+    Queues job (a callable returning report HTML) on the background workers
+    and returns its id (job_id if given, else a new one).
+    """
+    job_id = job_id or uuid.uuid4().hex
+    update_job(
+        job_id,
+        mode=mode,
+        pid=os.getpid(),
+        status="queued",
+        done=0,
+        total=None,
+        files=[],
+        error=None,
+        created=time.time(),
+        finished=None,
+    )
+    job_executor.submit(run_job, job_id, job)
+    return job_id
+
+
+def process_alive(pid):
+    """
+    True unless the process with this pid is known to have exited.
+    """
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def job_owner_alive(job):
+    """
+    True unless the process that queued the job (the only one that can run
+    it) is known to have exited.
+    """
+    pid = job.get("pid")
+    return pid is None or process_alive(pid)
+
+
+def fail_orphaned_job(job):
+    """
+    Marks a queued or running job failed when its worker process is gone
+    (e.g. restarted by gunicorn), so it does not stay unfinished forever.
+    Returns the job's current state.
+    """
+    if job["status"] in ("queued", "running") and not job_owner_alive(job):
+        job = update_job(
+            job["id"],
+            status="failed",
+            error="The worker running this job exited before it finished.",
+            finished=time.time(),
+        )
+    return job
+
+
+def run_job(job_id, job):
+    update_job(job_id, status="running", started=time.time())
+
+    def progress(done, total, generated_files):
+        update_job(
+            job_id,
+            done=done,
+            total=total,
+            files=[os.path.basename(path) for path in generated_files],
+        )
+
+    try:
+        report_html = job(progress=progress)
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        update_job(job_id, status="failed", error=str(e), finished=time.time())
+        return
+
+    with open(job_report_path(job_id), "w") as f:
+        f.write(report_html)
+    update_job(job_id, status="finished", finished=time.time())
+
+
+def render_job_page(job_id):
+    """
+    Returns a small page that polls the job status and shows the report
+    once the job has finished.
+    """
+    status_url = f"/jobs/{job_id}"
+    report_url = f"/jobs/{job_id}/report"
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <title>Workbook Generation Queued</title>
+        <style>
+            body {{ font-family: Arial, sans-serif; }}
+            h1 {{ color: #333; }}
+            .error {{ color: red; }}
+        </style>
+    </head>
+    <body>
+        <h1>Workbook Generation Queued</h1>
+        <p>Job id: <code>{job_id}</code></p>
+        <p id="status">Waiting for a worker...</p>
+        <script>
+            function showError(message) {{
+                const status = document.getElementById("status");
+                status.className = "error";
+                status.textContent = message;
+            }}
+
+            function poll() {{
+                fetch("{status_url}").then(r => {{
+                    if (r.status === 404) {{
+                        throw new Error("This job no longer exists; its files may have been cleaned up.");
+                    }}
+                    if (!r.ok) {{
+                        throw new Error(`Could not get the job status (HTTP ${{r.status}}).`);
+                    }}
+                    return r.json();
+                }}).then(job => {{
+                    const status = document.getElementById("status");
+                    if (job.status === "finished") {{
+                        window.location = "{report_url}";
+                    }} else if (job.status === "failed") {{
+                        status.className = "error";
+                        status.textContent = "Generation failed: " + job.error;
+                    }} else {{
+                        status.textContent = job.total
+                            ? `Generated ${{job.done}} of ${{job.total}} workbooks...`
+                            : "Generating workbooks...";
+                        setTimeout(poll, 2000);
+                    }}
+                }}).catch(error => showError(error.message));
+            }}
+            poll();
+        </script>
+    </body>
+    </html>
+    """
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """
+    Returns the state of a queued /generate job as JSON.
+    """
+    job = load_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    job = fail_orphaned_job(job)
+    job["download_links"] = [f"/download_file/{job_id}/{quote(name)}" for name in job.get("files", [])]
+    if job["status"] == "finished":
+        job["report_url"] = f"/jobs/{job_id}/report"
+    return jsonify(job)
+
+
+@app.route("/jobs/<job_id>/report")
+def job_report(job_id):
+    """
+    Returns the report HTML of a finished job.
+    """
+    job = load_job(job_id)
+    if job is None:
+        return "Unknown job.", 404
+    if job["status"] != "finished":
+        return f"Job is {job['status']}.", 409
+    with open(job_report_path(job_id)) as f:
+        return f.read()
 
 
 def generate_individual_report(participant_name, workbook_path):
     """
     Generates an HTML report for individual mode.
     """
-    file_name = os.path.basename(workbook_path)
-    download_link = f"/download_file/{quote(file_name)}"
+    download_link = download_url(workbook_path)
 
     report = f"""
     <!DOCTYPE html>
@@ -251,13 +906,18 @@ def generate_individual_report(participant_name, workbook_path):
     """
     return report
 
-def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, generated_files):
+def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, generated_files,
+                    archive_url=None, bytes_saved=None, reused=None, team_page=None):
     """
     Generates an HTML report summarizing the batch processing results.
     """
-    # Encode file paths for the "Download All" link
-    encoded_files = [quote(file_path) for file_path in generated_files]
-    download_all_link = f"/download_all?files={'&files='.join(encoded_files)}"
+    if archive_url:
+        download_all_link = archive_url
+    else:
+        # Encode file paths for the "Download All" link
+        workspace_id = os.path.basename(os.path.dirname(generated_files[0])) if generated_files else ""
+        encoded_files = [quote(os.path.basename(file_path)) for file_path in generated_files]
+        download_all_link = f"/download_all?workspace={workspace_id}&files={'&files='.join(encoded_files)}"
 
     report = f"""
     <!DOCTYPE html>
@@ -276,6 +936,7 @@ def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, ge
             .warning {{ color: orange; }}
             .error {{ color: red; }}
             .download-all {{ margin-top: 20px; }}
+            .saved {{ color: #777; font-size: 0.9em; }}
             .back-button {{ margin-top: 20px; }}
         </style>
     </head>
@@ -322,6 +983,30 @@ def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, ge
     for csv_name, pdf_name in name_mismatches:
         report += f"<li class='error'>{csv_name} (CSV) vs. {pdf_name} (PDF)</li>"
 
+    if reused is not None:
+        report += """
+            </ul>
+        </div>
+
+        <div class="section">
+            <h2>Reused Workbooks (inputs unchanged)</h2>
+            <ul>
+        """
+        for name in reused:
+            report += f"<li>{name}</li>"
+        report += f"<li class='saved'>{len(reused)} reused, {len(generated_files) - len(reused)} regenerated</li>"
+
+    if team_page:
+        report += """
+            </ul>
+        </div>
+
+        <div class="section">
+            <h2>Team Summary</h2>
+            <ul>
+        """
+        report += f"<li><a href='{download_url(team_page)}'>{os.path.basename(team_page)}</a></li>"
+
     report += f"""
             </ul>
         </div>
@@ -330,9 +1015,12 @@ def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, ge
             <h2>Download Generated Workbooks</h2>
             <ul>
     """
+    bytes_saved = bytes_saved or {}
     for file_path in generated_files:
         file_name = os.path.basename(file_path)
-        report += f"<li><a href='/download_file/{quote(file_name)}'>{file_name}</a></li>"
+        saved = bytes_saved.get(file_path)
+        saved_note = f" <span class='saved'>({saved / 1024:,.0f} KB saved by optimization)</span>" if saved else ""
+        report += f"<li><a href='{download_url(file_path)}'>{file_name}</a>{saved_note}</li>"
 
     report += f"""
             </ul>
@@ -348,41 +1036,264 @@ def generate_report(matched_pairs, missing_pdf, missing_csv, name_mismatches, ge
     """
     return report
 
-@app.route("/download_file/<filename>")
-def download_file(filename):
+# Every gunicorn worker keeps its own metrics in memory and saves them here,
+# so /metrics can report the sum over all workers whichever one answers.
+# Files are named by pid and worker start time. When a worker starts, the
+# files of workers that have exited are folded into RETIRED_METRICS_FILE and
+# deleted, so the summed counters never go down while the folder holds one
+# file per live worker plus one.
+METRICS_FOLDER = os.path.join(OUTPUT_FOLDER, "metrics")
+os.makedirs(METRICS_FOLDER, exist_ok=True)
+RETIRED_METRICS_FILE = os.path.join(METRICS_FOLDER, "retired.json")
+WORKER_METRICS_FILE = re.compile(r"(\d+)-(\d+)\.json")
+_worker_metrics_files = {}
+
+
+def worker_metrics_path():
+    pid = os.getpid()
+    if pid not in _worker_metrics_files:
+        _worker_metrics_files[pid] = os.path.join(METRICS_FOLDER, f"{pid}-{time.time_ns()}.json")
+    return _worker_metrics_files[pid]
+
+
+@contextmanager
+def metrics_folder_lock(exclusive=False):
+    # Scrapes share the lock; retiring files takes it alone, so a scrape
+    # never counts a file both on its own and inside RETIRED_METRICS_FILE.
+    import fcntl
+
+    with open(os.path.join(METRICS_FOLDER, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def _read_metrics_file(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def retire_worker_metrics():
+    """
+    Folds the metrics files of workers that have exited into
+    RETIRED_METRICS_FILE and deletes them. A file is retired when its pid is
+    gone, or when a newer file exists for the same pid (the pid was reused).
+    Returns the number of files retired.
+    """
+    current = worker_metrics_path()
+    with metrics_folder_lock(exclusive=True):
+        files = []
+        newest = {}
+        for entry in os.scandir(METRICS_FOLDER):
+            match = WORKER_METRICS_FILE.fullmatch(entry.name)
+            if match and entry.path != current:
+                pid, started = int(match.group(1)), int(match.group(2))
+                files.append((pid, started, entry.path))
+                newest[pid] = max(newest.get(pid, 0), started)
+        dead = [
+            path for pid, started, path in files
+            if pid == os.getpid() or not process_alive(pid) or started < newest[pid]
+        ]
+        if not dead:
+            return 0
+
+        snapshots = [_read_metrics_file(path) for path in [RETIRED_METRICS_FILE] + dead]
+        tmp_path = RETIRED_METRICS_FILE + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(combine_metric_snapshots([s for s in snapshots if s]), f)
+        os.replace(tmp_path, RETIRED_METRICS_FILE)
+        for path in dead:
+            os.remove(path)
+    return len(dead)
+
+
+def save_worker_metrics():
+    path = worker_metrics_path()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metrics_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+@app.route("/metrics")
+def metrics():
+    """
+    Returns pipeline stage timings and counters for all workers in the
+    Prometheus text format.
+    """
+    save_worker_metrics()
+    with metrics_folder_lock():
+        snapshots = [
+            _read_metrics_file(entry.path) for entry in os.scandir(METRICS_FOLDER) if entry.name.endswith(".json")
+        ]
+    snapshots = [snapshot for snapshot in snapshots if snapshot]
+    return Response(render_prometheus_metrics(snapshots), mimetype="text/plain; version=0.0.4")
+
+
+def download_url(workbook_path):
+    # Workbooks live directly in their workspace folder.
+    workspace_id = os.path.basename(os.path.dirname(workbook_path))
+    return f"/download_file/{workspace_id}/{quote(os.path.basename(workbook_path))}"
+
+
+@app.route("/download_file/<workspace_id>/<filename>")
+def download_file(workspace_id, filename):
     """
     Allows users to download a specific generated workbook.
     """
-    return send_from_directory(OUTPUT_FOLDER, filename, as_attachment=True)
+    if not is_workspace_id(workspace_id):
+        return "Unknown workspace.", 404
+    touch_workspace(workspace_id)
+    return send_from_directory(workspace_path(workspace_id), filename, as_attachment=True)
 
-@app.route("/download_all")
-def download_all():
+# Compression for "Download All". Workbooks are already-compressed PDFs, so by
+# default entries are stored; set ZIP_COMPRESSION_LEVEL (0-9) to deflate them.
+ZIP_COMPRESSION_LEVEL = os.environ.get("ZIP_COMPRESSION_LEVEL")
+ZIP_STREAM_CHUNK = 256 * 1024
+
+
+class ZipStreamSink:
     """
-    Allows users to download all generated workbooks as a ZIP file.
+    Write-only, unseekable target for zipfile that lets the bytes written so
+    far be collected and sent while the archive is still being built.
     """
-    # Get the list of generated files from the request arguments
-    encoded_files = request.args.getlist("files")
-    generated_files = [os.path.join(OUTPUT_FOLDER, os.path.basename(file)) for file in encoded_files]
-
-    # Create a BytesIO object to hold the ZIP file in memory
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file_path in generated_files:
-            if os.path.exists(file_path):
-                file_name = os.path.basename(file_path)
-                zip_file.write(file_path, arcname=file_name)
-            else:
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(file_paths, compression_level=None):
+    """
+    Yields a ZIP archive of file_paths chunk by chunk. Only one read chunk
+    is held in memory at a time, whatever the number or size of the files.
+    """
+    if compression_level is None:
+        compression, compresslevel = zipfile.ZIP_STORED, None
+    else:
+        compression, compresslevel = zipfile.ZIP_DEFLATED, int(compression_level)
+
+    sink = ZipStreamSink()
+    with zipfile.ZipFile(sink, "w", compression=compression, compresslevel=compresslevel) as zip_file:
+        for file_path in file_paths:
+            if not os.path.exists(file_path):
                 print(f"File not found: {file_path}")
+                continue
+            with open(file_path, "rb") as src, zip_file.open(os.path.basename(file_path), "w") as dest:
+                for chunk in iter(lambda: src.read(ZIP_STREAM_CHUNK), b""):
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    # Closing the archive writes the central directory.
+    yield sink.drain()
+
+
+class CohortArchive:
+    """
+    An on-disk ZIP of a batch's workbooks that grows as participants finish,
+    kept in the batch's workspace.
+
+    Entries are appended to workbooks.zip.partial; finish() renames it to
+    workbooks.zip, which is then served as a plain file at a stable URL.
+    """
+
+    def __init__(self, batch_id):
+        self.batch_id = batch_id
+        self.folder = workspace_path(batch_id)
+        self.path = os.path.join(self.folder, "workbooks.zip")
+        self.partial_path = self.path + ".partial"
+        self.added = set()
+        self.lock = threading.Lock()
+        if ZIP_COMPRESSION_LEVEL is None:
+            self.compression, self.compresslevel = zipfile.ZIP_STORED, None
+        else:
+            self.compression, self.compresslevel = zipfile.ZIP_DEFLATED, int(ZIP_COMPRESSION_LEVEL)
 
-    # Move the buffer's pointer to the beginning
-    zip_buffer.seek(0)
+    @property
+    def url(self):
+        return f"/batches/{self.batch_id}/workbooks.zip"
 
-    # Return the ZIP file as a response
+    def add(self, file_paths):
+        with self.lock:
+            new_files = [path for path in file_paths if path not in self.added and os.path.exists(path)]
+            if not new_files:
+                return
+            with zipfile.ZipFile(
+                self.partial_path, "a", compression=self.compression, compresslevel=self.compresslevel
+            ) as zip_file:
+                for file_path in new_files:
+                    zip_file.write(file_path, arcname=os.path.basename(file_path))
+                    self.added.add(file_path)
+
+    def finish(self):
+        with self.lock:
+            if not os.path.exists(self.partial_path):
+                # Nothing was generated; still publish an (empty) archive.
+                zipfile.ZipFile(self.partial_path, "w").close()
+            os.replace(self.partial_path, self.path)
+
+
+@app.route("/batches/<batch_id>/workbooks.zip")
+def download_batch_archive(batch_id):
+    """
+    Serves a batch's pre-built archive. Range and conditional requests are
+    supported, so interrupted downloads can resume.
+    """
+    if not is_workspace_id(batch_id):
+        return "Unknown batch.", 404
+    archive_path = workspace_path(batch_id, "workbooks.zip")
+    if not os.path.exists(archive_path):
+        return "Archive is not ready yet.", 404
+    touch_workspace(batch_id)
     return send_file(
-        zip_buffer,
+        os.path.abspath(archive_path),
         mimetype="application/zip",
         as_attachment=True,
-        download_name="workbooks.zip"
+        download_name="workbooks.zip",
+        conditional=True
+    )
+
+
+@app.route("/download_all")
+def download_all():
+    """
+    Allows users to download all generated workbooks as a ZIP file.
+
+    The archive is streamed to the client as it is written, so memory use
+    does not grow with the size of the cohort.
+    """
+    # Get the workspace and the list of generated files from the request arguments
+    workspace_id = request.args.get("workspace", "")
+    if not is_workspace_id(workspace_id):
+        return "Unknown workspace.", 404
+    touch_workspace(workspace_id)
+    encoded_files = request.args.getlist("files")
+    generated_files = [workspace_path(workspace_id, os.path.basename(file)) for file in encoded_files]
+
+    return Response(
+        stream_with_context(stream_zip(generated_files, ZIP_COMPRESSION_LEVEL)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": "attachment; filename=workbooks.zip"}
     )
 
 if __name__ == "__main__":
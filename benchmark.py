@@ -0,0 +1,490 @@
+"""
+Benchmarks for the workbook pipeline.
+
+    python benchmark.py via [PDF ...] [--repeat N]
+
+Times parse_via_pdf (the original full-text parser) against
+parse_via_pdf_fast on the VIA profiles in output/ (or the PDFs given), and
+reports how much each one writes to stdout.
+
+    python benchmark.py suite [--sizes 10 100 1000] [--sample N] [--output results.json]
+
+Generates synthetic cohorts (VIA profile PDFs and a conflict CSV) of each
+size and times every pipeline stage separately, plus the full batch
+/generate request through Flask's test client. Results are written as JSON
+so runs of different versions can be diffed. Every cohort starts with empty
+render, VIA parse and stamp caches in its own temporary folder, so results do
+not depend on earlier runs; the batch request is timed cold (generate_batch)
+and again with the caches it filled (generate_batch_warm). Stages that need
+LibreOffice are reported as skipped when soffice is not installed. The
+app's output folder (workspaces, uploads, jobs) is a temporary folder that is
+removed when the run ends.
+"""
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from functions import (
+    QUESTION_CATEGORIES,
+    SCORE_MAP,
+    STRENGTH_DATA,
+    assemble_workbook,
+    convert_many_to_pdf_via_libreoffice,
+    convert_to_pdf_via_libreoffice,
+    fill_conflict_docs_for_one,
+    fill_template,
+    generate_cover_pdf,
+    match_names,
+    merge_custom_pages_by_index,
+    paginate_pdf,
+    parse_via_pdf,
+    parse_via_pdf_fast,
+    render_conflict_docx_for_one,
+    render_cover_docx,
+    render_sweet_spot_docx,
+    score_conflict_csv,
+)
+
+BIG_TEMPLATE_PDF = os.path.join("resources", "bigTemplate.pdf")
+CONFLICT_TEMPLATE_DOCX = os.path.join("resources", "Conflict_Template.docx")
+SWEET_SPOT_TEMPLATE_DOCX = os.path.join("resources", "Sweet_Spot_Template.docx")
+
+FIRST_NAMES = [
+    "Amy", "Ben", "Carla", "Dustin", "Elena", "Farid", "Grace", "Henry", "Ines", "Jaime",
+    "Kate", "Liam", "Maya", "Noah", "Olga", "Priya", "Quinn", "Rosa", "Sam", "Tara",
+]
+LAST_NAMES = [
+    "Martin", "Newcomb", "Seward", "Zsiros", "Durkin", "Liu", "Davis", "Johns", "Stone", "Wood",
+    "Magee", "Knowles", "Hernandez", "Shetter", "Winkler", "Munter", "Neuman", "Okafor", "Patel", "Reyes",
+]
+
+
+def time_call(fn, *args, repeat=5):
+    """
+    Runs fn(*args) `repeat` times with stdout discarded and returns the
+    best wall-clock time in seconds.
+    """
+    best = float("inf")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(*args)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_via(pdf_paths, repeat=5):
+    """
+    Times both VIA parsers on each PDF and checks that they agree.
+    Returns a list of result dicts.
+    """
+    rows = []
+    for pdf_path in pdf_paths:
+        before = time_call(parse_via_pdf, pdf_path, repeat=repeat)
+        after = time_call(parse_via_pdf_fast, pdf_path, repeat=repeat)
+        before_out, after_out = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(before_out):
+            before_result = parse_via_pdf(pdf_path)
+        with contextlib.redirect_stdout(after_out):
+            after_result = parse_via_pdf_fast(pdf_path)
+        rows.append({
+            "pdf": os.path.basename(pdf_path),
+            "parse_via_pdf_ms": before * 1000,
+            "parse_via_pdf_fast_ms": after * 1000,
+            "speedup": before / after if after else None,
+            "parse_via_pdf_stdout_bytes": len(before_out.getvalue()),
+            "parse_via_pdf_fast_stdout_bytes": len(after_out.getvalue()),
+            "same_result": before_result == after_result,
+        })
+    return rows
+
+
+def synthetic_names(size, rng):
+    """
+    Returns `size` distinct "First Last" names.
+    """
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    rng.shuffle(names)
+    while len(names) < size:
+        names.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}-{len(names)}")
+    return names[:size]
+
+
+def write_synthetic_via_pdf(path, name, rng):
+    """
+    Writes a three-page PDF laid out like a VIA Character Strengths Profile:
+    name, heading and date on every page, then the 24 ranked strengths.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    strengths = list(STRENGTH_DATA)
+    rng.shuffle(strengths)
+    c = canvas.Canvas(path, pagesize=letter)
+    width, height = letter
+    for page_start in (0, 9, 18):
+        y = height - 60
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, y, name)
+        c.setFont("Helvetica", 11)
+        c.drawString(50, y - 20, "VIA Character Strengths Profile")
+        c.drawString(50, y - 34, "09/15/2021")
+        c.setFont("Helvetica", 7)
+        c.drawString(50, 30, "©2021 VIA Institute on Character. All Rights Reserved.")
+        y -= 70
+        for rank in range(page_start + 1, min(page_start + 9, 24) + 1):
+            strength = strengths[rank - 1]
+            c.setFont("Helvetica-Bold", 12)
+            c.drawString(50, y, f"{rank}. {strength}")
+            c.setFont("Helvetica", 8)
+            c.drawString(50, y - 12, "VIRTUE")
+            c.drawString(50, y - 24, STRENGTH_DATA[strength]["optimal"])
+            y -= 72
+        c.showPage()
+    c.save()
+
+
+def write_synthetic_page_pdf(path, label):
+    """
+    Writes a one-page PDF used in place of a LibreOffice-rendered page when
+    soffice is not installed, so the PDF stages can still be timed.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=letter)
+    c.setFont("Times-Roman", 24)
+    c.drawCentredString(letter[0] / 2, letter[1] / 2, label)
+    c.save()
+
+
+def make_synthetic_cohort(folder, size, seed=0):
+    """
+    Creates `size` VIA PDFs and a matching conflict CSV in folder.
+
+    Returns:
+      (names, {pdf filename: name}, csv path)
+    """
+    import pandas as pd
+
+    rng = random.Random(seed)
+    names = synthetic_names(size, rng)
+    pdf_names = {}
+    for i, name in enumerate(names):
+        filename = f"StrengthsProfile-{i:05d}.pdf"
+        write_synthetic_via_pdf(os.path.join(folder, filename), name, rng)
+        pdf_names[filename] = name
+
+    answers = list(SCORE_MAP)
+    rows = []
+    for name in names:
+        row = {"First and Last Name": name}
+        for question in QUESTION_CATEGORIES:
+            row[question] = rng.choice(answers)
+        rows.append(row)
+    csv_path = os.path.join(folder, "conflict.csv")
+    pd.DataFrame(rows).to_csv(csv_path, index=False)
+    return names, pdf_names, csv_path
+
+
+def soffice_available():
+    return any(shutil.which(binary) for binary in ("soffice", "libreoffice"))
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Calls fn with stdout discarded. Returns (seconds, result).
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+
+def summarize(durations, cohort_size):
+    """
+    Summarizes per-item durations (seconds) and extrapolates to the cohort.
+    """
+    ordered = sorted(durations)
+    mean = statistics.fmean(ordered)
+    return {
+        "items": len(ordered),
+        "mean_ms": mean * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "total_s": sum(ordered),
+        "cohort_estimate_s": mean * cohort_size,
+    }
+
+
+def isolate_caches(workdir):
+    """
+    Points the render cache, VIA parse cache and stamp templates at empty
+    folders under workdir and clears their in-memory copies, so the stages
+    timed next start cold. run_batch_jobs() hands these settings to its
+    worker processes.
+    """
+    import functions
+
+    functions.RENDER_CACHE_DIR = os.path.join(workdir, "render_cache")
+    if functions.VIA_PARSE_CACHE_DIR:
+        functions.VIA_PARSE_CACHE_DIR = os.path.join(workdir, "via_parse_cache")
+    functions.STAMP_DIR = os.path.join(workdir, "stamps")
+    functions._render_cache_bytes = None
+    functions._via_parse_cache.clear()
+    functions._stamp_templates.clear()
+
+
+@contextlib.contextmanager
+def isolated_app_output():
+    """
+    Points app3's output folder (workspaces, blobs, jobs, metrics) at a
+    temporary folder for the duration of the block and removes it afterwards,
+    so a benchmark run leaves the working tree as it found it. app3 reads the
+    setting when it is first imported, which must happen inside the block.
+    The workspace janitor is not started for the run.
+    """
+    output_dir = tempfile.mkdtemp(prefix="bench_output_")
+    previous = {name: os.environ.get(name) for name in ("WORKBOOK_OUTPUT_DIR", "JANITOR_INTERVAL_SECONDS")}
+    os.environ["WORKBOOK_OUTPUT_DIR"] = output_dir
+    os.environ["JANITOR_INTERVAL_SECONDS"] = "0"
+    try:
+        yield output_dir
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def bench_cohort(size, sample, run_pipeline=True, seed=0):
+    """
+    Times every pipeline stage on a synthetic cohort of `size` participants.
+    Per-participant stages run on the first `sample` participants and are
+    extrapolated to the full cohort; cohort-wide stages run once.
+    """
+    stages = {}
+    has_soffice = soffice_available()
+    workdir = tempfile.mkdtemp(prefix=f"bench_{size}_")
+    isolate_caches(workdir)
+    try:
+        start = time.perf_counter()
+        names, pdf_names, csv_path = make_synthetic_cohort(workdir, size, seed)
+        generation_s = time.perf_counter() - start
+        sampled = list(pdf_names.items())[:sample]
+
+        def per_item(stage, fn, items, needs_soffice=False):
+            if needs_soffice and not has_soffice:
+                stages[stage] = {"skipped": "soffice not installed"}
+                return []
+            durations, results = [], []
+            for item in items:
+                seconds, result = timed(fn, *item)
+                durations.append(seconds)
+                results.append(result)
+            stages[stage] = summarize(durations, size)
+            return results
+
+        def once(stage, fn, *args, needs_soffice=False):
+            if needs_soffice and not has_soffice:
+                stages[stage] = {"skipped": "soffice not installed"}
+                return None
+            seconds, result = timed(fn, *args)
+            stages[stage] = {"items": 1, "total_s": seconds}
+            return result
+
+        via_paths = [(os.path.join(workdir, filename),) for filename, _ in sampled]
+        parsed = per_item("parse_via_pdf", parse_via_pdf, via_paths)
+        per_item("parse_via_pdf_fast", parse_via_pdf_fast, via_paths)
+
+        contexts = once("score_conflict_csv", score_conflict_csv, csv_path)
+        once("match_names", match_names, names, pdf_names)
+
+        out = os.path.join(workdir, "out")
+        os.makedirs(out)
+        sample_names = [name for _, name in sampled]
+
+        per_item(
+            "render_conflict_docx_for_one", render_conflict_docx_for_one,
+            [(csv_path, CONFLICT_TEMPLATE_DOCX, out, name, contexts[name]) for name in sample_names]
+        )
+        per_item("render_cover_docx", render_cover_docx, [(name, "Winter 2025", "Bench", out) for name in sample_names])
+        per_item(
+            "render_sweet_spot_docx", render_sweet_spot_docx,
+            [
+                (results, STRENGTH_DATA, name, SWEET_SPOT_TEMPLATE_DOCX, os.path.join(out, f"{i}_SweetSpot.docx"))
+                for i, (name, (_, results)) in enumerate(zip(sample_names, parsed))
+            ]
+        )
+
+        per_item(
+            "fill_conflict_docs_for_one", fill_conflict_docs_for_one,
+            [(csv_path, CONFLICT_TEMPLATE_DOCX, out, name) for name in sample_names], needs_soffice=True
+        )
+        per_item(
+            "generate_cover_pdf", generate_cover_pdf,
+            [(name, "Winter 2025", "Bench", out) for name in sample_names], needs_soffice=True
+        )
+        sweet_pdfs = per_item(
+            "fill_template", fill_template,
+            [
+                (results, STRENGTH_DATA, name, SWEET_SPOT_TEMPLATE_DOCX, os.path.join(out, f"{i}_SweetSpot.docx"))
+                for i, (name, (_, results)) in enumerate(zip(sample_names, parsed))
+            ],
+            needs_soffice=True
+        )
+
+        docx_paths = sorted(glob.glob(os.path.join(out, "*.docx")))
+        convert_dir = os.path.join(workdir, "converted")
+        os.makedirs(convert_dir)
+        per_item(
+            "convert_to_pdf_via_libreoffice", convert_to_pdf_via_libreoffice,
+            [(path, convert_dir) for path in docx_paths[:sample]], needs_soffice=True
+        )
+        once("convert_many_to_pdf_via_libreoffice", convert_many_to_pdf_via_libreoffice,
+             docx_paths[:sample], convert_dir, needs_soffice=True)
+
+        # Merge/paginate need rendered pages; use stand-ins without LibreOffice.
+        if sweet_pdfs:
+            page_pdf = sweet_pdfs[0]
+        else:
+            page_pdf = os.path.join(workdir, "page.pdf")
+            write_synthetic_page_pdf(page_pdf, "Rendered page")
+        merged = [os.path.join(workdir, f"{i}_merged.pdf") for i in range(len(via_paths))]
+        per_item(
+            "merge_custom_pages_by_index", merge_custom_pages_by_index,
+            [(BIG_TEMPLATE_PDF, page_pdf, via[0], page_pdf, page_pdf, merged[i]) for i, via in enumerate(via_paths)]
+        )
+        per_item(
+            "paginate_pdf", paginate_pdf,
+            [(merged[i], os.path.join(workdir, f"{i}_overlay.pdf")) for i in range(len(via_paths))]
+        )
+        per_item(
+            "paginate_pdf_direct", lambda src, dst: paginate_pdf(src, dst, direct=True),
+            [(merged[i], os.path.join(workdir, f"{i}_direct.pdf")) for i in range(len(via_paths))]
+        )
+        per_item(
+            "assemble_workbook", assemble_workbook,
+            [
+                (BIG_TEMPLATE_PDF, page_pdf, via[0], page_pdf, page_pdf, os.path.join(workdir, f"{i}_workbook.pdf"))
+                for i, via in enumerate(via_paths)
+            ]
+        )
+
+        for stage in ("generate_batch", "generate_batch_warm"):
+            if not run_pipeline:
+                stages[stage] = {"skipped": "disabled with --no-pipeline"}
+            elif not has_soffice:
+                stages[stage] = {"skipped": "soffice not installed"}
+            else:
+                stages[stage] = bench_generate(workdir, pdf_names, csv_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"size": size, "sample": min(sample, size), "generation_s": generation_s, "stages": stages}
+
+
+def bench_generate(workdir, pdf_names, csv_path):
+    """
+    Posts a full batch /generate request through Flask's test client, run in
+    the request rather than as a background job so the whole batch is timed.
+    """
+    import app3
+
+    client = app3.app.test_client()
+    data = {
+        "mode": "batch",
+        "template": "Open",
+        "batchDate": "Winter 2025",
+        "batchCohort": "Bench",
+        "async": "0",
+        "viaFiles": [(open(os.path.join(workdir, filename), "rb"), filename) for filename in pdf_names],
+        "conflictCSVBatch": (open(csv_path, "rb"), "conflict.csv"),
+    }
+    try:
+        seconds, response = timed(client.post, "/generate", data=data, content_type="multipart/form-data")
+    finally:
+        for handle, _ in data["viaFiles"]:
+            handle.close()
+        data["conflictCSVBatch"][0].close()
+    return {"items": 1, "total_s": seconds, "status": response.status_code}
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "soffice": soffice_available(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    via_parser = subparsers.add_parser("via", help="Compare the VIA PDF parsers")
+    via_parser.add_argument("pdfs", nargs="*", help="VIA profile PDFs (default: output/StrengthsProfile-*.pdf)")
+    via_parser.add_argument("--repeat", type=int, default=5)
+
+    suite_parser = subparsers.add_parser("suite", help="Time every stage on synthetic cohorts")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    suite_parser.add_argument("--sample", type=int, default=25,
+                              help="Participants timed per stage (extrapolated to the cohort)")
+    suite_parser.add_argument("--seed", type=int, default=0)
+    suite_parser.add_argument("--no-pipeline", action="store_true", help="Skip the full /generate request")
+    suite_parser.add_argument("--output", help="Write JSON results here instead of stdout")
+
+    args = parser.parse_args()
+
+    if args.command == "via":
+        pdf_paths = args.pdfs or sorted(glob.glob(os.path.join("output", "StrengthsProfile-*.pdf")))
+        rows = bench_via(pdf_paths, repeat=args.repeat)
+        print(f"{'PDF':40} {'before ms':>10} {'after ms':>10} {'speedup':>8} {'stdout B':>17}  same")
+        for row in rows:
+            print(
+                f"{row['pdf']:40} {row['parse_via_pdf_ms']:10.2f} {row['parse_via_pdf_fast_ms']:10.2f} "
+                f"{row['speedup']:7.1f}x {row['parse_via_pdf_stdout_bytes']:8} -> {row['parse_via_pdf_fast_stdout_bytes']:5}"
+                f"  {row['same_result']}"
+            )
+
+    elif args.command == "suite":
+        with isolated_app_output():
+            results = {
+                "meta": run_metadata(),
+                "cohorts": [
+                    bench_cohort(size, args.sample, run_pipeline=not args.no_pipeline, seed=args.seed)
+                    for size in args.sizes
+                ],
+            }
+        text = json.dumps(results, indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text + "\n")
+            print(f"Benchmark results written to {args.output}")
+        else:
+            print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Command-line batch runner, for generating a cohort's workbooks from cron or CI.
+
+    python cli.py VIA_FOLDER CONFLICT_CSV --term "Winter 2025" --cohort "Cohort A"
+                  [--template Open|Team|Tiny] [--output-folder output] [--jobs N]
+                  [--resume | --incremental] [--summary summary.json]
+
+Matches the VIA profile PDFs in VIA_FOLDER against the conflict CSV exactly
+like the batch form does, builds the matched participants' workbooks across
+--jobs worker processes and writes a JSON summary. With --resume, participants
+whose workbook is already complete in the output folder are skipped. With
+--incremental, only participants whose inputs changed since the cohort's last
+incremental run are rebuilt (see functions.CohortManifest). With the Team
+template, a team summary page for all matched participants is appended to
+every workbook and also written to the output folder as Team_Summary.pdf.
+
+Exits with status 1 if any matched participant's workbook could not be built.
+"""
+import argparse
+import contextlib
+import glob
+import json
+import os
+import sys
+import time
+
+from functions import (
+    CONFLICT_TEMPLATE_DOCX,
+    COVER_TEMPLATE_DOCX,
+    SWEET_SPOT_TEMPLATE_DOCX,
+    TEAM_PAGE_FILENAME,
+    TEAM_TEMPLATE,
+    WORKBOOK_TEMPLATES,
+    CohortManifest,
+    build_team_page,
+    match_names,
+    parse_via_pdf_cached,
+    run_batch_jobs,
+    score_conflict_csv,
+    workbook_is_complete,
+    workbook_output_path,
+)
+
+
+def run_cohort(via_folder, csv_path, term, cohort, template="Open", output_folder="output",
+               jobs=None, resume=False, incremental=False):
+    """
+    Builds the workbooks for one cohort.
+
+    Parameters:
+      via_folder: Folder containing the participants' VIA profile PDFs.
+      csv_path: The conflict survey CSV.
+      term, cohort: Values for the cover page.
+      template: Workbook template version (Open/Team/Tiny).
+      output_folder: Folder for the finished workbooks.
+      jobs: Number of worker processes; defaults to BATCH_MAX_WORKERS.
+      resume: Skip participants whose workbook is already complete.
+      incremental: Reuse workbooks whose inputs match the cohort manifest.
+
+    Returns:
+      A JSON-serializable summary dict.
+    """
+    timings = {}
+    start = time.perf_counter()
+    os.makedirs(output_folder, exist_ok=True)
+
+    stage_start = time.perf_counter()
+    conflict_contexts = score_conflict_csv(csv_path)
+    via_paths = sorted(
+        path for path in glob.glob(os.path.join(via_folder, "*"))
+        if path.lower().endswith(".pdf")
+    )
+    pdf_names = {}
+    for via_path in via_paths:
+        participant_name, _ = parse_via_pdf_cached(via_path)
+        pdf_names[os.path.basename(via_path)] = participant_name
+    timings["parse_s"] = time.perf_counter() - stage_start
+
+    stage_start = time.perf_counter()
+    matched_pairs, missing_pdf, missing_csv = match_names(set(conflict_contexts), pdf_names)
+    timings["match_s"] = time.perf_counter() - stage_start
+
+    matched_participants = [
+        {
+            "name": csv_name,
+            "pdf_name": pdf_name,
+            "via_pdf": os.path.join(via_folder, pdf_filename),
+            "conflict_context": conflict_contexts[csv_name],
+        }
+        for csv_name, pdf_name, pdf_filename in matched_pairs
+    ]
+
+    team_analytics = team_pdf = team_page_path = None
+    if template == TEAM_TEMPLATE:
+        stage_start = time.perf_counter()
+        team_analytics, team_pdf = build_team_page(matched_participants, term, cohort)
+        team_page_path = os.path.join(output_folder, TEAM_PAGE_FILENAME)
+        with open(team_page_path, "wb") as f:
+            f.write(team_pdf)
+        timings["team_s"] = time.perf_counter() - stage_start
+
+    participants = []
+    skipped = []
+    for participant in matched_participants:
+        if resume and workbook_is_complete(workbook_output_path(output_folder, participant["name"])):
+            skipped.append(participant["name"])
+            continue
+        participants.append(participant)
+
+    reused = []
+    if incremental:
+        template_pdf = WORKBOOK_TEMPLATES[template]
+        manifest = CohortManifest(
+            output_folder, term, cohort, template_pdf,
+            [COVER_TEMPLATE_DOCX, SWEET_SPOT_TEMPLATE_DOCX, CONFLICT_TEMPLATE_DOCX], csv_path,
+            team_pdf=team_pdf
+        )
+        participants, reused_participants = manifest.split(participants)
+        reused = [participant["name"] for participant in reused_participants]
+        for participant in reused_participants:
+            manifest.reuse(participant, output_folder)
+
+    stage_start = time.perf_counter()
+    results = []
+    if participants:
+        results = run_batch_jobs(
+            participants,
+            max_workers=jobs,
+            template_pdf=WORKBOOK_TEMPLATES[template],
+            term=term,
+            cohort=cohort,
+            csv_path=csv_path,
+            conflict_template_path=CONFLICT_TEMPLATE_DOCX,
+            sweet_template_path=SWEET_SPOT_TEMPLATE_DOCX,
+            output_folder=output_folder,
+            team_pdf=team_pdf,
+        )
+    if incremental:
+        manifest.record(participants, results)
+        manifest.save()
+    timings["generate_s"] = time.perf_counter() - stage_start
+    timings["total_s"] = time.perf_counter() - start
+
+    results_by_name = {result["name"]: result for result in results}
+    matched = []
+    for csv_name, pdf_name, pdf_filename in matched_pairs:
+        entry = {
+            "name": csv_name,
+            "pdf_name": pdf_name,
+            "via_pdf": pdf_filename,
+            "workbook": workbook_output_path(output_folder, csv_name),
+            "error": None,
+        }
+        if csv_name in skipped:
+            entry["status"] = "skipped"
+        elif csv_name in reused:
+            entry["status"] = "reused"
+        elif results_by_name[csv_name]["workbook"]:
+            entry["status"] = "generated"
+            entry["bytes_saved"] = results_by_name[csv_name]["bytes_saved"]
+        else:
+            entry["status"] = "failed"
+            entry["workbook"] = None
+            entry["error"] = results_by_name[csv_name]["error"]
+        matched.append(entry)
+
+    return {
+        "template": template,
+        "term": term,
+        "cohort": cohort,
+        "output_folder": output_folder,
+        "counts": {
+            "matched": len(matched_pairs),
+            "generated": sum(1 for entry in matched if entry["status"] == "generated"),
+            "skipped": len(skipped),
+            "reused": len(reused),
+            "failed": sum(1 for entry in matched if entry["status"] == "failed"),
+            "missing_pdf": len(missing_pdf),
+            "missing_csv": len(missing_csv),
+        },
+        "matched": matched,
+        "missing_pdf": sorted(missing_pdf),
+        "missing_csv": sorted(missing_csv),
+        "mismatched": [
+            {"name": entry["name"], "pdf_name": entry["pdf_name"], "error": entry["error"]}
+            for entry in matched if entry["status"] == "failed"
+        ],
+        "team": team_analytics,
+        "team_page": team_page_path,
+        "timings": timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("via_folder", help="Folder of VIA profile PDFs")
+    parser.add_argument("conflict_csv", help="Conflict survey CSV")
+    parser.add_argument("--term", required=True, help="Term shown on the cover, e.g. 'Winter 2025'")
+    parser.add_argument("--cohort", required=True, help="Cohort shown on the cover")
+    parser.add_argument("--template", choices=sorted(WORKBOOK_TEMPLATES), default="Open")
+    parser.add_argument("--output-folder", default="output")
+    parser.add_argument("--jobs", type=int, help="Worker processes (default: BATCH_MAX_WORKERS)")
+    rerun = parser.add_mutually_exclusive_group()
+    rerun.add_argument("--resume", action="store_true", help="Skip participants whose workbook is already complete")
+    rerun.add_argument("--incremental", action="store_true",
+                       help="Only rebuild participants whose inputs changed since the last incremental run")
+    parser.add_argument("--summary", help="Write the JSON summary here; '-' for stdout "
+                                          "(default: <output-folder>/summary.json)")
+    args = parser.parse_args(argv)
+
+    summary_path = args.summary or os.path.join(args.output_folder, "summary.json")
+    # Keep stdout clean for the summary when it goes there.
+    log_target = sys.stderr if summary_path == "-" else sys.stdout
+    with contextlib.redirect_stdout(log_target):
+        summary = run_cohort(
+            args.via_folder,
+            args.conflict_csv,
+            args.term,
+            args.cohort,
+            template=args.template,
+            output_folder=args.output_folder,
+            jobs=args.jobs,
+            resume=args.resume,
+            incremental=args.incremental,
+        )
+
+    text = json.dumps(summary, indent=2)
+    if summary_path == "-":
+        print(text)
+    else:
+        with open(summary_path, "w") as f:
+            f.write(text + "\n")
+        counts = summary["counts"]
+        print(
+            f"{counts['generated']} generated, {counts['reused']} reused, {counts['skipped']} skipped, "
+            f"{counts['failed']} failed, "
+            f"{counts['missing_pdf']} missing PDFs, {counts['missing_csv']} missing CSV rows; "
+            f"summary written to {summary_path}"
+        )
+    return 1 if summary["counts"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
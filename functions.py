@@ -1,16 +1,606 @@
 import re
-from pypdf import PdfReader
+import hashlib
+import json
 import os
+import shutil
 import subprocess
-from docxtpl import DocxTemplate
-import pandas as pd
-from fuzzywuzzy import fuzz
+import sys
+import tempfile
+import threading
+import time
+import warnings
+import queue
+from collections import OrderedDict
+from contextlib import contextmanager
+from io import BytesIO
+from functools import lru_cache, wraps
+
+
+# Pipeline instrumentation. Every stage records its duration and the counters
+# below, labelled with the template and mode of the request being served;
+# app3 exposes them in Prometheus text format on /metrics.
+METRICS_ENABLED = os.environ.get("WORKBOOK_METRICS", "1") == "1"
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRIC_LABEL_NAMES = ("template", "mode")
+
+_metrics_lock = threading.Lock()
+_metric_labels = threading.local()
+# (stage, template, mode) -> [bucket counts..., count, sum]
+_stage_timings = {}
+# (counter name, extra label value, template, mode) -> value
+_counters = {}
+
+COUNTER_HELP = {
+    "workbook_pages_total": "Pages written to finished workbooks.",
+    "workbook_bytes_written_total": "Bytes written to finished workbooks.",
+    "workbooks_generated_total": "Workbooks written.",
+    "workbook_cache_hits_total": "Cache hits, by cache.",
+    "workbook_cache_misses_total": "Cache misses, by cache.",
+}
+
+
+def current_metric_labels():
+    """
+    Returns the {"template", "mode"} labels set for this thread by metric_labels().
+    """
+    labels = getattr(_metric_labels, "values", None) or {}
+    return {name: labels.get(name, "") for name in METRIC_LABEL_NAMES}
+
+
+@contextmanager
+def metric_labels(**labels):
+    """
+    Labels every metric recorded by this thread inside the block, e.g.
+    metric_labels(template="Open", mode="batch").
+    """
+    previous = getattr(_metric_labels, "values", None)
+    _metric_labels.values = dict(previous or {}, **labels)
+    try:
+        yield
+    finally:
+        _metric_labels.values = previous
+
+
+def record_stage(stage, seconds):
+    spans = getattr(_profile_state, "spans", None)
+    if spans is not None:
+        spans.append((stage, seconds))
+    if not METRICS_ENABLED:
+        return
+    labels = current_metric_labels()
+    key = (stage, labels["template"], labels["mode"])
+    with _metrics_lock:
+        timing = _stage_timings.setdefault(key, [0] * (len(METRIC_BUCKETS) + 2))
+        for i, bound in enumerate(METRIC_BUCKETS):
+            if seconds <= bound:
+                timing[i] += 1
+        timing[-2] += 1
+        timing[-1] += seconds
+
+
+def increment(counter, amount=1, label=""):
+    """
+    Adds amount to a counter from COUNTER_HELP. label is the counter's own
+    extra label (the cache name for the cache counters).
+    """
+    if not METRICS_ENABLED:
+        return
+    labels = current_metric_labels()
+    key = (counter, label, labels["template"], labels["mode"])
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def stage_span(stage):
+    """
+    Times the block as one run of `stage`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def timed_stage(stage):
+    """
+    Decorator that records every call of the function as a run of `stage`.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage_span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def metrics_snapshot():
+    """
+    Returns this process's metrics as a JSON-serializable dict.
+    """
+    with _metrics_lock:
+        return {
+            "stages": [list(key) + [list(value)] for key, value in _stage_timings.items()],
+            "counters": [list(key) + [value] for key, value in _counters.items()],
+        }
 
 
+def reset_metrics():
+    with _metrics_lock:
+        _stage_timings.clear()
+        _counters.clear()
+
+
+def merge_metrics(snapshot):
+    """
+    Adds a metrics_snapshot() taken in another process (e.g. a batch worker)
+    into this process's metrics.
+    """
+    with _metrics_lock:
+        for stage, template, mode, values in snapshot.get("stages", []):
+            timing = _stage_timings.setdefault((stage, template, mode), [0] * len(values))
+            for i, value in enumerate(values):
+                timing[i] += value
+        for counter, label, template, mode, value in snapshot.get("counters", []):
+            key = (counter, label, template, mode)
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def combine_metric_snapshots(snapshots):
+    """
+    Sums several metrics_snapshot() dicts into one.
+    """
+    stages = {}
+    counters = {}
+    for snapshot in snapshots:
+        for stage, template, mode, values in snapshot.get("stages", []):
+            timing = stages.setdefault((stage, template, mode), [0] * len(values))
+            for i, value in enumerate(values):
+                timing[i] += value
+        for counter, label, template, mode, value in snapshot.get("counters", []):
+            key = (counter, label, template, mode)
+            counters[key] = counters.get(key, 0) + value
+    return {
+        "stages": [list(key) + [values] for key, values in stages.items()],
+        "counters": [list(key) + [value] for key, value in counters.items()],
+    }
+
+
+def _prometheus_escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _prometheus_labels(**labels):
+    return "{" + ",".join(f'{name}="{_prometheus_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def render_prometheus_metrics(snapshots):
+    """
+    Sums metrics snapshots (one per process) and renders them in the
+    Prometheus text exposition format.
+    """
+    stages = {}
+    counters = {}
+    for snapshot in snapshots:
+        for stage, template, mode, values in snapshot.get("stages", []):
+            timing = stages.setdefault((stage, template, mode), [0] * len(values))
+            for i, value in enumerate(values):
+                timing[i] += value
+        for counter, label, template, mode, value in snapshot.get("counters", []):
+            key = (counter, label, template, mode)
+            counters[key] = counters.get(key, 0) + value
+
+    lines = [
+        "# HELP workbook_stage_seconds Time spent in each pipeline stage and soffice run.",
+        "# TYPE workbook_stage_seconds histogram",
+    ]
+    for (stage, template, mode), values in sorted(stages.items()):
+        for bound, count in zip(METRIC_BUCKETS, values):
+            labels = _prometheus_labels(stage=stage, template=template, mode=mode, le=bound)
+            lines.append(f"workbook_stage_seconds_bucket{labels} {count}")
+        labels = _prometheus_labels(stage=stage, template=template, mode=mode, le="+Inf")
+        lines.append(f"workbook_stage_seconds_bucket{labels} {values[-2]}")
+        labels = _prometheus_labels(stage=stage, template=template, mode=mode)
+        lines.append(f"workbook_stage_seconds_count{labels} {values[-2]}")
+        lines.append(f"workbook_stage_seconds_sum{labels} {values[-1]:.6f}")
+
+    for counter, help_text in COUNTER_HELP.items():
+        lines.append(f"# HELP {counter} {help_text}")
+        lines.append(f"# TYPE {counter} counter")
+        for (name, label, template, mode), value in sorted(counters.items()):
+            if name != counter:
+                continue
+            if counter.startswith("workbook_cache_"):
+                labels = _prometheus_labels(cache=label, template=template, mode=mode)
+            else:
+                labels = _prometheus_labels(template=template, mode=mode)
+            lines.append(f"{counter}{labels} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# On-demand profiling of a single run. Only the thread inside profile_run()
+# is profiled; stage spans recorded by that thread (soffice runs included)
+# are collected alongside the profile.
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get("WORKBOOK_PROFILE_INTERVAL", "0.005"))
+
+_profile_state = threading.local()
+
+
+def profiling_active():
+    """
+    True inside profile_run() on the profiled thread.
+    """
+    return getattr(_profile_state, "spans", None) is not None
+
+
+class _StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack every `interval` seconds and counts
+    identical stacks, for flame graphs.
+    """
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+
+
+@contextmanager
+def profile_run(output_prefix):
+    """
+    Profiles the block with cProfile and a stack sampler, then writes:
+
+      <output_prefix>.prof       cProfile stats (pstats, snakeviz)
+      <output_prefix>.collapsed  sampled stacks, one "a;b;c count" per line
+                                 (flamegraph.pl, speedscope)
+      <output_prefix>.json       wall time, time spent in soffice and per-stage totals
+
+    Yields a dict that holds the same summary once the block has finished.
+    """
+    import cProfile
+
+    summary = {}
+    profiler = cProfile.Profile()
+    sampler = _StackSampler(threading.get_ident(), PROFILE_SAMPLE_INTERVAL)
+    _profile_state.spans = []
+    start = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield summary
+    finally:
+        profiler.disable()
+        wall = time.perf_counter() - start
+        sampler.stopped.set()
+        sampler.join()
+        spans = _profile_state.spans
+        _profile_state.spans = None
+
+        os.makedirs(os.path.dirname(output_prefix) or ".", exist_ok=True)
+        profiler.dump_stats(output_prefix + ".prof")
+        with open(output_prefix + ".collapsed", "w") as f:
+            for stack, count in sorted(sampler.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+        stages = {}
+        for stage, seconds in spans:
+            totals = stages.setdefault(stage, {"count": 0, "total_s": 0.0})
+            totals["count"] += 1
+            totals["total_s"] += seconds
+        soffice = [seconds for stage, seconds in spans if stage.startswith("soffice")]
+        summary.update(
+            wall_s=wall,
+            soffice_s=sum(soffice),
+            soffice_runs=len(soffice),
+            samples=sum(sampler.stacks.values()),
+            stages=stages,
+            profile=output_prefix + ".prof",
+            collapsed=output_prefix + ".collapsed",
+        )
+        with open(output_prefix + ".json", "w") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+        print(f"Profile saved to {output_prefix}.prof ({wall:.2f}s, {sum(soffice):.2f}s in soffice)")
+
+
+# Number of warm headless LibreOffice instances kept alive for conversions.
+# 0 disables the pool and every conversion starts its own soffice process.
+LIBREOFFICE_POOL_SIZE = int(os.environ.get("LIBREOFFICE_POOL_SIZE", "0"))
+# Seconds a single conversion may take in a pooled instance (or a soffice
+# process) before it is killed.
+LIBREOFFICE_CONVERT_TIMEOUT = float(os.environ.get("LIBREOFFICE_CONVERT_TIMEOUT", "120"))
+
+
+def _soffice_binary():
+    """
+    Returns the name of the LibreOffice executable available on this host,
+    preferring "soffice" over "libreoffice".
+    """
+    for binary in ("soffice", "libreoffice"):
+        if shutil.which(binary):
+            return binary
+    return "soffice"
+
+
+def _free_port():
+    """
+    Asks the OS for an unused localhost port, so pools in different gunicorn
+    workers never collide.
+    """
+    import socket
+
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LibreOfficeInstance:
+    """
+    A single headless LibreOffice process listening on a UNO socket.
+
+    Each instance gets its own user profile directory so several instances can
+    run side by side without fighting over the profile lock.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_profile_{port}_")
+        self.process = None
+        self.desktop = None
+        self.timed_out = False
+
+    def start(self, timeout=30):
+        command = [
+            _soffice_binary(),
+            "--headless",
+            "--invisible",
+            "--nologo",
+            "--norestore",
+            "--nodefault",
+            f"-env:UserInstallation=file://{self.profile_dir}",
+            f"--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext",
+        ]
+        self.process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.desktop = self._connect(timeout)
+        print(f"LibreOffice instance started on port {self.port} (pid {self.process.pid})")
+
+    def _connect(self, timeout):
+        import uno
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        url = f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                context = resolver.resolve(url)
+                return context.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", context)
+            except Exception:
+                if not self.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError(f"LibreOffice instance on port {self.port} did not come up")
+                time.sleep(0.25)
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def convert(self, docx_path, pdf_path, timeout=None):
+        """
+        Converts one document. UNO calls have no deadline of their own, so
+        with a timeout the process is killed when it passes, which makes the
+        blocked call fail; TimeoutError is raised in that case.
+        """
+        self.timed_out = False
+        watchdog = None
+        if timeout:
+            watchdog = threading.Timer(timeout, self._expire)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            self._convert(docx_path, pdf_path)
+        except Exception as e:
+            if self.timed_out:
+                raise TimeoutError(
+                    f"LibreOffice instance on port {self.port} took longer than {timeout}s and was killed"
+                ) from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+
+    def _expire(self):
+        self.timed_out = True
+        process = self.process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def _convert(self, docx_path, pdf_path):
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            p = PropertyValue()
+            p.Name = name
+            p.Value = value
+            return p
+
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(docx_path)), "_blank", 0, (prop("Hidden", True),)
+        )
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                (prop("FilterName", "writer_pdf_Export"),),
+            )
+        finally:
+            document.close(True)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+        self.desktop = None
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def restart(self):
+        print(f"Restarting LibreOffice instance on port {self.port}")
+        self.stop()
+        self.profile_dir = tempfile.mkdtemp(prefix=f"lo_profile_{self.port}_")
+        self.start()
+
+
+class LibreOfficePool:
+    """
+    A fixed-size pool of warm LibreOffice instances. Conversions check out an
+    idle instance, and instances that have crashed are restarted before reuse.
+    An instance that hangs past LIBREOFFICE_CONVERT_TIMEOUT is killed and
+    restarted, and the conversion fails so the caller can fall back to a
+    soffice process.
+    """
+
+    def __init__(self, size):
+        self.owner_pid = os.getpid()
+        self.instances = [LibreOfficeInstance(_free_port()) for _ in range(size)]
+        self.idle = queue.Queue()
+
+    def start(self):
+        for instance in self.instances:
+            instance.start()
+            self.idle.put(instance)
+
+    def convert(self, docx_path, pdf_path):
+        instance = self.idle.get()
+        try:
+            if not instance.is_alive():
+                instance.restart()
+            try:
+                instance.convert(docx_path, pdf_path, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
+            except TimeoutError:
+                # Retrying a document that hung is likely to hang again.
+                instance.restart()
+                raise
+            except Exception as e:
+                # The instance most likely crashed mid-conversion; restart it and retry once.
+                print(f"LibreOffice instance on port {instance.port} failed ({e}); retrying")
+                instance.restart()
+                instance.convert(docx_path, pdf_path, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
+        finally:
+            self.idle.put(instance)
+
+    def stop(self):
+        for instance in self.instances:
+            instance.stop()
+
+
+_libreoffice_pool = None
+_libreoffice_pool_lock = threading.Lock()
+
+
+# Where distributions install the UNO bindings that ship with LibreOffice.
+UNO_SEARCH_PATHS = [
+    "/usr/lib/python3/dist-packages",
+    "/usr/lib/libreoffice/program",
+    "/opt/libreoffice/program",
+]
+
+
+def _import_uno():
+    """
+    Imports the UNO bindings, appending the system LibreOffice locations to
+    sys.path if they are not importable from this interpreter.
+    """
+    import importlib
+
+    try:
+        importlib.import_module("uno")
+        return True
+    except ImportError:
+        pass
+    for path in UNO_SEARCH_PATHS:
+        if os.path.isdir(path) and path not in sys.path:
+            sys.path.append(path)
+    try:
+        importlib.import_module("uno")
+        return True
+    except ImportError:
+        return False
+
+
+def start_libreoffice_pool(size=None):
+    """
+    Starts the pool of warm LibreOffice instances for this process. Call it
+    once at worker boot; convert_to_pdf_via_libreoffice() then routes every
+    conversion through the pool instead of spawning a new soffice process.
+
+    Returns the pool, or None when the pool is disabled or UNO is unavailable.
+    """
+    global _libreoffice_pool
+    size = LIBREOFFICE_POOL_SIZE if size is None else size
+    if size <= 0:
+        return None
+    with _libreoffice_pool_lock:
+        if _libreoffice_pool is not None and _libreoffice_pool.owner_pid == os.getpid():
+            return _libreoffice_pool
+        if not _import_uno():
+            print("Python UNO bindings not available; LibreOffice pool disabled.")
+            return None
+        pool = LibreOfficePool(size)
+        pool.start()
+        _libreoffice_pool = pool
+        return pool
+
+
+def stop_libreoffice_pool():
+    global _libreoffice_pool
+    with _libreoffice_pool_lock:
+        if _libreoffice_pool is not None and _libreoffice_pool.owner_pid == os.getpid():
+            _libreoffice_pool.stop()
+        _libreoffice_pool = None
+
+
+def _active_libreoffice_pool():
+    # A pool inherited through fork belongs to the parent process; never use it.
+    pool = _libreoffice_pool
+    if pool is not None and pool.owner_pid == os.getpid():
+        return pool
+    return None
+
+
+@timed_stage("convert_to_pdf_via_libreoffice")
 def convert_to_pdf_via_libreoffice(docx_path, output_dir=None):
     if output_dir is None:
         output_dir = os.path.dirname(docx_path) or "."
-    
+    pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+
+    pool = _active_libreoffice_pool()
+    if pool is not None:
+        try:
+            with stage_span("soffice_pool"):
+                pool.convert(docx_path, pdf_path)
+            return pdf_path
+        except Exception as e:
+            print(f"LibreOffice pool conversion failed ({e}); falling back to soffice process")
+
     # Try using "soffice"
     command = [
         "soffice",
@@ -20,7 +610,8 @@ def convert_to_pdf_via_libreoffice(docx_path, output_dir=None):
         "--outdir", output_dir
     ]
     try:
-        subprocess.run(command, check=True)
+        with stage_span("soffice"):
+            subprocess.run(command, check=True, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
     except FileNotFoundError:
         print("Command 'soffice' not found; trying 'libreoffice'...")
         command = [
@@ -30,13 +621,194 @@ def convert_to_pdf_via_libreoffice(docx_path, output_dir=None):
             docx_path,
             "--outdir", output_dir
         ]
-        subprocess.run(command, check=True)
-    pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+        with stage_span("soffice"):
+            subprocess.run(command, check=True, timeout=LIBREOFFICE_CONVERT_TIMEOUT)
     return pdf_path
 
 
+# Upper bound on files handed to one soffice invocation, to stay well below
+# the OS argument-length limit.
+LIBREOFFICE_BATCH_CHUNK = int(os.environ.get("LIBREOFFICE_BATCH_CHUNK", "200"))
+# A batch run may take LIBREOFFICE_CONVERT_TIMEOUT plus this many seconds per
+# file before it is killed.
+LIBREOFFICE_BATCH_FILE_TIMEOUT = float(os.environ.get("LIBREOFFICE_BATCH_FILE_TIMEOUT", "10"))
+
+
+@timed_stage("convert_many_to_pdf_via_libreoffice")
+def convert_many_to_pdf_via_libreoffice(docx_paths, output_dir=None, profile_dir=None):
+    """
+    Converts many DOCX files to PDF in as few LibreOffice runs as possible.
+
+    soffice runs that share a user profile hand their work to whichever one
+    started first, so every call uses a profile of its own: profile_dir if
+    given (the caller removes it), else a scratch directory removed on return.
+
+    Each run is killed once it passes its deadline (see
+    LIBREOFFICE_BATCH_FILE_TIMEOUT). Files a run failed to convert are then
+    converted one at a time; any that still fail are left out of the result.
 
+    Parameters:
+      docx_paths: List of DOCX file paths. Base names must be unique per output directory.
+      output_dir: Folder for the PDFs. Defaults to each DOCX file's own folder.
+      profile_dir: Optional LibreOffice user profile directory for the runs.
 
+    Returns:
+      A dict mapping each converted DOCX path to the path of its PDF.
+    """
+    pdf_paths = {}
+    groups = {}
+    for docx_path in docx_paths:
+        target_dir = output_dir or os.path.dirname(docx_path) or "."
+        pdf_paths[docx_path] = os.path.join(
+            target_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf"
+        )
+        groups.setdefault(target_dir, []).append(docx_path)
+
+    # Warm instances are cheaper than even a single cold batch run.
+    if _active_libreoffice_pool() is not None:
+        for docx_path, pdf_path in pdf_paths.items():
+            convert_to_pdf_via_libreoffice(docx_path, os.path.dirname(pdf_path))
+        return pdf_paths
+
+    if profile_dir is None:
+        with scratch_workspace("lo_profile_") as scratch_profile:
+            return convert_many_to_pdf_via_libreoffice(docx_paths, output_dir, scratch_profile)
+
+    binary = _soffice_binary()
+    profile = f"-env:UserInstallation=file://{profile_dir}"
+    for target_dir, paths in groups.items():
+        for start in range(0, len(paths), LIBREOFFICE_BATCH_CHUNK):
+            chunk = paths[start:start + LIBREOFFICE_BATCH_CHUNK]
+            command = [binary, profile, "--headless", "--convert-to", "pdf", "--outdir", target_dir] + chunk
+            timeout = LIBREOFFICE_CONVERT_TIMEOUT + LIBREOFFICE_BATCH_FILE_TIMEOUT * len(chunk)
+            try:
+                with stage_span("soffice_batch"):
+                    subprocess.run(command, check=True, timeout=timeout)
+                print(f"Converted {len(chunk)} DOCX files to PDF in one LibreOffice run")
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+                print(f"LibreOffice batch run failed ({e}); keeping the PDFs it produced")
+
+    # Only the files the batch runs left without a PDF are converted again.
+    for docx_path, pdf_path in list(pdf_paths.items()):
+        if os.path.exists(pdf_path):
+            continue
+        try:
+            convert_to_pdf_via_libreoffice(docx_path, os.path.dirname(pdf_path))
+        except Exception as e:
+            print(f"Failed to convert {docx_path}: {e}")
+        if not os.path.exists(pdf_path):
+            del pdf_paths[docx_path]
+    return pdf_paths
+
+
+def _default_scratch_root():
+    # Prefer tmpfs so intermediate DOCX/PDF files never touch persistent disk.
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+SCRATCH_ROOT = os.environ.get("WORKBOOK_SCRATCH_DIR") or _default_scratch_root()
+
+
+@contextmanager
+def scratch_workspace(prefix="workbook_"):
+    """
+    Yields a private scratch directory under SCRATCH_ROOT and removes it,
+    with everything in it, on exit.
+    """
+    path = tempfile.mkdtemp(prefix=prefix, dir=SCRATCH_ROOT)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+@timed_stage("render_docx_bytes")
+def render_docx_bytes(template, context):
+    """
+    Renders a docxtpl template (path or file-like) and returns the DOCX bytes.
+    """
+    from docxtpl import DocxTemplate
+
+    if isinstance(template, str):
+        template = BytesIO(template_file_bytes(template))
+    doc = DocxTemplate(template)
+    doc.render(context)
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def convert_docx_bytes_to_pdf(docx_bytes, name="document"):
+    """
+    Converts DOCX bytes to PDF bytes. The only files involved live in a
+    private scratch directory that is removed afterwards.
+    """
+    with scratch_workspace() as scratch:
+        docx_path = os.path.join(scratch, f"{name}.docx")
+        with open(docx_path, "wb") as f:
+            f.write(docx_bytes)
+        pdf_path = convert_to_pdf_via_libreoffice(docx_path, scratch)
+        with open(pdf_path, "rb") as f:
+            return f.read()
+
+
+# Template files are read once per process, or once in the gunicorn master
+# by warmup() and then shared with every worker.
+_template_files = {}
+_template_files_lock = threading.Lock()
+
+
+def template_file_bytes(path):
+    """
+    Returns the contents of a template file, read from disk only the first
+    time (and again if the file changes).
+    """
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    with _template_files_lock:
+        if key not in _template_files:
+            with open(path, "rb") as f:
+                _template_files[key] = f.read()
+        return _template_files[key]
+
+
+def warmup():
+    """
+    Does the work a worker would otherwise repeat on its first request:
+    imports the heavy libraries, reads every template PDF and DOCX into
+    memory and, with WORKBOOK_RENDERER=stamp, loads the compiled stamp
+    templates.
+
+    Meant to run once in the gunicorn master before it forks (see
+    gunicorn.conf.py), so all workers share the result copy-on-write.
+    gc.freeze() then keeps the collector from writing to (and so copying)
+    those pages in the workers.
+    """
+    import gc
+    import importlib
+
+    start = time.perf_counter()
+    for module in ("fitz", "numpy", "pandas", "docxtpl", "fuzzywuzzy.fuzz", "pypdf", "reportlab.pdfgen.canvas"):
+        importlib.import_module(module)
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    stringWidth("0", "Times-Roman", 10)
+    docx_templates = [COVER_TEMPLATE_DOCX, SWEET_SPOT_TEMPLATE_DOCX, CONFLICT_TEMPLATE_DOCX]
+    for path in list(WORKBOOK_TEMPLATES.values()) + docx_templates:
+        template_file_bytes(path)
+    for path in docx_templates:
+        get_stamp_template(path)
+    gc.collect()
+    gc.freeze()
+    print(f"Warmed up in {time.perf_counter() - start:.2f}s")
+
+
+def _as_pdf_source(pdf):
+    # PdfReader takes paths and streams; wrap raw bytes so callers can pass either.
+    if isinstance(pdf, (bytes, bytearray)):
+        return BytesIO(pdf)
+    return pdf
 
 
 def is_name_match(name1, name2, threshold=80):
@@ -44,8 +816,179 @@ def is_name_match(name1, name2, threshold=80):
     Compare two names using fuzzy matching.
     Returns True if the similarity score is above the threshold.
     """
+    from fuzzywuzzy import fuzz
+
     return fuzz.ratio(name1, name2) >= threshold
 
+def normalize_name(name):
+    """
+    Lowercases a name, strips accents and punctuation, and collapses whitespace,
+    so "José  O'Neil" and "jose oneil" compare equal.
+    """
+    import unicodedata
+
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    name = re.sub(r"[^\w\s]", "", name.lower())
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _name_block_keys(normalized):
+    """
+    Blocking keys for a normalized name: each token, each token's first three
+    letters, and the first/last initials. Two names are only scored against
+    each other if they share at least one key.
+    """
+    tokens = normalized.split()
+    keys = set()
+    for token in tokens:
+        keys.add(("token", token))
+        keys.add(("prefix", token[:3]))
+    if tokens:
+        keys.add(("initials", tokens[0][0] + tokens[-1][0]))
+    return keys
+
+
+def _min_cost_assignment(cost):
+    """
+    Hungarian algorithm for a rectangular cost matrix (list of rows, rows <= columns).
+    Returns a dict mapping each row index to its assigned column index.
+    """
+    n, m = len(cost), len(cost[0])
+    inf = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        min_v = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            delta = inf
+            j1 = 0
+            for j in range(1, m + 1):
+                if not used[j]:
+                    current = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if current < min_v[j]:
+                        min_v[j] = current
+                        way[j] = j0
+                    if min_v[j] < delta:
+                        delta = min_v[j]
+                        j1 = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_v[j] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    return {owner[j] - 1: j - 1 for j in range(1, m + 1) if owner[j]}
+
+
+@timed_stage("match_names")
+def match_names(csv_names, pdf_names, threshold=80):
+    """
+    Matches CSV participant names to parsed VIA PDF names one-to-one.
+
+    Names are normalized once and blocked with a token/initials index, so only
+    plausible pairs are scored with fuzz.ratio. Within each group of
+    connected candidates, an optimal assignment picks the pairing with the
+    highest total score, so two similar names can never claim the same PDF.
+
+    Parameters:
+      csv_names: Iterable of names from the conflict CSV.
+      pdf_names: Dict mapping each uploaded PDF filename to its parsed name.
+      threshold: Minimum fuzz.ratio score for a pair to count as a match.
+
+    Returns:
+      (matched_pairs, missing_pdf, missing_csv) where matched_pairs is a list of
+      (csv_name, pdf_name, pdf_filename), missing_pdf lists CSV names without a
+      PDF and missing_csv lists PDF names without a CSV row.
+    """
+    from fuzzywuzzy import fuzz
+
+    csv_list = sorted(set(csv_names))
+    pdf_list = sorted(pdf_names.items())
+    csv_norm = [normalize_name(name) for name in csv_list]
+    pdf_norm = [normalize_name(name) for _, name in pdf_list]
+
+    # Index PDFs by blocking key.
+    index = {}
+    for j, normalized in enumerate(pdf_norm):
+        for key in _name_block_keys(normalized):
+            index.setdefault(key, set()).add(j)
+
+    # Score every surviving candidate pair in one pass.
+    candidates = {
+        (i, j)
+        for i, normalized in enumerate(csv_norm)
+        for key in _name_block_keys(normalized)
+        for j in index.get(key, ())
+    }
+    scores = {(i, j): fuzz.ratio(csv_norm[i], pdf_norm[j]) for i, j in candidates}
+    edges = [pair for pair, score in scores.items() if score >= threshold]
+
+    # Split the bipartite graph into connected components (union-find) so each
+    # assignment problem stays small.
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for i, j in edges:
+        parent[find(("csv", i))] = find(("pdf", j))
+
+    components = {}
+    for i, j in edges:
+        rows, cols = components.setdefault(find(("csv", i)), (set(), set()))
+        rows.add(i)
+        cols.add(j)
+
+    assignment = {}
+    for rows, cols in components.values():
+        rows, cols = sorted(rows), sorted(cols)
+        transpose = len(rows) > len(cols)
+        if transpose:
+            rows, cols = cols, rows
+        # Maximize total score: pairs below the threshold cost nothing and are dropped below.
+        cost = []
+        for r in rows:
+            row_cost = []
+            for c in cols:
+                pair = (c, r) if transpose else (r, c)
+                score = scores.get(pair, 0)
+                row_cost.append(-score if score >= threshold else 0)
+            cost.append(row_cost)
+        for r, c in _min_cost_assignment(cost).items():
+            i, j = (cols[c], rows[r]) if transpose else (rows[r], cols[c])
+            if scores.get((i, j), 0) >= threshold:
+                assignment[i] = j
+
+    matched_pairs = []
+    for i, j in sorted(assignment.items()):
+        pdf_filename, pdf_name = pdf_list[j]
+        matched_pairs.append((csv_list[i], pdf_name, pdf_filename))
+    matched_pdfs = set(assignment.values())
+    missing_pdf = [name for i, name in enumerate(csv_list) if i not in assignment]
+    missing_csv = [name for j, (_, name) in enumerate(pdf_list) if j not in matched_pdfs]
+    return matched_pairs, missing_pdf, missing_csv
+
 SCORE_MAP = {
     "Rarely": 1,
     "Sometimes": 2,
@@ -72,6 +1015,67 @@ QUESTION_CATEGORIES = {
 }
 
 
+# Conflict styles in template order, with the placeholder each total fills.
+CONFLICT_STYLE_KEYS = {
+    "Collaborating": "Col",
+    "Competing": "Com",
+    "Avoiding": "Avo",
+    "Accommodating": "Acc",
+    "Compromising": "Co2",
+}
+
+
+@timed_stage("score_conflict_csv")
+def score_conflict_csv(csv_path):
+    """
+    Reads the conflict survey CSV once and scores every respondent.
+
+    Answers are mapped to a respondents x questions score matrix in one pass,
+    and the five style totals come from a single multiply with the
+    questions x styles category matrix.
+
+    Returns:
+      A dict mapping each stripped participant name to the conflict template
+      context ({"name", "Col", "Com", "Avo", "Acc", "Co2"}). When a name
+      appears more than once, the first row wins.
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.read_csv(csv_path)
+    df = df[df["First and Last Name"].notna()]
+    names = df["First and Last Name"].astype(str).str.strip().to_numpy()
+
+    questions = [q for q in QUESTION_CATEGORIES if q in df.columns]
+    for question_col in QUESTION_CATEGORIES:
+        if question_col not in df.columns:
+            print(f"Warning: '{question_col}' not found in CSV columns.")
+
+    # respondents x questions matrix of numeric scores (unknown answers score 0)
+    answers = np.char.strip(df[questions].astype(str).to_numpy(dtype=str))
+    scores = np.zeros(answers.shape, dtype=np.int64)
+    for answer_text, numeric_score in SCORE_MAP.items():
+        scores[answers == answer_text] = numeric_score
+
+    # questions x styles indicator matrix
+    styles = list(CONFLICT_STYLE_KEYS)
+    categories = np.zeros((len(questions), len(styles)), dtype=np.int64)
+    for i, question_col in enumerate(questions):
+        categories[i, styles.index(QUESTION_CATEGORIES[question_col])] = 1
+
+    totals = scores @ categories
+
+    contexts = {}
+    for name, row_totals in zip(names, totals):
+        if name == "" or name in contexts:
+            continue
+        context = {"name": name}
+        for style, total in zip(styles, row_totals):
+            context[CONFLICT_STYLE_KEYS[style]] = int(total)
+        contexts[name] = context
+    return contexts
+
+
 # strengths_data.py
 
 STRENGTH_DATA = {
@@ -198,12 +1202,10 @@ STRENGTH_DATA = {
 }
 
 
-from pdfminer.high_level import extract_text
-import re
-import fitz  # PyMuPDF
-import re
-
+@timed_stage("parse_via_pdf")
 def parse_via_pdf(pdf_path):
+    import fitz
+
     print(f"Reading PDF using PyMuPDF from: {pdf_path}")
 
     doc = fitz.open(pdf_path)
@@ -245,27 +1247,125 @@ def parse_via_pdf(pdf_path):
     return person_name, results
 
 
+VIA_STRENGTH_COUNT = 24
+VIA_PROFILE_HEADING = "VIA Character Strengths Profile"
+VIA_RANK_LINE = re.compile(r"(\d+)\.\s+(.+)")
 
 
+@timed_stage("parse_via_pdf_fast")
+def parse_via_pdf_fast(pdf_path):
+    """
+    Quiet, early-exit variant of parse_via_pdf(). Accepts a path or the PDF bytes.
 
+    Pages are loaded one at a time and read as text blocks. The name is the
+    line just above the "VIA Character Strengths Profile" heading, and ranks
+    are taken in order (1, 2, ... 24). Reading stops as soon as the name and
+    all 24 ranks have been found, and nothing is printed.
 
-
-
-
-def fill_template(parsed_strengths, strength_data, person_name, template_path, output_docx_path):
+    Returns:
+      (person_name, results) in the same shape as parse_via_pdf().
     """
-    Fills the Sweet Spot Template with the parsed strengths and their corresponding definitions,
-    then converts the filled DOCX to a PDF.
+    import fitz
 
-    Parameters:
-      parsed_strengths: A list of tuples (rank, strength_name), sorted by rank.
-      strength_data: A dictionary mapping strength names (Title Case) to a dict with keys "underuse", "optimal", "overuse".
-      person_name: The name of the individual (to fill the {{ name }} placeholder).
-      template_path: Path to the template DOCX file.
-      output_docx_path: Path where the filled DOCX file will be saved.
+    person_name = None
+    results = []
+    previous_line = ""
 
-    After saving the DOCX, the function converts it to PDF (same name with .pdf extension)
-    using LibreOffice in headless mode.
+    if isinstance(pdf_path, (bytes, bytearray)):
+        doc = fitz.open(stream=pdf_path, filetype="pdf")
+    else:
+        doc = fitz.open(pdf_path)
+    with doc:
+        for page in doc:
+            for block in page.get_text("blocks", sort=True):
+                # Older PyMuPDF releases list images as "<image: ...>" blocks.
+                if block[6] != 0:
+                    continue
+                for line in block[4].splitlines():
+                    line = line.strip()
+                    if not line:
+                        continue
+                    if person_name is None and line == VIA_PROFILE_HEADING:
+                        person_name = re.sub(r"\s+", " ", previous_line) or "Unknown"
+                    match = VIA_RANK_LINE.fullmatch(line)
+                    if match and int(match.group(1)) == len(results) + 1:
+                        results.append((int(match.group(1)), match.group(2).strip()))
+                    previous_line = line
+            if person_name is not None and len(results) >= VIA_STRENGTH_COUNT:
+                break
+
+    return person_name or "Unknown", results
+
+
+# Parsed VIA results keyed by the SHA-256 of the PDF bytes. The in-memory
+# cache is LRU-bounded; set VIA_PARSE_CACHE_DIR to also keep entries on disk
+# so they survive worker restarts.
+VIA_PARSE_CACHE_SIZE = int(os.environ.get("VIA_PARSE_CACHE_SIZE", "1024"))
+VIA_PARSE_CACHE_DIR = os.environ.get("VIA_PARSE_CACHE_DIR")
+# Bump when a parser change can alter the result for the same PDF bytes, so
+# entries written by the previous parser stop matching.
+VIA_PARSER_VERSION = 2
+
+_via_parse_cache = OrderedDict()
+_via_parse_cache_lock = threading.Lock()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_via_pdf_cached(pdf_path, sha256=None):
+    """
+    Parses a VIA PDF with parse_via_pdf_fast(), returning the cached
+    (person_name, results) when a PDF with identical bytes has been parsed before.
+    Pass sha256 when the file's hash is already known to skip hashing it again.
+    """
+    key = f"{sha256 or _file_sha256(pdf_path)}-v{VIA_PARSER_VERSION}"
+
+    with _via_parse_cache_lock:
+        if key in _via_parse_cache:
+            _via_parse_cache.move_to_end(key)
+            increment("workbook_cache_hits_total", label="via_parse")
+            return _via_parse_cache[key]
+
+    entry = None
+    disk_path = os.path.join(VIA_PARSE_CACHE_DIR, f"{key}.json") if VIA_PARSE_CACHE_DIR else None
+    if disk_path and os.path.exists(disk_path):
+        try:
+            with open(disk_path) as f:
+                data = json.load(f)
+            if data.get("parser_version") == VIA_PARSER_VERSION:
+                entry = (data["person_name"], [(int(rank), strength) for rank, strength in data["results"]])
+                increment("workbook_cache_hits_total", label="via_parse")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable VIA cache entry {disk_path}: {e}")
+
+    if entry is None:
+        increment("workbook_cache_misses_total", label="via_parse")
+        entry = parse_via_pdf_fast(pdf_path)
+        if disk_path:
+            os.makedirs(VIA_PARSE_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"parser_version": VIA_PARSER_VERSION, "person_name": entry[0], "results": entry[1]}, f)
+            os.replace(tmp_path, disk_path)
+
+    with _via_parse_cache_lock:
+        _via_parse_cache[key] = entry
+        _via_parse_cache.move_to_end(key)
+        while len(_via_parse_cache) > VIA_PARSE_CACHE_SIZE:
+            _via_parse_cache.popitem(last=False)
+    return entry
+
+
+def build_sweet_spot_context(parsed_strengths, strength_data, person_name):
+    """
+    Builds the Sweet Spot template context: the person's name plus 24 rows of
+    strength/underuse/optimal/overuse placeholders.
     """
     context = {}
     # Set the person's name in the template.
@@ -296,12 +1396,49 @@ def fill_template(parsed_strengths, strength_data, person_name, template_path, o
             context[f"underuse{placeholder_index}"] = ""
             context[f"optimal{placeholder_index}"] = ""
             context[f"overuse{placeholder_index}"] = ""
+    return context
+
+
+def render_sweet_spot_docx(parsed_strengths, strength_data, person_name, template_path, output_docx_path):
+    """
+    Fills the Sweet Spot Template and saves the DOCX without converting it.
+    Returns output_docx_path.
+    """
+    from docxtpl import DocxTemplate
+
+    context = build_sweet_spot_context(parsed_strengths, strength_data, person_name)
 
     # Load the template, render the context, and save the output DOCX.
     doc = DocxTemplate(template_path)
     doc.render(context)
     doc.save(output_docx_path)
     print(f"Template has been filled and saved as: {output_docx_path}")
+    return output_docx_path
+
+
+@timed_stage("fill_template")
+def fill_template(parsed_strengths, strength_data, person_name, template_path, output_docx_path=None,
+                  in_memory=False):
+    """
+    Fills the Sweet Spot Template with the parsed strengths and their corresponding definitions,
+    then converts the filled DOCX to a PDF.
+
+    Parameters:
+      parsed_strengths: A list of tuples (rank, strength_name), sorted by rank.
+      strength_data: A dictionary mapping strength names (Title Case) to a dict with keys "underuse", "optimal", "overuse".
+      person_name: The name of the individual (to fill the {{ name }} placeholder).
+      template_path: Path to the template DOCX file.
+      output_docx_path: Path where the filled DOCX file will be saved.
+      in_memory: If True, nothing is written to output_docx_path and the PDF is returned as bytes.
+
+    After saving the DOCX, the function converts it to PDF (same name with .pdf extension)
+    using LibreOffice in headless mode.
+    """
+    if in_memory:
+        context = build_sweet_spot_context(parsed_strengths, strength_data, person_name)
+        return render_template_pdf(template_path, context, "SweetSpot")
+
+    render_sweet_spot_docx(parsed_strengths, strength_data, person_name, template_path, output_docx_path)
 
     # Convert the DOCX to PDF.
     pdf_output_path = convert_to_pdf_via_libreoffice(output_docx_path)
@@ -309,11 +1446,6 @@ def fill_template(parsed_strengths, strength_data, person_name, template_path, o
     return pdf_output_path
 
 
-import os
-import pandas as pd
-from docxtpl import DocxTemplate
-import subprocess
-
 # Assuming SCORE_MAP and QUESTION_CATEGORIES are defined elsewhere in your module.
 # Also assuming convert_to_pdf_via_libreoffice is defined as follows:
 
@@ -330,6 +1462,9 @@ def fill_conflict_docs(csv_path, template_path, output_dir="."):
 
     Expects a single column "First and Last Name" in the CSV.
     """
+    from docxtpl import DocxTemplate
+    import pandas as pd
+
     df = pd.read_csv(csv_path)
 
     participant_names = []  # Store participant names
@@ -375,17 +1510,27 @@ def fill_conflict_docs(csv_path, template_path, output_dir="."):
 
     return participant_names  # Return the list of names
 
-def fill_conflict_docs_for_one(csv_path, template_path, output_dir, participant_name):
+def render_conflict_docx_for_one(csv_path, template_path, output_dir, participant_name, context=None):
     """
-    Reads survey responses from `csv_path`, filters for a single participant, converts textual answers
-    to numeric scores using SCORE_MAP, sums scores by category based on QUESTION_CATEGORIES, and fills a
-    Word template for that participant. Saves the DOCX file to output_dir and then converts it to a PDF.
+    Scores a single participant's conflict survey and saves the filled DOCX
+    without converting it. Returns the DOCX path, or None if the participant
+    has no row in the CSV.
 
-    Expects a column "First and Last Name" in the CSV.
+    Pass a context precomputed by score_conflict_csv() to skip reading the CSV.
+    """
+    if context is None:
+        context = conflict_context_for_one(csv_path, participant_name)
+        if context is None:
+            return None
+    return _save_conflict_docx(context, template_path, output_dir)
+
+
+def conflict_context_for_one(csv_path, participant_name):
+    """
+    Scores one participant's row of the conflict CSV (path or file-like) and
+    returns the template context, or None if the participant has no row.
     """
-    import os
     import pandas as pd
-    from docxtpl import DocxTemplate
 
     # Read the CSV into a DataFrame
     df = pd.read_csv(csv_path)
@@ -394,7 +1539,7 @@ def fill_conflict_docs_for_one(csv_path, template_path, output_dir, participant_
     filtered_df = df[df["First and Last Name"] == participant_name]
     if filtered_df.empty:
         print(f"No responses found for {participant_name} in {csv_path}")
-        return
+        return None
 
     # Process only the first matching row
     row = filtered_df.iloc[0]
@@ -427,18 +1572,48 @@ def fill_conflict_docs_for_one(csv_path, template_path, output_dir, participant_
         "Acc": category_scores["Accommodating"],
         "Co2": category_scores["Compromising"],
     }
+    return context
+
+
+def _save_conflict_docx(context, template_path, output_dir):
+    from docxtpl import DocxTemplate
 
     # Load the Word template and render the context
     doc = DocxTemplate(template_path)
     doc.render(context)
 
-    safe_name = full_name.replace(" ", "_")
+    safe_name = context["name"].replace(" ", "_")
     output_filename = f"{safe_name}_ConflictStyle3.docx"
     output_path = os.path.join(output_dir, output_filename)
 
     # Save the filled DOCX
     doc.save(output_path)
     print(f"Saved DOCX: {output_path}")
+    return output_path
+
+
+@timed_stage("fill_conflict_docs_for_one")
+def fill_conflict_docs_for_one(csv_path, template_path, output_dir, participant_name, context=None,
+                               in_memory=False):
+    """
+    Reads survey responses from `csv_path`, filters for a single participant, converts textual answers
+    to numeric scores using SCORE_MAP, sums scores by category based on QUESTION_CATEGORIES, and fills a
+    Word template for that participant. Saves the DOCX file to output_dir and then converts it to a PDF.
+
+    Expects a column "First and Last Name" in the CSV. If `context` (from score_conflict_csv) is given,
+    the CSV is not read again. With in_memory=True nothing is written to output_dir and the PDF is
+    returned as bytes.
+    """
+    if in_memory:
+        if context is None:
+            context = conflict_context_for_one(csv_path, participant_name)
+            if context is None:
+                return
+        return render_template_pdf(template_path, context, "ConflictStyle3")
+
+    output_path = render_conflict_docx_for_one(csv_path, template_path, output_dir, participant_name, context)
+    if output_path is None:
+        return
 
     # Convert the DOCX to PDF using your helper function
     pdf_output_path = convert_to_pdf_via_libreoffice(output_path, output_dir)
@@ -449,10 +1624,7 @@ def fill_conflict_docs_for_one(csv_path, template_path, output_dir, participant_
 
     return pdf_output_path
 
-
-
-from pypdf import PdfReader, PdfWriter
-
+@timed_stage("merge_custom_pages_by_index")
 def merge_custom_pages_by_index(
     template_pdf,
     cover_pdf,
@@ -469,6 +1641,7 @@ def merge_custom_pages_by_index(
     - Page 11 -> conflict_pdf
     - All other pages remain as-is.
     """
+    from pypdf import PdfReader, PdfWriter
 
     writer = PdfWriter()
 
@@ -506,15 +1679,20 @@ def merge_custom_pages_by_index(
         writer.write(out)
 
     print(f"Merged PDF created: {output_pdf}")
-from pypdf import PdfReader, PdfWriter
-from io import BytesIO
-from reportlab.pdfgen import canvas
 
+
+@lru_cache(maxsize=4096)
 def create_page_number_overlay(page_width, page_height, page_number, margin=36):
     """
     Creates a PDF overlay with the page number in Times New Roman 10 pt 
     at the lower right corner with a given margin (in points, 36 pts ~ 0.5 inch).
+
+    Overlays are cached by (page size, number, margin) and shared by every
+    workbook paginated in this process; merge_page() only reads them.
     """
+    from pypdf import PdfReader
+    from reportlab.pdfgen import canvas
+
     packet = BytesIO()
     c = canvas.Canvas(packet, pagesize=(page_width, page_height))
     c.setFont("Times-Roman", 10)
@@ -530,14 +1708,100 @@ def create_page_number_overlay(page_width, page_height, page_number, margin=36):
     overlay_reader = PdfReader(packet)
     return overlay_reader.pages[0]
 
-def paginate_pdf(input_pdf, output_pdf, start_page_index=3, start_page_number=3):
+
+# Resource name for the font used by stamp_page_number().
+PAGE_NUMBER_FONT = "/PgNumTimes"
+
+
+def _writer_add_object(writer):
+    # PdfWriter._add_object() is private pypdf API (present up to at least
+    # the pinned 3.12.0); None when the installed pypdf lacks it.
+    return getattr(writer, "_add_object", None)
+
+
+def add_numbered_page(writer, page, page_number, margin=36):
+    """
+    Adds page to writer with its page number in the lower right corner and
+    returns the added page.
+
+    The number is written straight into the added page (stamp_page_number())
+    when the installed pypdf allows it; otherwise the cached overlay from
+    create_page_number_overlay() is merged into the page before it is added,
+    which only needs public pypdf API.
+    """
+    if _writer_add_object(writer) is not None:
+        added = writer.add_page(page)
+        stamp_page_number(writer, added, page_number, margin)
+        return added
+    page_width = float(page.mediabox.upper_right[0])
+    page_height = float(page.mediabox.upper_right[1])
+    page.merge_page(create_page_number_overlay(page_width, page_height, page_number, margin))
+    return writer.add_page(page)
+
+
+def stamp_page_number(writer, page, page_number, margin=36):
+    """
+    Writes the page number straight into a page that already belongs to
+    `writer`, with the same font and position as create_page_number_overlay().
+
+    The existing content is wrapped in q/Q and a small text stream is appended,
+    so the page's own content streams are never parsed or rewritten.
+
+    Registering the new streams needs PdfWriter._add_object(), which pypdf
+    keeps private; add_numbered_page() checks for it before calling this.
+    """
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    page_width = float(page.mediabox.upper_right[0])
+    add_object = _writer_add_object(writer)
+    text = str(page_number)
+    x = page_width - margin - stringWidth(text, "Times-Roman", 10)
+    y = margin
+
+    def add_stream(data):
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        return add_object(stream)
+
+    contents = page.get("/Contents")
+    if contents is None:
+        existing = []
+    else:
+        resolved = contents.get_object()
+        existing = list(resolved) if isinstance(resolved, ArrayObject) else [contents]
+    number_stream = f"Q BT {PAGE_NUMBER_FONT} 10 Tf {x:.4f} {y:.4f} Td ({text}) Tj ET".encode()
+    page[NameObject("/Contents")] = ArrayObject(
+        [add_stream(b"q")] + existing + [add_stream(number_stream)]
+    )
+
+    if "/Resources" not in page:
+        page[NameObject("/Resources")] = DictionaryObject()
+    resources = page["/Resources"].get_object()
+    if "/Font" not in resources:
+        resources[NameObject("/Font")] = DictionaryObject()
+    fonts = resources["/Font"].get_object()
+    fonts[NameObject(PAGE_NUMBER_FONT)] = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Times-Roman"),
+        NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+    })
+
+
+@timed_stage("paginate_pdf")
+def paginate_pdf(input_pdf, output_pdf, start_page_index=3, start_page_number=3, direct=False):
     """
     Adds page numbers to the PDF starting at the given page index.
 
     - Pages with index less than start_page_index are left unnumbered.
     - The first numbered page (index start_page_index) is assigned the page number start_page_number.
     - The number is placed in the lower right footer in Times New Roman 10 pt.
+    - With direct=True the number is written into each page's content stream
+      (add_numbered_page) instead of merging a reportlab overlay page.
     """
+    from pypdf import PdfReader, PdfWriter
+
     reader = PdfReader(input_pdf)
     writer = PdfWriter()
     num_pages = len(reader.pages)
@@ -547,6 +1811,9 @@ def paginate_pdf(input_pdf, output_pdf, start_page_index=3, start_page_number=3)
         if i >= start_page_index:
             # Compute page number: first numbered page gets start_page_number
             page_number = start_page_number + (i - start_page_index)
+            if direct:
+                add_numbered_page(writer, page, page_number)
+                continue
             # Get page dimensions from the media box
             page_width = float(page.mediabox.upper_right[0])
             page_height = float(page.mediabox.upper_right[1])
@@ -559,15 +1826,186 @@ def paginate_pdf(input_pdf, output_pdf, start_page_index=3, start_page_number=3)
     print(f"Paginated PDF saved as: {output_pdf}")
 
 
-import os
-from docxtpl import DocxTemplate
-import subprocess
+# Optional rewrite of assembled workbooks that merges identical objects
+# (fonts, images, template resources) and recompresses streams. It makes
+# workbooks noticeably smaller but adds roughly half a second per workbook,
+# so it is off unless WORKBOOK_OPTIMIZE=1. Linearized ("fast web view")
+# output is opt-in with WORKBOOK_LINEARIZE=1 and implies the rewrite.
+WORKBOOK_OPTIMIZE = os.environ.get("WORKBOOK_OPTIMIZE", "0") == "1"
+WORKBOOK_LINEARIZE = os.environ.get("WORKBOOK_LINEARIZE", "0") == "1"
+
+
+@timed_stage("optimize_pdf")
+def optimize_pdf(pdf_bytes, linearize=False):
+    """
+    Rewrites a PDF with identical objects merged and all streams deflated,
+    using PyMuPDF (garbage=4 compares object and stream contents). Object
+    streams are used where the installed PyMuPDF supports them.
+
+    With linearize=True the file is linearized with pikepdf (qpdf) when it is
+    installed, or by PyMuPDF versions that still support it; otherwise the
+    request is skipped with a message.
+    """
+    import fitz
+
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        options = {"garbage": 4, "deflate": True, "deflate_fonts": True, "deflate_images": True}
+        try:
+            optimized = doc.tobytes(use_objstms=1, **options)
+        except TypeError:
+            optimized = doc.tobytes(**options)
+
+        if not linearize:
+            return optimized
+        try:
+            import pikepdf
+        except ImportError:
+            pikepdf = None
+        if pikepdf is not None:
+            out = BytesIO()
+            with pikepdf.open(BytesIO(optimized)) as pdf:
+                pdf.save(out, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+            return out.getvalue()
+        try:
+            return doc.tobytes(linear=True, **options)
+        except Exception as e:
+            print(f"Linearization not available ({e}); writing a non-linearized file")
+            return optimized
+
+
+@timed_stage("assemble_workbook")
+def assemble_workbook(
+    template_pdf,
+    cover_pdf,
+    via_pdf,
+    sweet_pdf,
+    conflict_pdf,
+    output_pdf,
+    start_page_index=3,
+    start_page_number=3,
+    optimize=None,
+    linearize=None,
+    team_pdf=None
+):
+    """
+    Builds a finished workbook in one pass: splices the custom PDFs into the
+    template exactly like merge_custom_pages_by_index() and stamps page numbers
+    like paginate_pdf(direct=True), using a single writer.
 
+    - Page 0 -> cover_pdf
+    - Page 4 -> via_pdf
+    - Page 8 -> sweet_pdf
+    - Page 11 -> conflict_pdf
+
+    team_pdf, if given, is appended after the last template page.
+
+    The inputs may be paths, file-like objects or bytes, and output_pdf may be
+    a path or a writable file-like object. No intermediate merged PDF is written.
+
+    If optimize is True (default: WORKBOOK_OPTIMIZE, off), the spliced file
+    is passed through optimize_pdf(); linearize defaults to WORKBOOK_LINEARIZE.
+
+    Returns:
+      {"bytes": size written, "bytes_saved": bytes removed by optimization}
+    """
+    from pypdf import PdfReader, PdfWriter
 
+    optimize = WORKBOOK_OPTIMIZE if optimize is None else optimize
+    linearize = WORKBOOK_LINEARIZE if linearize is None else linearize
+    writer = PdfWriter()
+
+    if isinstance(template_pdf, str):
+        template_pdf = template_file_bytes(template_pdf)
+    template_reader = PdfReader(_as_pdf_source(template_pdf))
+    inserts = {
+        0: PdfReader(_as_pdf_source(cover_pdf)),
+        4: PdfReader(_as_pdf_source(via_pdf)),
+        8: PdfReader(_as_pdf_source(sweet_pdf)),
+        11: PdfReader(_as_pdf_source(conflict_pdf)),
+    }
+
+    def pages():
+        for i, template_page in enumerate(template_reader.pages):
+            if i in inserts:
+                yield from inserts[i].pages
+            else:
+                yield template_page
+        if team_pdf is not None:
+            yield from PdfReader(_as_pdf_source(team_pdf)).pages
+
+    for index, page in enumerate(pages()):
+        if index >= start_page_index:
+            add_numbered_page(writer, page, start_page_number + (index - start_page_index))
+        else:
+            writer.add_page(page)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    data = buffer.getvalue()
+    unoptimized_size = len(data)
+    if optimize or linearize:
+        data = optimize_pdf(data, linearize=linearize)
+
+    if hasattr(output_pdf, "write"):
+        output_pdf.write(data)
+    else:
+        # Write then rename, so a workbook on disk is always complete.
+        tmp_path = f"{output_pdf}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as out:
+            out.write(data)
+        os.replace(tmp_path, output_pdf)
+        print(f"Workbook saved as: {output_pdf} ({len(data)} bytes, {unoptimized_size - len(data)} saved)")
+    increment("workbooks_generated_total")
+    increment("workbook_pages_total", len(writer.pages))
+    increment("workbook_bytes_written_total", len(data))
+    return {"bytes": len(data), "bytes_saved": unoptimized_size - len(data)}
+
+
+COVER_TEMPLATE_DOCX = os.path.join("resources", "coverTemplate.docx")
+SWEET_SPOT_TEMPLATE_DOCX = os.path.join("resources", "Sweet_Spot_Template.docx")
+CONFLICT_TEMPLATE_DOCX = os.path.join("resources", "Conflict_Template.docx")
+
+# Workbook template PDF for each template version.
+WORKBOOK_TEMPLATES = {
+    "Open": os.path.join("resources", "bigTemplate.pdf"),
+    "Team": os.path.join("resources", "teamTemplate.pdf"),
+    "Tiny": os.path.join("resources", "tinyTemplate.pdf"),
+}
+
+
+def build_cover_context(participant_name, date, cohort):
+    return {
+        "name": participant_name,
+        "date": date,
+        "cohort": cohort
+    }
+
+
+def render_cover_docx(participant_name, date, cohort, output_folder="."):
+    """
+    Renders the cover template for one participant and saves the DOCX without
+    converting it. Returns the DOCX path.
+    """
+    from docxtpl import DocxTemplate
+
+    # Define a safe output filename
+    safe_name = participant_name.replace(" ", "_")
+    output_docx_path = os.path.join(output_folder, f"{safe_name}_Cover.docx")
+
+    # Render the template and save as DOCX
+    doc = DocxTemplate(COVER_TEMPLATE_DOCX)
+    doc.render(build_cover_context(participant_name, date, cohort))
+    doc.save(output_docx_path)
+    print(f"Cover DOCX saved as: {output_docx_path}")
+    return output_docx_path
+
+
+@timed_stage("generate_cover_pdf")
 def generate_cover_pdf(participant_name=None,
     date=None,
     cohort=None,
-    output_folder="."):
+    output_folder=".",
+    in_memory=False):
     """
     Generates a customized cover page PDF using a DOCX cover template.
 
@@ -576,6 +2014,7 @@ def generate_cover_pdf(participant_name=None,
       term: The term (e.g., "Winter 2025").
       cohort: The cohort name.
       output_folder: Folder to save the generated files.
+      in_memory: If True, nothing is written to output_folder and the PDF is returned as bytes.
 
     Returns:
       The file path to the generated cover PDF.
@@ -583,25 +2022,11 @@ def generate_cover_pdf(participant_name=None,
     This function creates an intermediate DOCX file, converts it to PDF,
     and then deletes the DOCX so only the PDF remains.
     """
-    # Define the path to your cover template (adjust as needed)
-    cover_template_path = os.path.join("resources", "coverTemplate.docx")
-
-    # Define a safe output filename
-    safe_name = participant_name.replace(" ", "_")
-    output_docx_path = os.path.join(output_folder, f"{safe_name}_Cover.docx")
+    if in_memory:
+        context = build_cover_context(participant_name, date, cohort)
+        return render_template_pdf(COVER_TEMPLATE_DOCX, context, "Cover")
 
-    # Build context for the template
-    context = {
-        "name": participant_name,
-        "date": date,
-        "cohort": cohort
-    }
-
-    # Render the template and save as DOCX
-    doc = DocxTemplate(cover_template_path)
-    doc.render(context)
-    doc.save(output_docx_path)
-    print(f"Cover DOCX saved as: {output_docx_path}")
+    output_docx_path = render_cover_docx(participant_name, date, cohort, output_folder)
 
     # Convert the DOCX to PDF
     cover_pdf = convert_to_pdf_via_libreoffice(output_docx_path, output_folder)
@@ -643,3 +2068,1222 @@ def process_via_survey(pdf_path, strength_data, template_path, output_folder):
 
     return sweet_spot_pdf
 
+
+# Precompiled "stamp" templates: each DOCX template is converted to PDF once
+# with a unique marker in place of every placeholder. The markers are then
+# redacted, leaving the static text exactly where LibreOffice put it, and a
+# layout records where each placeholder goes and in which of the template's
+# embedded fonts. Pages are produced by drawing the values onto the blank PDF
+# with PyMuPDF, with no LibreOffice process. Set WORKBOOK_RENDERER=stamp to
+# use it; the DOCX path remains the fallback.
+WORKBOOK_RENDERER = os.environ.get("WORKBOOK_RENDERER", "docx")
+STAMP_DIR = os.environ.get("WORKBOOK_STAMP_DIR") or os.path.join(tempfile.gettempdir(), "workbook_stamps")
+STAMP_MIN_FONT_SIZE = 6
+# Bump when the compiled format or layout rules change, so old compiled
+# templates in STAMP_DIR are not reused.
+STAMP_FORMAT_VERSION = 2
+
+_stamp_templates = {}
+_stamp_templates_lock = threading.Lock()
+
+
+def _stamp_marker(index):
+    # Short, unique tokens that survive LibreOffice and are easy to search for.
+    return f"QX{index}XQ"
+
+
+def _font_key(name):
+    # "ABCDEF+Montserrat-SemiBold" and "Montserrat SemiBold" -> "montserratsemibold"
+    return re.sub(r"[^a-z0-9]", "", re.sub(r"^[A-Z]{6}\+", "", name).lower())
+
+
+def template_embedded_fonts(template_path):
+    """
+    Returns the fonts embedded in a DOCX template as {font key: font bytes},
+    keyed by _font_key() of each font's own name (e.g. "lorabold").
+
+    Word obfuscates embedded fonts by XOR-ing their first 32 bytes with the
+    font key GUID from fontTable.xml; that is undone here.
+    """
+    import zipfile
+    import fitz
+
+    fonts = {}
+    with zipfile.ZipFile(template_path) as docx:
+        names = set(docx.namelist())
+        if "word/fontTable.xml" not in names or "word/_rels/fontTable.xml.rels" not in names:
+            return fonts
+        table = docx.read("word/fontTable.xml").decode("utf-8")
+        rels = docx.read("word/_rels/fontTable.xml.rels").decode("utf-8")
+        targets = {}
+        for relationship in re.findall(r"<Relationship\b[^>]*>", rels):
+            attrs = dict(re.findall(r'(\w+)="([^"]*)"', relationship))
+            if "Id" in attrs and "Target" in attrs:
+                targets[attrs["Id"]] = attrs["Target"]
+        for embed in re.findall(r"<w:embed(?:Regular|Bold|Italic|BoldItalic)\b[^>]*>", table):
+            attrs = dict(re.findall(r'([\w:]+)="([^"]*)"', embed))
+            target = targets.get(attrs.get("r:id"))
+            if target is None or f"word/{target}" not in names:
+                continue
+            data = bytearray(docx.read(f"word/{target}"))
+            guid = attrs.get("w:fontKey", "").strip("{}").replace("-", "")
+            key = bytes.fromhex(guid)[::-1] if len(guid) == 32 else b""
+            if any(key):
+                for i in range(min(32, len(data))):
+                    data[i] ^= key[i % 16]
+            try:
+                name = fitz.Font(fontbuffer=bytes(data)).name
+            except Exception as e:
+                print(f"Skipping unreadable embedded font {target} in {template_path}: {e}")
+                continue
+            fonts.setdefault(_font_key(name), bytes(data))
+    return fonts
+
+
+def _stamp_font(span, fonts=None):
+    """
+    Returns the key of the template font a span in the compiled PDF was
+    drawn with when the template embeds it (see template_embedded_fonts()),
+    else the closest PyMuPDF base-14 font.
+    """
+    key = _font_key(span["font"])
+    for candidate in (key, key + "regular"):
+        if fonts and candidate in fonts:
+            return candidate
+    font = span["font"].lower()
+    bold = bool(span["flags"] & 16) or "bold" in font
+    italic = bool(span["flags"] & 2) or "italic" in font or "oblique" in font
+    if any(name in font for name in ("times", "georgia", "garamond")) or ("serif" in font and "sans" not in font):
+        family = "Times"
+    elif "courier" in font or "mono" in font:
+        family = "Courier"
+    else:
+        family = "Helvetica"
+    return {
+        ("Times", False, False): "tiro", ("Times", True, False): "tibo",
+        ("Times", False, True): "tiit", ("Times", True, True): "tibi",
+        ("Courier", False, False): "cour", ("Courier", True, False): "cobo",
+        ("Courier", False, True): "coit", ("Courier", True, True): "cobi",
+        ("Helvetica", False, False): "helv", ("Helvetica", True, False): "hebo",
+        ("Helvetica", False, True): "heit", ("Helvetica", True, True): "hebi",
+    }[(family, bold, italic)]
+
+
+def _ruling_lines(page):
+    """
+    Returns the vertical and horizontal rules drawn on a page (table borders)
+    as lists of (x, y0, y1) and (y, x0, x1).
+    """
+    verticals, horizontals = [], []
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            if item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.x - p2.x) < 1:
+                    verticals.append((p1.x, min(p1.y, p2.y), max(p1.y, p2.y)))
+                elif abs(p1.y - p2.y) < 1:
+                    horizontals.append((p1.y, min(p1.x, p2.x), max(p1.x, p2.x)))
+            elif item[0] == "re":
+                rect = item[1]
+                if rect.width < 2:
+                    verticals.append(((rect.x0 + rect.x1) / 2, rect.y0, rect.y1))
+                elif rect.height < 2:
+                    horizontals.append(((rect.y0 + rect.y1) / 2, rect.x0, rect.x1))
+                else:
+                    verticals += [(rect.x0, rect.y0, rect.y1), (rect.x1, rect.y0, rect.y1)]
+                    horizontals += [(rect.y0, rect.x0, rect.x1), (rect.y1, rect.x0, rect.x1)]
+    return verticals, horizontals
+
+
+def _stamp_field_layout(page, span, marker_rect, verticals, horizontals, line_chars, fonts=None):
+    """
+    Works out the box, alignment and font a placeholder's value is drawn with.
+
+    The box is the table cell around the marker when there is one; otherwise
+    one line at the marker's position, centered on the page if the marker was.
+    When static text shares the marker's line, the value is anchored to the
+    marker's edge next to that text (right-aligned before it, left-aligned
+    after it), so it never runs into text that keeps its compiled position.
+    """
+    import fitz
+
+    y_mid = (marker_rect.y0 + marker_rect.y1) / 2
+    x_mid = (marker_rect.x0 + marker_rect.x1) / 2
+    left = [x for x, y0, y1 in verticals if x <= marker_rect.x0 + 1 and y0 <= y_mid <= y1]
+    right = [x for x, y0, y1 in verticals if x >= marker_rect.x1 - 1 and y0 <= y_mid <= y1]
+    below = [y for y, x0, x1 in horizontals if y >= marker_rect.y1 - 1 and x0 <= x_mid <= x1]
+    line_height = marker_rect.y1 - marker_rect.y0
+    inset = 2
+
+    if left and right:
+        box_left, box_right = max(left), min(right)
+        left_gap, right_gap = marker_rect.x0 - box_left, box_right - marker_rect.x1
+        if abs(left_gap - right_gap) < 3:
+            align = fitz.TEXT_ALIGN_CENTER
+        elif right_gap < left_gap:
+            align = fitz.TEXT_ALIGN_RIGHT
+        else:
+            align = fitz.TEXT_ALIGN_LEFT
+        x0, x1 = box_left + inset, box_right - inset
+    elif abs(x_mid - page.rect.width / 2) < 5:
+        align = fitz.TEXT_ALIGN_CENTER
+        margin = min(marker_rect.x0, 72)
+        x0, x1 = margin, page.rect.width - margin
+    else:
+        align = fitz.TEXT_ALIGN_LEFT
+        x0, x1 = marker_rect.x0, page.rect.width - min(marker_rect.x0, 72)
+    box_x0, box_x1 = x0, x1
+
+    # Static text on the marker's line, inside the cell or page margins.
+    if not (left and right):
+        margin = min(72, marker_rect.x0, page.rect.width - marker_rect.x1)
+        x0, x1 = margin, page.rect.width - margin
+    text_before = [rect.x1 for rect in line_chars if x0 <= rect.x1 <= marker_rect.x0 + 0.5]
+    text_after = [rect.x0 for rect in line_chars if marker_rect.x1 - 0.5 <= rect.x0 <= x1]
+    if not (text_before or text_after):
+        x0, x1 = box_x0, box_x1
+    elif text_after and not text_before:
+        align = fitz.TEXT_ALIGN_RIGHT
+        x1 = marker_rect.x1
+    elif text_before:
+        align = fitz.TEXT_ALIGN_LEFT
+        x0 = marker_rect.x0
+        if text_after:
+            x1 = min(text_after) - inset
+
+    # Starting the box at the marker's top puts the first baseline on the marker's.
+    y0 = marker_rect.y0
+    if left and right and below and not (text_before or text_after):
+        y1 = min(below) - inset
+    else:
+        y1 = marker_rect.y1 + line_height * 0.5
+
+    color = span["color"]
+    return {
+        "page": page.number,
+        "rect": [x0, y0, x1, max(y1, marker_rect.y1 + 1)],
+        "fontsize": round(span["size"], 2),
+        "fontname": _stamp_font(span, fonts),
+        "color": [((color >> 16) & 255) / 255, ((color >> 8) & 255) / 255, (color & 255) / 255],
+        "align": align,
+    }
+
+
+def _marker_hits(page, placeholders):
+    """
+    Yields (placeholder, marker rect) for every marker on a page.
+    """
+    for index, placeholder in enumerate(placeholders):
+        for rect in page.search_for(_stamp_marker(index)):
+            yield placeholder, rect
+
+
+def build_stamp_layout(marker_pdf, placeholders, fonts=None):
+    """
+    Finds every placeholder marker in a PDF rendered with marker values and
+    returns {placeholder: [field layout, ...]}, one layout per occurrence.
+    Placeholders that cannot be found are left out. fonts is the template's
+    template_embedded_fonts(), used in place of base-14 fonts when it has the
+    font a marker was drawn in.
+    """
+    import fitz
+
+    layout = {}
+    with fitz.open(stream=marker_pdf, filetype="pdf") as doc:
+        for page in doc:
+            verticals, horizontals = _ruling_lines(page)
+            spans = [
+                span
+                for block in page.get_text("rawdict")["blocks"]
+                for line in block.get("lines", [])
+                for span in line["spans"]
+            ]
+            chars = [
+                fitz.Rect(char["bbox"])
+                for span in spans
+                for char in span["chars"]
+                if not char["c"].isspace()
+            ]
+            for placeholder, rect in _marker_hits(page, placeholders):
+                # The span this occurrence of the marker was drawn in.
+                y_mid = (rect.y0 + rect.y1) / 2
+                span = next(
+                    (
+                        sp for sp in spans
+                        if sp["bbox"][1] <= y_mid <= sp["bbox"][3]
+                        and sp["bbox"][0] - 0.5 <= (rect.x0 + rect.x1) / 2 <= sp["bbox"][2] + 0.5
+                    ),
+                    None,
+                )
+                if span is None:
+                    continue
+                line_chars = [
+                    char for char in chars
+                    if char.y0 <= y_mid <= char.y1
+                    and not (rect.x0 - 0.5 <= (char.x0 + char.x1) / 2 <= rect.x1 + 0.5)
+                ]
+                layout.setdefault(placeholder, []).append(
+                    _stamp_field_layout(page, span, rect, verticals, horizontals, line_chars, fonts)
+                )
+    return layout
+
+
+def redact_stamp_markers(marker_pdf, placeholders):
+    """
+    Removes the marker text from a PDF rendered with marker values and
+    returns the result as bytes. Only the markers' glyphs go: static text,
+    images and ruling lines stay exactly where they were.
+    """
+    import fitz
+
+    with fitz.open(stream=marker_pdf, filetype="pdf") as doc:
+        for page in doc:
+            hits = list(_marker_hits(page, placeholders))
+            if not hits:
+                continue
+            for _, rect in hits:
+                # Shrink the box so neighbouring glyphs are not caught.
+                height = rect.y1 - rect.y0
+                page.add_redact_annot(
+                    fitz.Rect(rect.x0 + 0.5, rect.y0 + height * 0.25, rect.x1 - 0.5, rect.y1 - height * 0.25),
+                    fill=False,
+                )
+            options = {"images": fitz.PDF_REDACT_IMAGE_NONE}
+            # Line art handling (and the graphics= option) arrived in PyMuPDF
+            # 1.24.2; older releases never remove it.
+            if hasattr(fitz, "PDF_REDACT_LINE_ART_NONE"):
+                options["graphics"] = fitz.PDF_REDACT_LINE_ART_NONE
+            page.apply_redactions(**options)
+        return doc.tobytes(garbage=3, deflate=True)
+
+
+def compile_stamp_template(template_path):
+    """
+    Converts a DOCX template to a blank PDF plus a placeholder layout, using
+    LibreOffice once. The result is stored under STAMP_DIR keyed by the
+    template's SHA-256, so this only happens once per template version.
+
+    Returns:
+      {"pdf": blank PDF bytes, "fields": {placeholder: [layout, ...]},
+      "fonts": {font key: font bytes}} or None if some placeholder could not
+      be located (the DOCX path is used instead).
+    """
+    from docxtpl import DocxTemplate
+
+    key = _file_sha256(template_path)
+    name = os.path.splitext(os.path.basename(template_path))[0]
+    prefix = os.path.join(STAMP_DIR, f"{name}-{key}-v{STAMP_FORMAT_VERSION}")
+    pdf_path = f"{prefix}.pdf"
+    layout_path = f"{prefix}.json"
+
+    if os.path.exists(pdf_path) and os.path.exists(layout_path):
+        with open(layout_path) as f:
+            compiled = json.load(f)
+        if compiled is None:
+            return None
+        with open(pdf_path, "rb") as f:
+            blank_pdf = f.read()
+        fonts = {}
+        for font_key in compiled["fonts"]:
+            with open(f"{prefix}-{font_key}.ttf", "rb") as f:
+                fonts[font_key] = f.read()
+        return {"pdf": blank_pdf, "fields": compiled["fields"], "fonts": fonts}
+
+    placeholders = sorted(DocxTemplate(template_path).get_undeclared_template_variables())
+    marker_context = {p: _stamp_marker(i) for i, p in enumerate(placeholders)}
+    marker_pdf = convert_docx_bytes_to_pdf(render_docx_bytes(template_path, marker_context), f"{name}_markers")
+    embedded_fonts = template_embedded_fonts(template_path)
+
+    fields = build_stamp_layout(marker_pdf, placeholders, embedded_fonts)
+    blank_pdf = redact_stamp_markers(marker_pdf, placeholders)
+    fonts = {
+        field["fontname"]: embedded_fonts[field["fontname"]]
+        for occurrences in fields.values()
+        for field in occurrences
+        if field["fontname"] in embedded_fonts
+    }
+    missing = [p for p in placeholders if p not in fields]
+    if missing:
+        print(f"Stamp layout for {template_path} is missing {', '.join(missing)}; using DOCX rendering")
+
+    os.makedirs(STAMP_DIR, exist_ok=True)
+    with open(pdf_path, "wb") as f:
+        f.write(blank_pdf)
+    for font_key, data in fonts.items():
+        with open(f"{prefix}-{font_key}.ttf", "wb") as f:
+            f.write(data)
+    with open(layout_path, "w") as f:
+        json.dump(None if missing else {"fields": fields, "fonts": sorted(fonts)}, f, indent=1)
+    print(f"Compiled stamp template {template_path} -> {pdf_path}")
+    if missing:
+        return None
+    return {"pdf": blank_pdf, "fields": fields, "fonts": fonts}
+
+
+def get_stamp_template(template_path):
+    """
+    Returns the compiled stamp template for template_path, compiling it on
+    first use, or None when stamping is disabled or not possible.
+    """
+    if WORKBOOK_RENDERER != "stamp":
+        return None
+    key = (os.path.abspath(template_path), os.path.getmtime(template_path))
+    with _stamp_templates_lock:
+        if key not in _stamp_templates:
+            try:
+                _stamp_templates[key] = compile_stamp_template(template_path)
+            except Exception as e:
+                print(f"Could not compile stamp template {template_path}: {e}")
+                _stamp_templates[key] = None
+        return _stamp_templates[key]
+
+
+@timed_stage("stamp_template_pdf")
+def stamp_template_pdf(stamp, context):
+    """
+    Draws the context values onto a compiled template and returns PDF bytes.
+    Text wraps inside each field's box; values that do not fit are shrunk
+    down to STAMP_MIN_FONT_SIZE and, failing that, allowed to run past the box.
+    Template fonts are embedded as needed and subset to the glyphs used.
+    """
+    import fitz
+
+    with fitz.open(stream=stamp["pdf"], filetype="pdf") as doc:
+        embedded = set()
+        for placeholder, occurrences in stamp["fields"].items():
+            text = context.get(placeholder, "")
+            if text is None or str(text) == "":
+                continue
+            for field in occurrences:
+                page = doc[field["page"]]
+                fontname = field["fontname"]
+                font = stamp["fonts"].get(fontname)
+                if font is not None and (page.number, fontname) not in embedded:
+                    page.insert_font(fontname=fontname, fontbuffer=font)
+                    embedded.add((page.number, fontname))
+                rect = fitz.Rect(field["rect"])
+                size = field["fontsize"]
+                while True:
+                    written = page.insert_textbox(
+                        rect, str(text), fontsize=size, fontname=fontname,
+                        color=field["color"], align=field["align"]
+                    )
+                    if written >= 0:
+                        break
+                    if size <= STAMP_MIN_FONT_SIZE:
+                        # insert_textbox() writes nothing on overflow; let the text
+                        # run past the box rather than lose it.
+                        rect = fitz.Rect(rect.x0, rect.y0, rect.x1, page.rect.y1)
+                        page.insert_textbox(
+                            rect, str(text), fontsize=size, fontname=fontname,
+                            color=field["color"], align=field["align"]
+                        )
+                        break
+                    size = max(STAMP_MIN_FONT_SIZE, size - 0.5)
+        if embedded:
+            doc.subset_fonts()
+        return doc.tobytes(garbage=3, deflate=True)
+
+
+# Content-addressed cache of rendered page PDFs. The key is a hash of the
+# template bytes, the renderer and the canonicalized context, so a page is
+# only rendered again when one of its inputs changes. The cache directory is
+# kept under RENDER_CACHE_MAX_BYTES by evicting least recently used entries.
+RENDER_CACHE_ENABLED = os.environ.get("RENDER_CACHE", "1") == "1"
+RENDER_CACHE_DIR = os.environ.get("RENDER_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "workbook_render_cache")
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+render_cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_render_cache_lock = threading.Lock()
+_render_cache_bytes = None
+_template_digests = {}
+
+
+def _template_digest(template_path):
+    stat = os.stat(template_path)
+    key = (os.path.abspath(template_path), stat.st_mtime, stat.st_size)
+    if key not in _template_digests:
+        _template_digests[key] = _file_sha256(template_path)
+    return _template_digests[key]
+
+
+def render_cache_key(template_path, context):
+    """
+    Hash of (template bytes, renderer, canonical JSON of the context).
+    """
+    digest = hashlib.sha256()
+    digest.update(_template_digest(template_path).encode())
+    renderer = f"stamp-v{STAMP_FORMAT_VERSION}" if WORKBOOK_RENDERER == "stamp" else WORKBOOK_RENDERER
+    digest.update(renderer.encode())
+    digest.update(json.dumps(context, sort_keys=True, default=str, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+def _render_cache_path(key):
+    return os.path.join(RENDER_CACHE_DIR, key[:2], f"{key}.pdf")
+
+
+def _render_cache_entries():
+    entries = []
+    for root, _, files in os.walk(RENDER_CACHE_DIR):
+        for file_name in files:
+            if file_name.endswith(".pdf"):
+                path = os.path.join(root, file_name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+    return entries
+
+
+def render_cache_get(key):
+    """
+    Returns the cached PDF bytes for key, or None. Hits refresh the entry's
+    mtime, which is what LRU eviction goes by.
+    """
+    if not RENDER_CACHE_ENABLED:
+        return None
+    path = _render_cache_path(key)
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+    except FileNotFoundError:
+        with _render_cache_lock:
+            render_cache_stats["misses"] += 1
+        increment("workbook_cache_misses_total", label="render")
+        return None
+    with _render_cache_lock:
+        render_cache_stats["hits"] += 1
+    increment("workbook_cache_hits_total", label="render")
+    return data
+
+
+def render_cache_put(key, pdf):
+    """
+    Stores a rendered PDF (bytes or path) under key and evicts the least
+    recently used entries if the cache is over RENDER_CACHE_MAX_BYTES.
+    """
+    global _render_cache_bytes
+    if not RENDER_CACHE_ENABLED:
+        return
+    if not isinstance(pdf, (bytes, bytearray)):
+        with open(pdf, "rb") as f:
+            pdf = f.read()
+    path = _render_cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp_path, path)
+
+    with _render_cache_lock:
+        render_cache_stats["stores"] += 1
+        if _render_cache_bytes is None:
+            _render_cache_bytes = sum(size for _, size, _ in _render_cache_entries())
+        else:
+            _render_cache_bytes += len(pdf)
+        if _render_cache_bytes <= RENDER_CACHE_MAX_BYTES:
+            return
+        # Other processes share the directory, so recount before evicting.
+        entries = sorted(_render_cache_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_path in entries:
+            if total <= RENDER_CACHE_MAX_BYTES * 0.9:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            render_cache_stats["evictions"] += 1
+        _render_cache_bytes = total
+
+
+def render_template_pdf(template_path, context, name="document"):
+    """
+    Produces the PDF for a filled template as bytes: from the render cache
+    when the same template and context were rendered before, else stamped onto
+    the precompiled page when available, otherwise rendered with docxtpl and
+    converted by LibreOffice.
+    """
+    key = render_cache_key(template_path, context)
+    cached = render_cache_get(key)
+    if cached is not None:
+        return cached
+    stamp = get_stamp_template(template_path)
+    if stamp is not None:
+        pdf = stamp_template_pdf(stamp, context)
+    else:
+        pdf = convert_docx_bytes_to_pdf(render_docx_bytes(template_path, context), name)
+    render_cache_put(key, pdf)
+    return pdf
+
+
+# Cohort analytics for the Team template: every matched participant's VIA
+# ranks and conflict scores are gathered into one matrix each, aggregated with
+# numpy in a few array operations, and drawn onto a single team page that is
+# appended to each Team workbook.
+TEAM_TEMPLATE = "Team"
+TEAM_TOP_STRENGTHS = 5
+# Rank bands drawn as each strength's distribution bar.
+TEAM_RANK_BANDS = ((1, 6), (7, 12), (13, 18), (19, 24))
+TEAM_PAGE_FILENAME = "Team_Summary.pdf"
+
+
+@timed_stage("cohort_analytics")
+def cohort_analytics(strength_lists, conflict_contexts):
+    """
+    Aggregates a cohort's VIA ranks and conflict-style scores.
+
+    Parameters:
+      strength_lists: One parsed VIA results list ([(rank, strength), ...])
+        per participant, as returned by parse_via_pdf().
+      conflict_contexts: One conflict context per participant, in the same
+        order, as returned by score_conflict_csv().
+
+    Returns:
+      A JSON-serializable dict with "participants", "strengths" (one entry per
+      strength with mean/median rank, top-5 count and rank-band counts, best
+      mean rank first) and "conflict_styles" (one entry per style with
+      mean/median score, how many participants it is the top style for, and a
+      histogram of totals).
+    """
+    import numpy as np
+
+    strength_names = list(STRENGTH_DATA)
+    columns = {name: j for j, name in enumerate(strength_names)}
+    count = len(strength_lists)
+
+    # N x 24 rank matrix; NaN where a participant's PDF lacked a strength.
+    rows, cols, values = [], [], []
+    for i, strengths in enumerate(strength_lists):
+        seen = set()
+        for rank, strength in strengths:
+            j = columns.get(strength.title())
+            if j is not None and j not in seen:
+                seen.add(j)
+                rows.append(i)
+                cols.append(j)
+                values.append(rank)
+    ranks = np.full((count, len(strength_names)), np.nan)
+    ranks[rows, cols] = values
+
+    # N x 5 conflict matrix, in template style order.
+    styles = list(CONFLICT_STYLE_KEYS)
+    scores = np.array(
+        [[context[CONFLICT_STYLE_KEYS[style]] for style in styles] for context in conflict_contexts],
+        dtype=np.int64,
+    ).reshape(count, len(styles))
+
+    # Strengths nobody has a rank for come out as NaN rather than warnings.
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean_rank = np.nanmean(ranks, axis=0)
+        median_rank = np.nanmedian(ranks, axis=0)
+    top_counts = (ranks <= TEAM_TOP_STRENGTHS).sum(axis=0)
+    band_counts = np.stack([((ranks >= low) & (ranks <= high)).sum(axis=0) for low, high in TEAM_RANK_BANDS])
+
+    # A participant tied between styles counts towards each of them.
+    top_style = scores == scores.max(axis=1, keepdims=True)
+    max_total = max(SCORE_MAP.values()) * max(
+        list(QUESTION_CATEGORIES.values()).count(style) for style in styles
+    )
+    histograms = (scores[:, :, None] == np.arange(max_total + 1)).sum(axis=0)
+
+    def number(value):
+        return None if np.isnan(value) else round(float(value), 2)
+
+    strengths = [
+        {
+            "strength": name,
+            "mean_rank": number(mean_rank[j]),
+            "median_rank": number(median_rank[j]),
+            "top5_count": int(top_counts[j]),
+            "bands": [int(band) for band in band_counts[:, j]],
+        }
+        for j, name in enumerate(strength_names)
+    ]
+    strengths.sort(key=lambda entry: (entry["mean_rank"] is None, entry["mean_rank"] or 0, entry["strength"]))
+
+    conflict_styles = [
+        {
+            "style": style,
+            "mean": round(float(scores[:, k].mean()), 2) if count else None,
+            "median": float(np.median(scores[:, k])) if count else None,
+            "top_style_count": int(top_style[:, k].sum()),
+            "histogram": {str(total): int(n) for total, n in enumerate(histograms[k]) if n},
+        }
+        for k, style in enumerate(styles)
+    ]
+    return {"participants": count, "strengths": strengths, "conflict_styles": conflict_styles}
+
+
+@timed_stage("render_team_page")
+def render_team_page(analytics, term, cohort):
+    """
+    Draws the team summary page for cohort_analytics() results.
+
+    Returns:
+      The one-page PDF as bytes. The output is byte-for-byte reproducible for
+      the same inputs, so it can be hashed into a CohortManifest.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    band_colors = [colors.HexColor(c) for c in ("#1f4e79", "#5b9bd5", "#bdd7ee", "#e7e6e6")]
+    packet = BytesIO()
+    c = canvas.Canvas(packet, pagesize=letter, invariant=1)
+    width, height = letter
+    left, right = 54, width - 54
+    count = analytics["participants"]
+
+    y = height - 60
+    c.setFont("Times-Bold", 18)
+    c.drawString(left, y, f"Team Profile: {cohort}")
+    c.setFont("Times-Roman", 11)
+    y -= 18
+    c.drawString(left, y, f"{term} – {count} participant{'s' if count != 1 else ''}")
+
+    # Character strengths: one row per strength, best mean rank first.
+    y -= 30
+    c.setFont("Times-Bold", 13)
+    c.drawString(left, y, "Character Strengths")
+    y -= 16
+    name_x, bar_x, bar_width = left, left + 190, 180
+    mean_x, median_x, top_x = bar_x + bar_width + 45, bar_x + bar_width + 95, right
+    c.setFont("Times-Bold", 9)
+    c.drawString(bar_x, y, "Rank distribution")
+    c.drawRightString(mean_x, y, "Mean rank")
+    c.drawRightString(median_x, y, "Median")
+    c.drawRightString(top_x, y, f"In top {TEAM_TOP_STRENGTHS}")
+    y -= 4
+    for entry in analytics["strengths"]:
+        y -= 16
+        c.setFont("Times-Roman", 9)
+        c.drawString(name_x, y, entry["strength"])
+        offset = 0
+        for band, band_color in zip(entry["bands"], band_colors):
+            if count and band:
+                segment = bar_width * band / count
+                c.setFillColor(band_color)
+                c.rect(bar_x + offset, y - 2, segment, 10, stroke=0, fill=1)
+                offset += segment
+        c.setFillColor(colors.black)
+        for x, value in ((mean_x, entry["mean_rank"]), (median_x, entry["median_rank"])):
+            c.drawRightString(x, y, "–" if value is None else f"{value:.1f}")
+        c.drawRightString(top_x, y, str(entry["top5_count"]))
+
+    # Legend for the rank bands.
+    y -= 18
+    x = bar_x
+    c.setFont("Times-Roman", 8)
+    for (low, high), band_color in zip(TEAM_RANK_BANDS, band_colors):
+        c.setFillColor(band_color)
+        c.rect(x, y - 1, 8, 8, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.drawString(x + 11, y, f"Ranks {low}–{high}")
+        x += 62
+
+    # Conflict resolution styles.
+    y -= 34
+    c.setFont("Times-Bold", 13)
+    c.drawString(left, y, "Conflict Resolution Styles")
+    y -= 16
+    c.setFont("Times-Bold", 9)
+    c.drawRightString(mean_x, y, "Mean score")
+    c.drawRightString(median_x, y, "Median")
+    c.drawRightString(top_x, y, "Top style")
+    c.drawString(bar_x, y, "Participants whose top style this is")
+    y -= 4
+    for entry in analytics["conflict_styles"]:
+        y -= 16
+        c.setFont("Times-Roman", 9)
+        c.drawString(name_x, y, entry["style"])
+        if count and entry["top_style_count"]:
+            c.setFillColor(band_colors[0])
+            c.rect(bar_x, y - 2, bar_width * entry["top_style_count"] / count, 10, stroke=0, fill=1)
+            c.setFillColor(colors.black)
+        for x, value in ((mean_x, entry["mean"]), (median_x, entry["median"])):
+            c.drawRightString(x, y, "–" if value is None else f"{value:.1f}")
+        c.drawRightString(top_x, y, str(entry["top_style_count"]))
+
+    c.showPage()
+    c.save()
+    return packet.getvalue()
+
+
+def build_team_page(participants, term, cohort):
+    """
+    Builds the team page for a cohort's matched participants.
+
+    Parameters:
+      participants: As for build_workbooks(), each with its "conflict_context".
+        The VIA PDFs come from parse_via_pdf_cached(), so they are normally
+        parsed already.
+      term, cohort: Values for the page heading.
+
+    Returns:
+      (cohort_analytics() dict, team page PDF bytes)
+    """
+    strength_lists = [
+        parse_via_pdf_cached(participant["via_pdf"], sha256=participant.get("via_sha256"))[1]
+        for participant in participants
+    ]
+    conflict_contexts = [participant["conflict_context"] for participant in participants]
+    analytics = cohort_analytics(strength_lists, conflict_contexts)
+    return analytics, render_team_page(analytics, term, cohort)
+
+
+# Upper bound on parallel batch workers. Each worker runs at most one soffice
+# process at a time, so this also caps concurrent LibreOffice processes.
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# The cap holds for the whole host: every batch worker process holds one slot,
+# an flock'ed file in BATCH_SLOT_DIR, so concurrent batches in any thread or
+# gunicorn worker share BATCH_MAX_WORKERS slots. The kernel releases a slot
+# when its holder exits.
+BATCH_SLOT_DIR = os.environ.get("BATCH_SLOT_DIR") or os.path.join(tempfile.gettempdir(), "workbook_batch_slots")
+BATCH_SLOT_POLL_INTERVAL = 0.5
+# Participants per task handed to a batch worker. A task converts its pages
+# in one LibreOffice run, so larger tasks start soffice less often; smaller
+# ones spread better across workers.
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", "4"))
+# Module settings that callers may change at runtime (benchmark.py does) and
+# that spawned batch workers would otherwise read back from the environment.
+BATCH_WORKER_SETTINGS = ("RENDER_CACHE_ENABLED", "RENDER_CACHE_DIR", "VIA_PARSE_CACHE_DIR", "STAMP_DIR", "WORKBOOK_RENDERER")
+
+
+@timed_stage("build_workbooks")
+def build_workbooks(participants, template_pdf, term, cohort, csv_path,
+                    conflict_template_path, sweet_template_path, output_folder, progress=None,
+                    team_pdf=None):
+    """
+    Builds workbooks for a list of matched participants in this process.
+
+    Pages are stamped onto precompiled templates when WORKBOOK_RENDERER=stamp.
+    Otherwise all DOCX pages are rendered into a private scratch directory
+    (tmpfs when available) and converted together. Each participant's workbook
+    is then assembled; only the final workbooks are written to output_folder.
+
+    Parameters:
+      participants: List of dicts with "name" (CSV name), "pdf_name" and "via_pdf",
+        plus an optional "conflict_context" from score_conflict_csv().
+      template_pdf: The workbook template (Open/Team/Tiny).
+      term, cohort: Values for the cover page.
+      csv_path: The conflict survey CSV.
+      conflict_template_path, sweet_template_path: DOCX templates.
+      output_folder: Folder for the final workbooks.
+      progress: Optional callback, called as progress(done, total, workbooks)
+        after each participant is finished.
+      team_pdf: Optional team page (see build_team_page()) appended to every
+        workbook.
+
+    Returns:
+      A list of dicts, one per participant in input order, with "name",
+      "pdf_name", "workbook" (path, or None on failure), "bytes_saved" by
+      output optimization, and "error".
+    """
+    results = []
+    with scratch_workspace("batch_") as scratch:
+        rendered = []
+        docx_paths = []
+        cache_keys = {}
+        for participant in participants:
+            csv_name = participant["name"]
+            safe_name = csv_name.replace(" ", "_")
+            result = {
+                "name": csv_name,
+                "pdf_name": participant["pdf_name"],
+                "workbook": None,
+                "bytes_saved": None,
+                "error": None,
+            }
+            results.append(result)
+            try:
+                conflict_context = participant.get("conflict_context")
+                if conflict_context is None:
+                    conflict_context = conflict_context_for_one(csv_path, csv_name)
+                if conflict_context is None:
+                    result["error"] = "No conflict survey row"
+                    continue
+
+                parsed_name, strengths = parse_via_pdf_cached(
+                    participant["via_pdf"], sha256=participant.get("via_sha256")
+                )
+                pages = {
+                    "Cover": (COVER_TEMPLATE_DOCX, build_cover_context(csv_name, term, cohort)),
+                    "SweetSpot": (
+                        sweet_template_path,
+                        build_sweet_spot_context(strengths, STRENGTH_DATA, csv_name),
+                    ),
+                    "ConflictStyle3": (conflict_template_path, conflict_context),
+                }
+
+                # Take pages from the render cache or stamp them straight to
+                # PDF where possible; the rest are rendered to DOCX and
+                # converted together below.
+                sources = {}
+                for page_name, (template_path, context) in pages.items():
+                    cache_key = render_cache_key(template_path, context)
+                    cached = render_cache_get(cache_key)
+                    if cached is not None:
+                        sources[page_name] = cached
+                        continue
+                    stamp = get_stamp_template(template_path)
+                    if stamp is not None:
+                        sources[page_name] = stamp_template_pdf(stamp, context)
+                        render_cache_put(cache_key, sources[page_name])
+                        continue
+                    docx_path = os.path.join(scratch, f"{safe_name}_{page_name}.docx")
+                    with open(docx_path, "wb") as f:
+                        f.write(render_docx_bytes(template_path, context))
+                    docx_paths.append(docx_path)
+                    cache_keys[docx_path] = cache_key
+                    sources[page_name] = docx_path
+            except Exception as e:
+                print(f"Failed to render pages for {csv_name}: {e}")
+                result["error"] = str(e)
+                continue
+
+            rendered.append((result, participant, sources))
+
+        try:
+            # The LibreOffice profile lives in the scratch directory too, so
+            # it is removed with it when this batch is done.
+            pdf_paths = convert_many_to_pdf_via_libreoffice(
+                docx_paths, scratch, profile_dir=os.path.join(scratch, "lo_profile")
+            )
+        except Exception as e:
+            # Files a batch run leaves unconverted are retried by
+            # convert_many_to_pdf_via_libreoffice() itself; this only covers
+            # errors that stop it outright, such as a missing soffice binary.
+            print(f"Batch conversion failed ({e}); converting files one at a time")
+            pdf_paths = {}
+            for docx_path in docx_paths:
+                try:
+                    pdf_paths[docx_path] = convert_to_pdf_via_libreoffice(docx_path, scratch)
+                except Exception as file_error:
+                    print(f"Failed to convert {docx_path}: {file_error}")
+
+        for docx_path, pdf_path in pdf_paths.items():
+            render_cache_put(cache_keys[docx_path], pdf_path)
+
+        # Only the finished workbooks leave the scratch directory.
+        for result, participant, sources in rendered:
+            try:
+                pdfs = {}
+                for page_name, source in sources.items():
+                    if isinstance(source, bytes):
+                        pdfs[page_name] = source
+                    elif source in pdf_paths:
+                        pdfs[page_name] = pdf_paths[source]
+                    else:
+                        raise RuntimeError(f"Conversion failed for {source}")
+
+                final_workbook_pdf = workbook_output_path(output_folder, result["name"])
+                sizes = assemble_workbook(
+                    template_pdf=template_pdf,
+                    cover_pdf=pdfs["Cover"],
+                    via_pdf=participant["via_pdf"],
+                    sweet_pdf=pdfs["SweetSpot"],
+                    conflict_pdf=pdfs["ConflictStyle3"],
+                    output_pdf=final_workbook_pdf,
+                    team_pdf=team_pdf
+                )
+                result["workbook"] = final_workbook_pdf
+                result["bytes_saved"] = sizes["bytes_saved"]
+            except Exception as e:
+                print(f"Failed to assemble workbook for {result['name']}: {e}")
+                result["error"] = str(e)
+            if progress:
+                progress(
+                    len([r for r in results if r["workbook"]]),
+                    len(participants),
+                    [r["workbook"] for r in results if r["workbook"]],
+                )
+
+    return results
+
+
+def workbook_output_path(output_folder, participant_name):
+    return os.path.join(output_folder, f"{participant_name.replace(' ', '_')}_workbook.pdf")
+
+
+def conflict_csv_row_hashes(csv_path):
+    """
+    Returns a dict mapping each stripped participant name to a hash of that
+    participant's raw CSV row. As in score_conflict_csv(), the first row wins.
+    """
+    import csv
+
+    hashes = {}
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            name = (row.get("First and Last Name") or "").strip()
+            if name and name not in hashes:
+                encoded = json.dumps(row, sort_keys=True).encode("utf-8")
+                hashes[name] = hashlib.sha256(encoded).hexdigest()
+    return hashes
+
+
+class CohortManifest:
+    """
+    Remembers the inputs each workbook of a cohort was built from, so a rerun
+    only rebuilds participants whose inputs changed.
+
+    The manifest lives at <manifest_folder>/manifests/<term>_<cohort>.json. For
+    each participant it records where the workbook was written and the hashes
+    of its inputs: the VIA PDF bytes, the participant's CSV row, the template
+    PDF and DOCX files, the term and cohort, and the team page when there is
+    one (so a Team workbook is rebuilt whenever its cohort's summary changes).
+    """
+
+    # Bump when a code change alters the pages produced from the same inputs.
+    VERSION = 4
+
+    def __init__(self, manifest_folder, term, cohort, template_pdf, template_paths, csv_path, team_pdf=None):
+        safe_key = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{term}_{cohort}")
+        self.path = os.path.join(manifest_folder, "manifests", f"{safe_key}.json")
+        self.term = term
+        self.cohort = cohort
+        self.template = os.path.basename(template_pdf)
+        self.template_hashes = {
+            os.path.basename(path): _file_sha256(path) for path in [template_pdf] + list(template_paths)
+        }
+        self.row_hashes = conflict_csv_row_hashes(csv_path)
+        self.team_page = hashlib.sha256(team_pdf).hexdigest() if team_pdf is not None else None
+        self.entries = {}
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.entries = data["workbooks"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def inputs(self, participant):
+        return {
+            "via_pdf": participant.get("via_sha256") or _file_sha256(participant["via_pdf"]),
+            "csv_row": self.row_hashes.get(participant["name"]),
+            "template": self.template,
+            "template_files": self.template_hashes,
+            "term": self.term,
+            "cohort": self.cohort,
+            "team_page": self.team_page,
+        }
+
+    def split(self, participants):
+        """
+        Returns (to_build, reused): participants whose workbook must be built,
+        and those whose recorded workbook is complete and was built from
+        identical inputs.
+        """
+        to_build, reused = [], []
+        for participant in participants:
+            participant["manifest_inputs"] = self.inputs(participant)
+            entry = self.entries.get(participant["name"])
+            if (
+                entry is not None
+                and entry["inputs"] == participant["manifest_inputs"]
+                and workbook_is_complete(entry["workbook"])
+            ):
+                reused.append(participant)
+            else:
+                to_build.append(participant)
+        return to_build, reused
+
+    def reuse(self, participant, output_folder):
+        """
+        Makes a reused participant's workbook available in output_folder
+        (hard-linked when possible) and returns its path there.
+        """
+        entry = self.entries[participant["name"]]
+        target = workbook_output_path(output_folder, participant["name"])
+        if os.path.abspath(entry["workbook"]) != os.path.abspath(target):
+            try:
+                os.link(entry["workbook"], target)
+            except OSError:
+                shutil.copyfile(entry["workbook"], target)
+            entry["workbook"] = target
+        return target
+
+    def record(self, participants, results):
+        """
+        Records the inputs of every workbook that was built successfully.
+        """
+        inputs_by_name = {participant["name"]: participant.get("manifest_inputs") for participant in participants}
+        for result in results:
+            inputs = inputs_by_name.get(result["name"])
+            if result["workbook"] and inputs is not None:
+                self.entries[result["name"]] = {"inputs": inputs, "workbook": result["workbook"]}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.VERSION, "workbooks": self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+def workbook_is_complete(path):
+    """
+    True if path holds a finished workbook: a PDF whose trailer was written.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(5) != b"%PDF-":
+                return False
+            f.seek(max(0, os.path.getsize(path) - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+@contextmanager
+def batch_worker_slots(wanted):
+    """
+    Reserves up to `wanted` of the host's BATCH_MAX_WORKERS batch worker
+    slots, waiting until at least one is free. Yields the number reserved;
+    the slots are released on exit.
+    """
+    import fcntl
+
+    os.makedirs(BATCH_SLOT_DIR, exist_ok=True)
+    held = []
+    try:
+        while True:
+            for index in range(BATCH_MAX_WORKERS):
+                if len(held) >= wanted:
+                    break
+                slot = open(os.path.join(BATCH_SLOT_DIR, f"slot-{index}.lock"), "a")
+                try:
+                    # flock locks belong to the open file, so slots held by
+                    # other threads of this process block too.
+                    fcntl.flock(slot, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    held.append(slot)
+                except BlockingIOError:
+                    slot.close()
+            if held:
+                break
+            time.sleep(BATCH_SLOT_POLL_INTERVAL)
+        yield len(held)
+    finally:
+        for slot in held:
+            slot.close()
+
+
+_batch_progress_queue = None
+
+
+def _init_batch_worker(settings, progress_queue=None):
+    # Runs first in every spawned batch worker.
+    global _batch_progress_queue
+    globals().update(settings)
+    _batch_progress_queue = progress_queue
+
+
+def _build_workbooks_chunk(kwargs, labels=None):
+    # Runs in a worker process: record this chunk's metrics under the
+    # caller's labels and hand them back for merging. Each workbook is sent
+    # to the parent as soon as it is written.
+    reset_metrics()
+    reported = set()
+
+    def report(done, total, workbooks):
+        for workbook in workbooks:
+            if workbook not in reported:
+                reported.add(workbook)
+                if _batch_progress_queue is not None:
+                    _batch_progress_queue.put(workbook)
+
+    with metric_labels(**(labels or {})):
+        results = build_workbooks(progress=report, **kwargs)
+    return results, metrics_snapshot()
+
+
+def run_batch_jobs(participants, max_workers=None, progress=None, **kwargs):
+    """
+    Runs build_workbooks() across a pool of worker processes.
+
+    The participants are split into chunks of BATCH_CHUNK_SIZE; a worker
+    converts each chunk in a single LibreOffice run. Output file names depend
+    only on the participant, so the result does not depend on scheduling.
+
+    Workers are spawned rather than forked, so they never inherit locks held
+    by other threads of this process, and each holds one batch worker slot
+    (see batch_worker_slots()) for as long as the pool runs.
+
+    Parameters:
+      participants: As for build_workbooks().
+      max_workers: Most processes to use; defaults to BATCH_MAX_WORKERS. Fewer
+        are used while other batches hold slots.
+      progress: Optional progress(done, total, workbooks) callback, called
+        in this process as each workbook is written.
+      **kwargs: The remaining build_workbooks() arguments.
+
+    Returns:
+      The build_workbooks() results, in the same order as participants.
+    """
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    workers = max(1, min(max_workers or BATCH_MAX_WORKERS, BATCH_MAX_WORKERS, len(participants)))
+    # A profiled run stays in this process so the profiler sees every stage.
+    if workers == 1 or profiling_active():
+        return build_workbooks(participants, progress=progress, **kwargs)
+
+    results_by_name = {}
+    workbooks = []
+    context = multiprocessing.get_context("spawn")
+    progress_queue = context.Queue() if progress else None
+    settings = {name: globals()[name] for name in BATCH_WORKER_SETTINGS}
+
+    def finished(workbook):
+        if workbook not in workbooks:
+            workbooks.append(workbook)
+            progress(len(workbooks), len(participants), list(workbooks))
+
+    with batch_worker_slots(workers) as slots, ProcessPoolExecutor(
+        max_workers=slots,
+        mp_context=context,
+        initializer=_init_batch_worker,
+        initargs=(settings, progress_queue),
+    ) as executor:
+        # Never fewer chunks than workers, so a small batch still fans out.
+        chunk_size = max(1, min(BATCH_CHUNK_SIZE, len(participants) // slots))
+        chunks = [participants[i:i + chunk_size] for i in range(0, len(participants), chunk_size)]
+        futures = {
+            executor.submit(
+                _build_workbooks_chunk, dict(kwargs, participants=chunk), current_metric_labels()
+            ): chunk
+            for chunk in chunks
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            while progress_queue is not None:
+                try:
+                    finished(progress_queue.get_nowait())
+                except queue.Empty:
+                    break
+            for future in done:
+                chunk = futures[future]
+                try:
+                    chunk_results, chunk_metrics = future.result()
+                    merge_metrics(chunk_metrics)
+                except Exception as e:
+                    # The worker process itself died; fail every participant it held.
+                    print(f"Batch worker failed: {e}")
+                    chunk_results = [
+                        {"name": p["name"], "pdf_name": p["pdf_name"], "workbook": None, "bytes_saved": None, "error": str(e)}
+                        for p in chunk
+                    ]
+                for result in chunk_results:
+                    results_by_name[result["name"]] = result
+                    # Covers workbooks whose queue message has not arrived yet.
+                    if progress and result["workbook"]:
+                        finished(result["workbook"])
+
+    return [results_by_name[p["name"]] for p in participants]
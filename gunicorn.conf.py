@@ -0,0 +1,31 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts in this folder.
+
+The master runs functions.warmup() before forking, so the heavy libraries
+and the template files are loaded once and shared copy-on-write by every
+worker. Per-worker services (LibreOffice pool, workspace janitor) start in
+post_fork. Set WORKBOOK_WARMUP=0 to skip the warmup.
+"""
+import os
+
+from functions import LIBREOFFICE_CONVERT_TIMEOUT
+
+# Worker timeout. Batch requests run as background jobs (see GENERATE_ASYNC in
+# app3), so a request waits for at most one participant's three pages, and
+# each page gets up to three conversion attempts (a pooled instance, its retry
+# and the soffice fallback) of LIBREOFFICE_CONVERT_TIMEOUT seconds each.
+# GUNICORN_TIMEOUT overrides it.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT") or 3 * 3 * LIBREOFFICE_CONVERT_TIMEOUT + 60)
+
+
+def on_starting(server):
+    if os.environ.get("WORKBOOK_WARMUP", "1") == "1":
+        from functions import warmup
+
+        warmup()
+
+
+def post_fork(server, worker):
+    from app3 import start_worker_services
+
+    start_worker_services()
@@ -0,0 +1,48 @@
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+import pytest
+
+# The modules under test live at the repository root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app3 creates its output folders when imported; keep them out of the working
+# tree, and keep the janitor from running during tests.
+TEST_OUTPUT_DIR = tempfile.mkdtemp(prefix="workbook_tests_")
+os.environ["WORKBOOK_OUTPUT_DIR"] = TEST_OUTPUT_DIR
+os.environ["JANITOR_INTERVAL_SECONDS"] = "0"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_OUTPUT_DIR, ignore_errors=True)
+
+# Stands in for LibreOffice's soffice: writes a one-page PDF, named after the
+# document, for every DOCX on its command line.
+FAKE_SOFFICE = """#!{python}
+import os, sys
+from reportlab.pdfgen import canvas
+args = sys.argv[1:]
+outdir = args[args.index("--outdir") + 1]
+os.makedirs(outdir, exist_ok=True)
+for path in [a for a in args if a.endswith(".docx")]:
+    name = os.path.splitext(os.path.basename(path))[0]
+    page = canvas.Canvas(os.path.join(outdir, name + ".pdf"))
+    page.drawString(72, 720, name)
+    page.showPage()
+    page.save()
+"""
+
+
+@pytest.fixture
+def fake_soffice(tmp_path, monkeypatch):
+    """Puts a fake soffice first on PATH, for tests that need conversions but not their looks."""
+    bin_dir = tmp_path / "fake_soffice_bin"
+    bin_dir.mkdir()
+    soffice = bin_dir / "soffice"
+    soffice.write_text(FAKE_SOFFICE.format(python=sys.executable))
+    soffice.chmod(soffice.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return str(soffice)
@@ -0,0 +1,166 @@
+import io
+import os
+
+import pytest
+
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_PDF = os.path.join(REPO_ROOT, "resources", "bigTemplate.pdf")
+SAMPLE_VIA_PDF = os.path.join(REPO_ROOT, "output", "StrengthsProfile-Amy-Martin.pdf")
+
+
+def _page_pdf(label, pages=1):
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    page = canvas.Canvas(buffer, pagesize=(612, 792))
+    for number in range(pages):
+        page.drawString(72, 720, f"{label} {number}")
+        page.showPage()
+    page.save()
+    return buffer.getvalue()
+
+
+def _footer_numbers(pdf, margin=36):
+    """
+    The page number on every page ("" for none): digits ending `margin`
+    points from the right edge, with the baseline `margin` points up. Word
+    boxes are in unrotated page coordinates, which is also where the numbers
+    go on the template's landscape pages.
+    """
+    import fitz
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        numbers = []
+        for page in doc:
+            width, height = page.mediabox.width, page.mediabox.height
+            found = ""
+            for word in page.get_text("words"):
+                box = fitz.Rect(word[:4])
+                if word[4].isdigit() and abs(box.x1 - (width - margin)) < 2 and abs(box.y1 - (height - margin)) < 4:
+                    found = word[4]
+            numbers.append(found)
+        return numbers
+
+
+def _assemble(template_pdf=TEMPLATE_PDF, **options):
+    output = io.BytesIO()
+    functions.assemble_workbook(
+        template_pdf=template_pdf,
+        cover_pdf=_page_pdf("Cover"),
+        via_pdf=SAMPLE_VIA_PDF,
+        sweet_pdf=_page_pdf("Sweet Spot", pages=2),
+        conflict_pdf=_page_pdf("Conflict"),
+        output_pdf=output,
+        **options,
+    )
+    return output.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def templates_from_repo(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+
+
+def _expected_numbers(page_count, start_page_index=3, start_page_number=3):
+    return [
+        "" if index < start_page_index else str(start_page_number + index - start_page_index)
+        for index in range(page_count)
+    ]
+
+
+def test_assembled_workbook_is_numbered_from_the_fourth_page():
+    numbers = _footer_numbers(_assemble(optimize=False))
+    assert len(numbers) > 40
+    assert numbers == _expected_numbers(len(numbers))
+
+
+def test_overlay_numbers_without_private_pypdf_api(monkeypatch):
+    # As on a pypdf release without PdfWriter._add_object(). Merging overlays
+    # into the real template takes pypdf ~20 s, so a plain one is used.
+    monkeypatch.setattr(functions, "_writer_add_object", lambda writer: None)
+    numbers = _footer_numbers(_assemble(template_pdf=_page_pdf("Template", pages=14), optimize=False))
+    assert numbers == _expected_numbers(len(numbers))
+
+
+def test_page_numbers_survive_optimization():
+    numbers = _footer_numbers(_assemble(optimize=True))
+    assert numbers == _expected_numbers(len(numbers))
+
+
+def test_optimization_is_off_by_default(monkeypatch):
+    monkeypatch.setattr(functions, "optimize_pdf", lambda *a, **k: pytest.fail("optimized by default"))
+    output = io.BytesIO()
+    sizes = functions.assemble_workbook(
+        template_pdf=_page_pdf("Template", pages=14),
+        cover_pdf=_page_pdf("Cover"),
+        via_pdf=SAMPLE_VIA_PDF,
+        sweet_pdf=_page_pdf("Sweet Spot", pages=2),
+        conflict_pdf=_page_pdf("Conflict"),
+        output_pdf=output,
+    )
+    assert sizes["bytes_saved"] == 0
+
+
+def _page_texts(pdf):
+    import fitz
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        return [" ".join(page.get_text().split()) for page in doc]
+
+
+def test_matches_merge_then_paginate(tmp_path):
+    # The two-step path from before assemble_workbook(): write the merged
+    # workbook, then read it back and number it with overlays.
+    parts = {}
+    for name, pages in (("template", 14), ("cover", 1), ("sweet", 2), ("conflict", 1)):
+        parts[name] = tmp_path / f"{name}.pdf"
+        parts[name].write_bytes(_page_pdf(name.title(), pages=pages))
+    merged, paginated = tmp_path / "merged.pdf", tmp_path / "paginated.pdf"
+    functions.merge_custom_pages_by_index(
+        str(parts["template"]), str(parts["cover"]), SAMPLE_VIA_PDF,
+        str(parts["sweet"]), str(parts["conflict"]), str(merged),
+    )
+    functions.paginate_pdf(str(merged), str(paginated))
+
+    assembled = tmp_path / "assembled.pdf"
+    functions.assemble_workbook(
+        template_pdf=str(parts["template"]),
+        cover_pdf=str(parts["cover"]),
+        via_pdf=SAMPLE_VIA_PDF,
+        sweet_pdf=str(parts["sweet"]),
+        conflict_pdf=str(parts["conflict"]),
+        output_pdf=str(assembled),
+        optimize=False,
+    )
+
+    assert _page_texts(assembled.read_bytes()) == _page_texts(paginated.read_bytes())
+    assert _footer_numbers(assembled.read_bytes()) == _footer_numbers(paginated.read_bytes())
+    assert [path.name for path in tmp_path.iterdir() if path.name.endswith(".tmp")] == []
+
+
+def test_team_page_is_appended_and_numbered():
+    template = _page_pdf("Template", pages=14)
+    plain = _assemble(template_pdf=template, optimize=False)
+    with_team = _assemble(template_pdf=template, optimize=False, team_pdf=_page_pdf("Team Summary"))
+    texts = _page_texts(with_team)
+    assert texts[:-1] == _page_texts(plain)
+    assert texts[-1].startswith("Team Summary")
+    assert _footer_numbers(with_team) == _expected_numbers(len(texts))
+
+
+def test_optimization_shrinks_the_workbook_when_enabled(monkeypatch):
+    monkeypatch.setattr(functions, "WORKBOOK_OPTIMIZE", True)
+    output = io.BytesIO()
+    sizes = functions.assemble_workbook(
+        template_pdf=TEMPLATE_PDF,
+        cover_pdf=_page_pdf("Cover"),
+        via_pdf=SAMPLE_VIA_PDF,
+        sweet_pdf=_page_pdf("Sweet Spot", pages=2),
+        conflict_pdf=_page_pdf("Conflict"),
+        output_pdf=output,
+    )
+    assert sizes["bytes_saved"] > 0
+    assert sizes["bytes"] == len(output.getvalue())
+    assert _page_texts(output.getvalue()) == _page_texts(_assemble(optimize=False))
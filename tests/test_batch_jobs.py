@@ -0,0 +1,105 @@
+import glob
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import functions
+from cli import run_cohort
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDFS = sorted(glob.glob(os.path.join(REPO_ROOT, "output", "StrengthsProfile-*.pdf")))
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+
+
+@pytest.fixture
+def slots(monkeypatch, tmp_path):
+    monkeypatch.setattr(functions, "BATCH_SLOT_DIR", str(tmp_path / "slots"))
+    monkeypatch.setattr(functions, "BATCH_MAX_WORKERS", 2)
+    monkeypatch.setattr(functions, "BATCH_SLOT_POLL_INTERVAL", 0.05)
+
+
+def test_slots_never_exceed_the_cap(slots):
+    with functions.batch_worker_slots(5) as held:
+        assert held == 2
+
+
+def test_a_batch_takes_the_slots_that_are_free(slots):
+    with functions.batch_worker_slots(1):
+        with functions.batch_worker_slots(2) as held:
+            assert held == 1
+
+
+def test_a_batch_waits_until_a_slot_is_free(slots):
+    acquired = []
+
+    def second_batch():
+        with functions.batch_worker_slots(2) as held:
+            acquired.append(held)
+
+    with functions.batch_worker_slots(2):
+        thread = threading.Thread(target=second_batch)
+        thread.start()
+        time.sleep(0.3)
+        assert acquired == []
+    thread.join(5)
+    assert acquired == [2]
+
+
+def test_cohort_runs_in_spawned_workers(slots, fake_soffice, tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    render_cache = tmp_path / "render_cache"
+    monkeypatch.setattr(functions, "RENDER_CACHE_DIR", str(render_cache))
+    via_folder = tmp_path / "via"
+    via_folder.mkdir()
+    for path in SAMPLE_VIA_PDFS:
+        shutil.copy(path, via_folder)
+
+    summary = run_cohort(
+        str(via_folder), SAMPLE_CONFLICT_CSV, "Winter 2025", "A", output_folder=str(tmp_path / "out"), jobs=2
+    )
+
+    # Elizabeth Durkin has a VIA profile but no survey row.
+    assert summary["counts"]["matched"] == len(SAMPLE_VIA_PDFS) - 1
+    assert summary["counts"]["generated"] == summary["counts"]["matched"]
+    assert summary["counts"]["failed"] == 0
+    for entry in summary["matched"]:
+        assert functions.workbook_is_complete(entry["workbook"])
+    # The workers were spawned, so they only see this test's cache directory
+    # if run_batch_jobs() handed it over.
+    assert list(render_cache.rglob("*.pdf"))
+
+
+def test_progress_is_reported_for_each_workbook(slots, fake_soffice, tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(functions, "RENDER_CACHE_DIR", str(tmp_path / "render_cache"))
+    conflict_contexts = functions.score_conflict_csv(SAMPLE_CONFLICT_CSV)
+    participants = []
+    for path in SAMPLE_VIA_PDFS:
+        name, _ = functions.parse_via_pdf_fast(path)
+        if name in conflict_contexts:
+            participants.append(
+                {"name": name, "pdf_name": name, "via_pdf": path, "conflict_context": conflict_contexts[name]}
+            )
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    calls = []
+
+    results = functions.run_batch_jobs(
+        participants,
+        max_workers=2,
+        progress=lambda done, total, workbooks: calls.append((done, total, workbooks)),
+        template_pdf=functions.WORKBOOK_TEMPLATES["Open"],
+        term="Winter 2025",
+        cohort="A",
+        csv_path=SAMPLE_CONFLICT_CSV,
+        conflict_template_path=functions.CONFLICT_TEMPLATE_DOCX,
+        sweet_template_path=functions.SWEET_SPOT_TEMPLATE_DOCX,
+        output_folder=str(output_folder),
+    )
+
+    assert [done for done, _, _ in calls] == list(range(1, len(participants) + 1))
+    assert all(total == len(participants) for _, total, _ in calls)
+    assert sorted(calls[-1][2]) == sorted(result["workbook"] for result in results)
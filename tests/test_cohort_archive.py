@@ -0,0 +1,58 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import app3
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(app3, "WORKSPACES_FOLDER", str(tmp_path / "workspaces"))
+    return app3.create_workspace()
+
+
+def _workbook(workspace_id, name):
+    path = app3.workspace_path(workspace_id, f"{name}_workbook.pdf")
+    with open(path, "wb") as f:
+        f.write(f"%PDF {name}".encode())
+    return path
+
+
+def test_archive_grows_as_workbooks_finish(workspace):
+    archive = app3.CohortArchive(workspace)
+    first = _workbook(workspace, "Amy_Martin")
+    archive.add([first])
+    second = _workbook(workspace, "Jaime_Zsiros")
+    archive.add([first, second])
+    assert not os.path.exists(archive.path)
+
+    archive.finish()
+
+    with zipfile.ZipFile(archive.path) as zip_file:
+        assert zip_file.namelist() == ["Amy_Martin_workbook.pdf", "Jaime_Zsiros_workbook.pdf"]
+    assert not os.path.exists(archive.partial_path)
+
+
+def test_empty_batch_still_publishes_an_archive(workspace):
+    archive = app3.CohortArchive(workspace)
+    archive.finish()
+    with zipfile.ZipFile(archive.path) as zip_file:
+        assert zip_file.namelist() == []
+
+
+def test_archive_is_served_with_range_support(workspace):
+    archive = app3.CohortArchive(workspace)
+    client = app3.app.test_client()
+    assert client.get(archive.url).status_code == 404
+
+    archive.add([_workbook(workspace, "Amy_Martin")])
+    archive.finish()
+    whole = client.get(archive.url)
+    assert whole.status_code == 200
+    assert zipfile.ZipFile(io.BytesIO(whole.get_data())).namelist() == ["Amy_Martin_workbook.pdf"]
+
+    tail = client.get(archive.url, headers={"Range": "bytes=10-"})
+    assert tail.status_code == 206
+    assert tail.get_data() == whole.get_data()[10:]
@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+
+
+@pytest.fixture
+def survey_csv(tmp_path):
+    """
+    The sample survey plus a repeated respondent (whose first row must win),
+    a respondent with blank answers and one with padded answers.
+    """
+    df = pd.read_csv(SAMPLE_CONFLICT_CSV)
+    questions = [q for q in functions.QUESTION_CATEGORIES if q in df.columns]
+
+    repeated = df.iloc[[0]].copy()
+    repeated[questions] = "Always"
+
+    blank = df.iloc[[1]].copy()
+    blank["First and Last Name"] = "Blank Answers"
+    blank[questions[::2]] = None
+
+    padded = df.iloc[[1]].copy()
+    padded["First and Last Name"] = "Padded Answers"
+    padded[questions] = padded[questions].apply(lambda column: " " + column + " ")
+
+    path = tmp_path / "conflict.csv"
+    pd.concat([df, repeated, blank, padded]).to_csv(path, index=False)
+    return str(path)
+
+
+def test_batch_scores_match_per_participant_scores(survey_csv):
+    contexts = functions.score_conflict_csv(survey_csv)
+    names = pd.read_csv(survey_csv)["First and Last Name"].dropna().unique()
+    assert sorted(contexts) == sorted(names)
+    for name in names:
+        assert contexts[name] == functions.conflict_context_for_one(survey_csv, name), name
+
+
+def test_blank_answers_score_nothing(survey_csv):
+    contexts = functions.score_conflict_csv(survey_csv)
+    blank, full = contexts["Blank Answers"], contexts["Padded Answers"]
+    assert sum(blank[key] for key in functions.CONFLICT_STYLE_KEYS.values()) < sum(
+        full[key] for key in functions.CONFLICT_STYLE_KEYS.values()
+    )
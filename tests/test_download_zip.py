@@ -0,0 +1,77 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+import app3
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    paths = []
+    for i, size in enumerate((3 * app3.ZIP_STREAM_CHUNK + 17, 10, 0)):
+        path = tmp_path / f"Person_{i}_workbook.pdf"
+        path.write_bytes(os.urandom(size))
+        paths.append(str(path))
+    return paths
+
+
+def _unzip(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        return {info.filename: (info.compress_type, zip_file.read(info)) for info in zip_file.infolist()}
+
+
+def _contents(paths):
+    contents = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            contents[os.path.basename(path)] = f.read()
+    return contents
+
+
+def test_streamed_archive_holds_every_file_stored(workbooks):
+    entries = _unzip(b"".join(app3.stream_zip(workbooks)))
+    assert {name: data for name, (_, data) in entries.items()} == _contents(workbooks)
+    assert {compression for compression, _ in entries.values()} == {zipfile.ZIP_STORED}
+
+
+def test_compression_level_deflates_entries(workbooks):
+    entries = _unzip(b"".join(app3.stream_zip(workbooks, "6")))
+    assert {name: data for name, (_, data) in entries.items()} == _contents(workbooks)
+    assert {compression for compression, _ in entries.values()} == {zipfile.ZIP_DEFLATED}
+
+
+def test_archive_is_sent_one_chunk_at_a_time(workbooks):
+    chunks = list(app3.stream_zip(workbooks))
+    # A read chunk plus at most an entry header or descriptor.
+    assert max(len(chunk) for chunk in chunks) <= app3.ZIP_STREAM_CHUNK + 1024
+    assert len(chunks) > 3
+
+
+def test_missing_files_are_skipped(workbooks, tmp_path):
+    entries = _unzip(b"".join(app3.stream_zip([str(tmp_path / "gone.pdf")] + workbooks)))
+    assert sorted(entries) == sorted(os.path.basename(path) for path in workbooks)
+
+
+def test_download_all_streams_the_workspace_files(workbooks, tmp_path, monkeypatch):
+    monkeypatch.setattr(app3, "WORKSPACES_FOLDER", str(tmp_path / "workspaces"))
+    workspace_id = app3.create_workspace()
+    for path in workbooks:
+        os.replace(path, app3.workspace_path(workspace_id, os.path.basename(path)))
+    names = [os.path.basename(path) for path in workbooks]
+
+    response = app3.app.test_client().get(
+        "/download_all", query_string={"workspace": workspace_id, "files": names + ["../../etc/passwd"]}
+    )
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Disposition"] == "attachment; filename=workbooks.zip"
+    assert sorted(_unzip(response.get_data())) == sorted(names)
+
+
+def test_download_all_rejects_unknown_workspaces():
+    response = app3.app.test_client().get("/download_all", query_string={"workspace": "../output"})
+    assert response.status_code == 404
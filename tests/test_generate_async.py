@@ -0,0 +1,72 @@
+import io
+import os
+import runpy
+
+import pytest
+
+import app3
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CSV = b"First and Last Name\nAmy Martin\n"
+
+
+@pytest.fixture
+def runs(tmp_path, monkeypatch):
+    """Records whether each /generate job ran in the request or was queued."""
+    runs = []
+    monkeypatch.setattr(app3, "WORKSPACES_FOLDER", str(tmp_path / "workspaces"))
+    monkeypatch.setattr(app3, "run_batch", lambda *args, progress=None, incremental=False: "batch report")
+    monkeypatch.setattr(app3, "run_individual", lambda *args, progress=None: "individual report")
+
+    def submit_job(mode, job, job_id=None):
+        runs.append(("queued", mode))
+        return job_id
+
+    monkeypatch.setattr(app3, "submit_job", submit_job)
+    monkeypatch.setattr(app3, "render_job_page", lambda job_id: "job page")
+    return runs
+
+
+def _post(mode, **fields):
+    if mode == "batch":
+        data = {"batchDate": "Winter 2025", "batchCohort": "A", "conflictCSVBatch": (io.BytesIO(CSV), "c.csv"),
+                "viaFiles": [(io.BytesIO(b"%PDF Amy"), "Amy.pdf")]}
+    else:
+        data = {"participantName": "Amy Martin", "date": "Winter 2025", "cohort": "A",
+                "viaFile": (io.BytesIO(b"%PDF Amy"), "Amy.pdf"), "conflictCSV": (io.BytesIO(CSV), "c.csv")}
+    data.update(mode=mode, template="Open", **fields)
+    return app3.app.test_client().post("/generate", data=data, content_type="multipart/form-data")
+
+
+def test_batch_requests_run_in_the_background_by_default(runs):
+    assert _post("batch").get_data() == b"job page"
+    assert runs == [("queued", "batch")]
+
+
+def test_individual_requests_run_in_the_request_by_default(runs):
+    assert _post("individual").get_data() == b"individual report"
+    assert runs == []
+
+
+def test_the_request_can_choose(runs):
+    assert _post("batch", **{"async": "0"}).get_data() == b"batch report"
+    assert _post("individual", **{"async": "1"}).get_data() == b"job page"
+    assert runs == [("queued", "individual")]
+
+
+@pytest.mark.parametrize("setting, queued", [("0", []), ("1", [("queued", "batch"), ("queued", "individual")])])
+def test_generate_async_setting_applies_to_both_modes(runs, monkeypatch, setting, queued):
+    monkeypatch.setattr(app3, "ASYNC_JOBS_DEFAULT", setting)
+    _post("batch")
+    _post("individual")
+    assert runs == queued
+
+
+def test_worker_timeout_outlasts_the_conversion_deadlines(monkeypatch):
+    monkeypatch.delenv("GUNICORN_TIMEOUT", raising=False)
+    settings = runpy.run_path(os.path.join(REPO_ROOT, "gunicorn.conf.py"))
+    assert settings["timeout"] > 3 * 3 * functions.LIBREOFFICE_CONVERT_TIMEOUT
+
+    monkeypatch.setenv("GUNICORN_TIMEOUT", "90")
+    assert runpy.run_path(os.path.join(REPO_ROOT, "gunicorn.conf.py"))["timeout"] == 90
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDF = os.path.join(REPO_ROOT, "output", "StrengthsProfile-Amy-Martin.pdf")
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+
+
+@pytest.fixture
+def scratch_root(monkeypatch, tmp_path):
+    root = tmp_path / "scratch"
+    root.mkdir()
+    monkeypatch.setattr(functions, "SCRATCH_ROOT", str(root))
+    return root
+
+
+def test_scratch_workspace_is_removed_on_exit(scratch_root):
+    with functions.scratch_workspace() as scratch:
+        assert os.path.dirname(scratch) == str(scratch_root)
+        with open(os.path.join(scratch, "page.docx"), "wb") as f:
+            f.write(b"docx")
+    assert list(scratch_root.iterdir()) == []
+
+
+def test_scratch_workspace_is_removed_on_error(scratch_root):
+    with pytest.raises(RuntimeError):
+        with functions.scratch_workspace():
+            raise RuntimeError("conversion failed")
+    assert list(scratch_root.iterdir()) == []
+
+
+def test_pages_are_built_without_touching_the_output_folder(fake_soffice, scratch_root, tmp_path, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    output_folder = tmp_path / "out"
+    output_folder.mkdir()
+    person_name, results = functions.parse_via_pdf_fast(SAMPLE_VIA_PDF)
+
+    pages = [
+        functions.generate_cover_pdf(person_name, "Winter 2025", "A", str(output_folder), in_memory=True),
+        functions.fill_template(
+            results, functions.STRENGTH_DATA, person_name, functions.SWEET_SPOT_TEMPLATE_DOCX, in_memory=True
+        ),
+        functions.fill_conflict_docs_for_one(
+            SAMPLE_CONFLICT_CSV, functions.CONFLICT_TEMPLATE_DOCX, str(output_folder), person_name, in_memory=True
+        ),
+    ]
+
+    for pdf in pages:
+        assert isinstance(pdf, bytes) and pdf.startswith(b"%PDF")
+    assert list(output_folder.iterdir()) == []
+    assert list(scratch_root.iterdir()) == []
+
+
+def test_missing_conflict_row_returns_nothing(fake_soffice, scratch_root, monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    assert functions.fill_conflict_docs_for_one(
+        SAMPLE_CONFLICT_CSV, functions.CONFLICT_TEMPLATE_DOCX, None, "Nobody Here", in_memory=True
+    ) is None
+
+
+def test_via_pdf_bytes_parse_like_the_file():
+    with open(SAMPLE_VIA_PDF, "rb") as f:
+        pdf_bytes = f.read()
+    assert functions.parse_via_pdf_fast(pdf_bytes) == functions.parse_via_pdf_fast(SAMPLE_VIA_PDF)
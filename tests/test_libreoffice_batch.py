@@ -0,0 +1,93 @@
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+import functions
+
+# Stands in for soffice: writes a PDF for every DOCX it is given, except for
+# files named "stuck*" (it hangs) and "broken*" (it skips them and fails).
+FAKE_SOFFICE = """#!{python}
+import os, sys, time
+args = sys.argv[1:]
+outdir = args[args.index("--outdir") + 1]
+os.makedirs(outdir, exist_ok=True)
+failed = False
+for path in [a for a in args if a.endswith(".docx")]:
+    name = os.path.splitext(os.path.basename(path))[0]
+    if name.startswith("stuck"):
+        time.sleep(60)
+    if name.startswith("broken"):
+        failed = True
+        continue
+    with open(os.path.join(outdir, name + ".pdf"), "w") as f:
+        f.write("%PDF-1.4")
+sys.exit(1 if failed else 0)
+"""
+
+
+@pytest.fixture
+def docx_files(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    soffice = bin_dir / "soffice"
+    soffice.write_text(FAKE_SOFFICE.format(python=sys.executable))
+    soffice.chmod(soffice.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setattr(functions, "_libreoffice_pool", None)
+
+    def make(*names):
+        paths = []
+        for name in names:
+            path = tmp_path / f"{name}.docx"
+            path.write_bytes(b"")
+            paths.append(str(path))
+        return paths
+
+    return make
+
+
+@pytest.fixture
+def retried(monkeypatch):
+    calls = []
+
+    def convert_one(docx_path, output_dir=None):
+        calls.append(os.path.basename(docx_path))
+        if not os.path.basename(docx_path).startswith("broken"):
+            pdf_path = os.path.join(output_dir, os.path.splitext(os.path.basename(docx_path))[0] + ".pdf")
+            with open(pdf_path, "w") as f:
+                f.write("%PDF-1.4")
+            return pdf_path
+        raise RuntimeError("still broken")
+
+    monkeypatch.setattr(functions, "convert_to_pdf_via_libreoffice", convert_one)
+    return calls
+
+
+def test_batch_converts_every_file_in_one_run(docx_files, retried, tmp_path):
+    paths = docx_files("a", "b", "c")
+    pdf_paths = functions.convert_many_to_pdf_via_libreoffice(paths, str(tmp_path / "out"))
+    assert sorted(pdf_paths) == sorted(paths)
+    assert all(os.path.exists(pdf) for pdf in pdf_paths.values())
+    assert retried == []
+
+
+def test_only_files_without_a_pdf_are_converted_again(docx_files, retried, tmp_path):
+    paths = docx_files("a", "broken", "c")
+    pdf_paths = functions.convert_many_to_pdf_via_libreoffice(paths, str(tmp_path / "out"))
+    assert retried == ["broken.docx"]
+    assert sorted(os.path.basename(p) for p in pdf_paths) == ["a.docx", "c.docx"]
+
+
+def test_a_hung_batch_run_is_killed(docx_files, retried, tmp_path, monkeypatch):
+    monkeypatch.setattr(functions, "LIBREOFFICE_CONVERT_TIMEOUT", 1)
+    monkeypatch.setattr(functions, "LIBREOFFICE_BATCH_FILE_TIMEOUT", 0.1)
+    paths = docx_files("a", "stuck", "c")
+    started = time.monotonic()
+    pdf_paths = functions.convert_many_to_pdf_via_libreoffice(paths, str(tmp_path / "out"))
+    assert time.monotonic() - started < 30
+    # The run died on "stuck"; "a" was already written and is kept.
+    assert retried == ["stuck.docx", "c.docx"]
+    assert sorted(pdf_paths) == sorted(paths)
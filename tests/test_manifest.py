@@ -0,0 +1,138 @@
+import glob
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import functions
+from cli import run_cohort
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDFS = sorted(glob.glob(os.path.join(REPO_ROOT, "output", "StrengthsProfile-*.pdf")))
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+NAMES = ["Amy Martin", "Jaime Zsiros"]
+
+
+@pytest.fixture
+def cohort(tmp_path, monkeypatch):
+    """A cohort folder with VIA profiles, the survey and finished workbooks for NAMES."""
+    monkeypatch.chdir(REPO_ROOT)
+    folder = tmp_path / "cohort"
+    folder.mkdir()
+    csv_path = folder / "conflict.csv"
+    shutil.copyfile(SAMPLE_CONFLICT_CSV, csv_path)
+    participants = []
+    for name in NAMES:
+        via_pdf = folder / f"StrengthsProfile-{name.replace(' ', '-')}.pdf"
+        shutil.copyfile(os.path.join(REPO_ROOT, "output", via_pdf.name), via_pdf)
+        workbook = functions.workbook_output_path(str(folder), name)
+        with open(workbook, "wb") as f:
+            f.write(b"%PDF-1.4\n%%EOF\n")
+        participants.append({"name": name, "via_pdf": str(via_pdf), "workbook": workbook})
+    return folder, str(csv_path), participants
+
+
+def _manifest(folder, csv_path, term="Winter 2025"):
+    return functions.CohortManifest(
+        str(folder), term, "A", functions.WORKBOOK_TEMPLATES["Open"],
+        [functions.CONFLICT_TEMPLATE_DOCX, functions.SWEET_SPOT_TEMPLATE_DOCX], csv_path,
+    )
+
+
+def _record_all(folder, csv_path, participants):
+    manifest = _manifest(folder, csv_path)
+    to_build, reused = manifest.split([dict(p) for p in participants])
+    manifest.record(to_build, [{"name": p["name"], "workbook": p["workbook"]} for p in to_build])
+    manifest.save()
+
+
+def _rebuilt(folder, csv_path, participants, **options):
+    to_build, _ = _manifest(folder, csv_path, **options).split([dict(p) for p in participants])
+    return [p["name"] for p in to_build]
+
+
+def test_unchanged_cohort_is_reused(cohort):
+    folder, csv_path, participants = cohort
+    assert _rebuilt(folder, csv_path, participants) == NAMES
+    _record_all(folder, csv_path, participants)
+    assert _rebuilt(folder, csv_path, participants) == []
+
+
+def test_changed_survey_row_rebuilds_only_that_participant(cohort):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    df = pd.read_csv(csv_path)
+    df.loc[df["First and Last Name"] == "Jaime Zsiros", "Timestamp"] = "1/1/2025 9:00:00"
+    df.to_csv(csv_path, index=False)
+    assert _rebuilt(folder, csv_path, participants) == ["Jaime Zsiros"]
+
+
+def test_changed_via_profile_rebuilds_only_that_participant(cohort):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    with open(participants[0]["via_pdf"], "ab") as f:
+        f.write(b"\n% re-exported\n")
+    assert _rebuilt(folder, csv_path, participants) == ["Amy Martin"]
+
+
+def test_other_term_is_a_separate_manifest(cohort):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    assert _rebuilt(folder, csv_path, participants, term="Spring 2025") == NAMES
+
+
+def test_incomplete_workbook_is_rebuilt(cohort):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    with open(participants[1]["workbook"], "wb") as f:
+        f.write(b"%PDF-1.4\n")
+    assert _rebuilt(folder, csv_path, participants) == ["Jaime Zsiros"]
+
+
+def test_failed_workbooks_are_not_recorded(cohort):
+    folder, csv_path, participants = cohort
+    manifest = _manifest(folder, csv_path)
+    to_build, _ = manifest.split([dict(p) for p in participants])
+    manifest.record(to_build, [{"name": "Amy Martin", "workbook": participants[0]["workbook"]},
+                               {"name": "Jaime Zsiros", "workbook": None}])
+    manifest.save()
+    assert _rebuilt(folder, csv_path, participants) == ["Jaime Zsiros"]
+
+
+def test_manifest_from_another_version_is_ignored(cohort, monkeypatch):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    monkeypatch.setattr(functions.CohortManifest, "VERSION", functions.CohortManifest.VERSION + 1)
+    assert _rebuilt(folder, csv_path, participants) == NAMES
+
+
+def test_reused_workbook_is_linked_into_the_new_folder(cohort, tmp_path):
+    folder, csv_path, participants = cohort
+    _record_all(folder, csv_path, participants)
+    manifest = _manifest(folder, csv_path)
+    _, reused = manifest.split([dict(p) for p in participants])
+    new_folder = tmp_path / "rerun"
+    new_folder.mkdir()
+    target = manifest.reuse(reused[0], str(new_folder))
+    assert target == functions.workbook_output_path(str(new_folder), reused[0]["name"])
+    assert functions.workbook_is_complete(target)
+
+
+def test_incremental_rerun_reuses_every_workbook(cohort, fake_soffice, tmp_path, monkeypatch):
+    folder, csv_path, participants = cohort
+    monkeypatch.setattr(functions, "RENDER_CACHE_ENABLED", False)
+    monkeypatch.setattr(functions, "BATCH_SLOT_DIR", str(tmp_path / "slots"))
+    output_folder = str(tmp_path / "out")
+    via_folder = tmp_path / "via"
+    via_folder.mkdir()
+    for path in SAMPLE_VIA_PDFS:
+        shutil.copy(path, via_folder)
+
+    first = run_cohort(str(via_folder), csv_path, "Winter 2025", "A",
+                       output_folder=output_folder, jobs=1, incremental=True)
+    second = run_cohort(str(via_folder), csv_path, "Winter 2025", "A",
+                        output_folder=output_folder, jobs=1, incremental=True)
+
+    assert {entry["status"] for entry in first["matched"]} == {"generated"}
+    assert {entry["status"] for entry in second["matched"]} == {"reused"}
@@ -0,0 +1,60 @@
+from functions import _min_cost_assignment, match_names
+
+
+def test_similar_names_each_get_their_own_pdf():
+    matched, missing_pdf, missing_csv = match_names(
+        {"Jon Smith", "John Smith"},
+        {"a.pdf": "John Smith", "b.pdf": "Jon Smith"},
+    )
+    assert sorted(matched) == [("John Smith", "John Smith", "a.pdf"), ("Jon Smith", "Jon Smith", "b.pdf")]
+    assert missing_pdf == []
+    assert missing_csv == []
+
+
+def test_more_csv_names_than_pdfs_in_a_component():
+    matched, missing_pdf, missing_csv = match_names(
+        {"Jon Smith", "John Smith", "Jonn Smith"},
+        {"x.pdf": "John Smith"},
+    )
+    assert matched == [("John Smith", "John Smith", "x.pdf")]
+    assert missing_pdf == ["Jon Smith", "Jonn Smith"]
+    assert missing_csv == []
+
+
+def test_more_pdfs_than_csv_names_in_a_component():
+    matched, missing_pdf, missing_csv = match_names(
+        {"John Smith"},
+        {"a.pdf": "Jon Smith", "b.pdf": "John Smith", "c.pdf": "Johnn Smith"},
+    )
+    assert matched == [("John Smith", "John Smith", "b.pdf")]
+    assert missing_pdf == []
+    assert missing_csv == ["Jon Smith", "Johnn Smith"]
+
+
+def test_empty_inputs():
+    assert match_names([], {}) == ([], [], [])
+    assert match_names(["Ada Lovelace"], {}) == ([], ["Ada Lovelace"], [])
+    assert match_names([], {"a.pdf": "Ada Lovelace"}) == ([], [], ["Ada Lovelace"])
+
+
+def test_pairs_below_the_threshold_are_not_matched():
+    # fuzz.ratio("alice walker", "alicia warner") is 72.
+    csv_names = {"Alice Walker"}
+    pdf_names = {"a.pdf": "Alicia Warner"}
+    assert match_names(csv_names, pdf_names) == ([], ["Alice Walker"], ["Alicia Warner"])
+    assert match_names(csv_names, pdf_names, threshold=70)[0] == [("Alice Walker", "Alicia Warner", "a.pdf")]
+
+
+def test_names_are_normalized_before_scoring():
+    matched, _, _ = match_names({"José  O'Neil"}, {"a.pdf": "jose oneil"})
+    assert matched == [("José  O'Neil", "jose oneil", "a.pdf")]
+
+
+def test_min_cost_assignment_beats_greedy():
+    # Greedy would take (0, 0) at cost 1 and then (1, 1) at cost 4.
+    assert _min_cost_assignment([[1, 2], [2, 4]]) == {0: 1, 1: 0}
+
+
+def test_min_cost_assignment_rectangular():
+    assert _min_cost_assignment([[5, 1, 3]]) == {0: 1}
+    assert _min_cost_assignment([[4, 1, 3], [2, 0, 5]]) == {0: 1, 1: 0}
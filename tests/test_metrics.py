@@ -0,0 +1,70 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import app3
+import functions
+
+
+def _snapshot(hits):
+    return {"stages": [], "counters": [["workbook_cache_hits_total", "via_parse", "", "", hits]]}
+
+
+def _write(folder, name, hits):
+    with open(os.path.join(folder, name), "w") as f:
+        json.dump(_snapshot(hits), f)
+
+
+def _exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def metrics_folder(monkeypatch, tmp_path):
+    folder = tmp_path / "metrics"
+    folder.mkdir()
+    monkeypatch.setattr(app3, "METRICS_FOLDER", str(folder))
+    monkeypatch.setattr(app3, "RETIRED_METRICS_FILE", str(folder / "retired.json"))
+    monkeypatch.setattr(app3, "_worker_metrics_files", {})
+    monkeypatch.setattr(functions, "_counters", {})
+    monkeypatch.setattr(functions, "_stage_timings", {})
+    return str(folder)
+
+
+def test_files_of_exited_workers_are_folded_into_one(metrics_folder):
+    dead_pid = _exited_pid()
+    live_pid = os.getppid()
+    _write(metrics_folder, f"{dead_pid}-100.json", 1)
+    _write(metrics_folder, f"{live_pid}-100.json", 2)  # pid since reused by a newer worker
+    _write(metrics_folder, f"{live_pid}-200.json", 4)
+    _write(metrics_folder, f"{os.getpid()}-50.json", 8)  # an earlier worker with this pid
+
+    assert app3.retire_worker_metrics() == 3
+    assert sorted(os.listdir(metrics_folder)) == [".lock", f"{live_pid}-200.json", "retired.json"]
+    with open(app3.RETIRED_METRICS_FILE) as f:
+        assert json.load(f) == _snapshot(11)
+
+
+def test_retiring_again_adds_to_the_retired_totals(metrics_folder):
+    _write(metrics_folder, f"{_exited_pid()}-1.json", 1)
+    app3.retire_worker_metrics()
+    _write(metrics_folder, f"{_exited_pid()}-2.json", 5)
+    app3.retire_worker_metrics()
+    with open(app3.RETIRED_METRICS_FILE) as f:
+        assert json.load(f) == _snapshot(6)
+    assert app3.retire_worker_metrics() == 0
+
+
+def test_scrape_counts_retired_and_live_workers(metrics_folder):
+    _write(metrics_folder, f"{_exited_pid()}-1.json", 3)
+    app3.retire_worker_metrics()
+    _write(metrics_folder, f"{os.getppid()}-1.json", 4)
+    functions.increment("workbook_cache_hits_total", 5, label="via_parse")
+
+    response = app3.app.test_client().get("/metrics")
+    assert 'workbook_cache_hits_total{cache="via_parse",template="",mode=""} 12' in response.get_data(as_text=True)
@@ -0,0 +1,92 @@
+import os
+
+import pytest
+
+import functions
+
+CONTEXT = {"name": "Amy Martin", "date": "Winter 2025", "cohort": "A"}
+
+
+@pytest.fixture
+def cache_dir(monkeypatch, tmp_path):
+    path = tmp_path / "render_cache"
+    monkeypatch.setattr(functions, "RENDER_CACHE_ENABLED", True)
+    monkeypatch.setattr(functions, "RENDER_CACHE_DIR", str(path))
+    monkeypatch.setattr(functions, "_render_cache_bytes", None)
+    monkeypatch.setattr(functions, "render_cache_stats", {"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+    return path
+
+
+@pytest.fixture
+def template(tmp_path):
+    path = tmp_path / "cover.docx"
+    path.write_bytes(b"template v1")
+    return path
+
+
+def test_key_ignores_context_order(template):
+    reordered = dict(reversed(list(CONTEXT.items())))
+    assert functions.render_cache_key(str(template), CONTEXT) == functions.render_cache_key(str(template), reordered)
+
+
+def test_key_changes_with_every_input(template, monkeypatch):
+    key = functions.render_cache_key(str(template), CONTEXT)
+    assert functions.render_cache_key(str(template), {**CONTEXT, "cohort": "B"}) != key
+
+    monkeypatch.setattr(functions, "WORKBOOK_RENDERER", "stamp")
+    assert functions.render_cache_key(str(template), CONTEXT) != key
+    monkeypatch.undo()
+
+    template.write_bytes(b"template v2, edited")
+    assert functions.render_cache_key(str(template), CONTEXT) != key
+
+
+def test_miss_then_hit(cache_dir):
+    assert functions.render_cache_get("ab" * 32) is None
+    functions.render_cache_put("ab" * 32, b"%PDF-1.4 page")
+    assert functions.render_cache_get("ab" * 32) == b"%PDF-1.4 page"
+    assert functions.render_cache_stats == {"hits": 1, "misses": 1, "stores": 1, "evictions": 0}
+
+
+def test_disabled_cache_stores_nothing(cache_dir, monkeypatch):
+    monkeypatch.setattr(functions, "RENDER_CACHE_ENABLED", False)
+    functions.render_cache_put("ab" * 32, b"%PDF-1.4 page")
+    assert functions.render_cache_get("ab" * 32) is None
+    assert not cache_dir.exists()
+
+
+def test_least_recently_used_entries_are_evicted(cache_dir, monkeypatch):
+    monkeypatch.setattr(functions, "RENDER_CACHE_MAX_BYTES", 350)
+    keys = [f"{i:02d}" * 32 for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        functions.render_cache_put(key, b"x" * 100)
+        path = functions._render_cache_path(key)
+        os.utime(path, (os.path.getmtime(path) - age,) * 2)
+    # Reading the oldest entry makes it the most recently used.
+    assert functions.render_cache_get(keys[0]) is not None
+
+    functions.render_cache_put("ff" * 32, b"x" * 100)
+
+    # Over the cap, the least recently used entries go until it is 90% full.
+    assert [functions.render_cache_get(key) is not None for key in keys] == [True, False, True]
+    assert functions.render_cache_get("ff" * 32) is not None
+    assert functions.render_cache_stats["evictions"] == 1
+
+
+def test_cached_pages_are_not_rendered_again(cache_dir, template, monkeypatch):
+    conversions = []
+
+    def convert(docx_bytes, name="document"):
+        conversions.append(name)
+        return b"%PDF-1.4 " + name.encode()
+
+    monkeypatch.setattr(functions, "get_stamp_template", lambda template_path: None)
+    monkeypatch.setattr(functions, "render_docx_bytes", lambda template_path, context: b"docx")
+    monkeypatch.setattr(functions, "convert_docx_bytes_to_pdf", convert)
+
+    first = functions.render_template_pdf(str(template), CONTEXT, "Cover")
+    assert functions.render_template_pdf(str(template), dict(CONTEXT), "Cover") == first
+    assert conversions == ["Cover"]
+
+    functions.render_template_pdf(str(template), {**CONTEXT, "name": "Jaime Zsiros"}, "Cover")
+    assert conversions == ["Cover", "Cover"]
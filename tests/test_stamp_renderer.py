@@ -0,0 +1,118 @@
+import os
+import shutil
+from collections import Counter
+
+import pytest
+
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDF = os.path.join(REPO_ROOT, "output", "StrengthsProfile-Amy-Martin.pdf")
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+
+# Points a word may move between the DOCX and stamp renderings.
+BASELINE_TOLERANCE = 3
+STATIC_X_TOLERANCE = 1.5
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which("soffice") or shutil.which("libreoffice")),
+    reason="LibreOffice is needed to compile the templates",
+)
+
+
+def _sweet_spot_context():
+    person_name, results = functions.parse_via_pdf_fast(SAMPLE_VIA_PDF)
+    return functions.build_sweet_spot_context(results, functions.STRENGTH_DATA, person_name)
+
+
+TEMPLATE_CONTEXTS = {
+    "cover": (
+        functions.COVER_TEMPLATE_DOCX,
+        lambda: functions.build_cover_context("Maria Fernanda Lopez-Garcia", "Winter 2025", "Spring Cohort 2025"),
+    ),
+    "sweet_spot": (functions.SWEET_SPOT_TEMPLATE_DOCX, _sweet_spot_context),
+    "conflict": (
+        functions.CONFLICT_TEMPLATE_DOCX,
+        lambda: functions.conflict_context_for_one(SAMPLE_CONFLICT_CSV, "Amy Martin"),
+    ),
+}
+
+
+def _page_words(pdf):
+    import fitz
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        return [page.get_text("words") for page in doc]
+
+
+def _static_words(words, value_words):
+    """Words on lines that hold no context value, so nothing should move them."""
+    lines = {}
+    for word in words:
+        lines.setdefault((word[5], word[6]), []).append(word)
+    return [
+        word
+        for line in lines.values()
+        if not any(w[4] in value_words for w in line)
+        for word in line
+    ]
+
+
+def _overlap(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    return width > 1 and height > 1
+
+
+@pytest.fixture(autouse=True)
+def stamp_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(functions, "STAMP_DIR", str(tmp_path / "stamps"))
+
+
+@pytest.mark.parametrize("template", sorted(TEMPLATE_CONTEXTS))
+def test_stamp_output_matches_docx_output(template):
+    template_path, build_context = TEMPLATE_CONTEXTS[template]
+    context = build_context()
+    stamp = functions.compile_stamp_template(template_path)
+    assert stamp is not None, f"{template_path} could not be compiled"
+
+    docx_pages = _page_words(
+        functions.convert_docx_bytes_to_pdf(functions.render_docx_bytes(template_path, context), template)
+    )
+    stamp_pages = _page_words(functions.stamp_template_pdf(stamp, context))
+    assert len(stamp_pages) == len(docx_pages)
+
+    value_words = {word for value in context.values() for word in str(value).split()}
+    for page_number, (docx_words, stamp_words) in enumerate(zip(docx_pages, stamp_pages)):
+        # Same text on every page.
+        assert Counter(w[4] for w in stamp_words) == Counter(w[4] for w in docx_words), page_number
+
+        # Every word sits on the baseline LibreOffice gave it.
+        for word in docx_words:
+            assert any(
+                w[4] == word[4] and abs(w[3] - word[3]) <= BASELINE_TOLERANCE for w in stamp_words
+            ), f"page {page_number}: {word[4]!r} at {word[:4]} moved"
+
+        # Static text keeps its position exactly.
+        for word in _static_words(docx_words, value_words):
+            assert any(
+                w[4] == word[4]
+                and abs(w[0] - word[0]) <= STATIC_X_TOLERANCE
+                and abs(w[3] - word[3]) <= STATIC_X_TOLERANCE
+                for w in stamp_words
+            ), f"page {page_number}: static {word[4]!r} at {word[:4]} moved"
+
+        # Stamped values never run over other text.
+        for i, a in enumerate(stamp_words):
+            for b in stamp_words[i + 1:]:
+                assert not _overlap(a, b), f"page {page_number}: {a[4]!r} overlaps {b[4]!r}"
+
+
+def test_compiled_template_is_reused(monkeypatch):
+    stamp = functions.compile_stamp_template(functions.COVER_TEMPLATE_DOCX)
+    monkeypatch.setattr(functions, "convert_docx_bytes_to_pdf", lambda *a, **k: pytest.fail("converted again"))
+    again = functions.compile_stamp_template(functions.COVER_TEMPLATE_DOCX)
+    assert again["pdf"] == stamp["pdf"]
+    assert again["fields"] == stamp["fields"]
+    assert again["fonts"] == stamp["fonts"]
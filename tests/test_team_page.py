@@ -0,0 +1,119 @@
+import glob
+import os
+import random
+import statistics
+
+import pytest
+
+import functions
+from cli import run_cohort
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDFS = sorted(glob.glob(os.path.join(REPO_ROOT, "output", "StrengthsProfile-*.pdf")))
+SAMPLE_CONFLICT_CSV = os.path.join(REPO_ROOT, "output", "batch_conflict.csv")
+STYLE_KEYS = functions.CONFLICT_STYLE_KEYS
+
+
+@pytest.fixture
+def cohort():
+    """Five shuffled rankings (one missing a strength, one in lower case) and conflict scores with a tie."""
+    rng = random.Random(7)
+    strength_lists = []
+    for _ in range(5):
+        names = list(functions.STRENGTH_DATA)
+        rng.shuffle(names)
+        strength_lists.append([(rank, name) for rank, name in enumerate(names, start=1)])
+    strength_lists[1] = strength_lists[1][:-1]
+    strength_lists[2] = [(rank, name.lower()) for rank, name in strength_lists[2]]
+    totals = [(12, 9, 6, 7, 5), (6, 10, 10, 4, 8), (6, 6, 6, 6, 6), (9, 7, 5, 8, 9), (8, 6, 11, 3, 12)]
+    conflict_contexts = [
+        {"name": f"Person {i}", **{key: total for key, total in zip(STYLE_KEYS.values(), row)}}
+        for i, row in enumerate(totals)
+    ]
+    return strength_lists, conflict_contexts
+
+
+def test_strength_statistics_match_a_per_participant_count(cohort):
+    strength_lists, conflict_contexts = cohort
+    analytics = functions.cohort_analytics(strength_lists, conflict_contexts)
+
+    assert analytics["participants"] == 5
+    by_name = {entry["strength"]: entry for entry in analytics["strengths"]}
+    assert sorted(by_name) == sorted(functions.STRENGTH_DATA)
+    for name, entry in by_name.items():
+        ranks = [rank for strengths in strength_lists for rank, strength in strengths if strength.title() == name]
+        assert entry["mean_rank"] == round(statistics.mean(ranks), 2), name
+        assert entry["median_rank"] == statistics.median(ranks), name
+        assert entry["top5_count"] == sum(rank <= functions.TEAM_TOP_STRENGTHS for rank in ranks), name
+        assert entry["bands"] == [
+            sum(low <= rank <= high for rank in ranks) for low, high in functions.TEAM_RANK_BANDS
+        ], name
+    means = [entry["mean_rank"] for entry in analytics["strengths"]]
+    assert means == sorted(means)
+
+
+def test_conflict_statistics_match_a_per_participant_count(cohort):
+    strength_lists, conflict_contexts = cohort
+    analytics = functions.cohort_analytics(strength_lists, conflict_contexts)
+
+    assert [entry["style"] for entry in analytics["conflict_styles"]] == list(STYLE_KEYS)
+    for entry in analytics["conflict_styles"]:
+        totals = [context[STYLE_KEYS[entry["style"]]] for context in conflict_contexts]
+        assert entry["mean"] == round(statistics.mean(totals), 2)
+        assert entry["median"] == statistics.median(totals)
+        # Ties count towards every tied style.
+        assert entry["top_style_count"] == sum(
+            context[STYLE_KEYS[entry["style"]]] == max(context[key] for key in STYLE_KEYS.values())
+            for context in conflict_contexts
+        )
+        assert entry["histogram"] == {str(total): totals.count(total) for total in set(totals)}
+
+
+def test_empty_cohort_has_no_statistics():
+    analytics = functions.cohort_analytics([], [])
+    assert analytics["participants"] == 0
+    assert all(entry["mean_rank"] is None and entry["top5_count"] == 0 for entry in analytics["strengths"])
+    assert all(entry["mean"] is None and entry["histogram"] == {} for entry in analytics["conflict_styles"])
+
+
+def test_team_page_is_reproducible_and_shows_the_cohort(cohort):
+    import fitz
+
+    analytics = functions.cohort_analytics(*cohort)
+    pdf = functions.render_team_page(analytics, "Winter 2025", "Cohort A")
+    assert functions.render_team_page(analytics, "Winter 2025", "Cohort A") == pdf
+
+    with fitz.open(stream=pdf, filetype="pdf") as doc:
+        assert len(doc) == 1
+        text = doc[0].get_text()
+    assert "Team Profile: Cohort A" in text
+    assert "5 participants" in text
+    for name in functions.STRENGTH_DATA:
+        assert name in text
+    for style in STYLE_KEYS:
+        assert style in text
+
+
+def test_team_workbooks_end_with_the_team_page(fake_soffice, tmp_path, monkeypatch):
+    import fitz
+
+    monkeypatch.chdir(REPO_ROOT)
+    monkeypatch.setattr(functions, "RENDER_CACHE_ENABLED", False)
+    monkeypatch.setattr(functions, "BATCH_SLOT_DIR", str(tmp_path / "slots"))
+    via_folder = tmp_path / "via"
+    via_folder.mkdir()
+    for path in SAMPLE_VIA_PDFS:
+        os.symlink(path, via_folder / os.path.basename(path))
+
+    summary = run_cohort(str(via_folder), SAMPLE_CONFLICT_CSV, "Winter 2025", "A", template="Team",
+                         output_folder=str(tmp_path / "out"), jobs=1)
+
+    assert summary["team_page"] and os.path.exists(summary["team_page"])
+    with open(summary["team_page"], "rb") as f:
+        team_pdf = f.read()
+    with fitz.open(stream=team_pdf, filetype="pdf") as doc:
+        team_text = doc[0].get_text()
+    assert f"{summary['counts']['matched']} participants" in team_text
+    for entry in summary["matched"]:
+        with fitz.open(entry["workbook"]) as doc:
+            assert doc[-1].get_text().startswith(team_text.split("\n")[0])
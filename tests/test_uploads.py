@@ -0,0 +1,105 @@
+import io
+import os
+
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+
+import app3
+
+
+@pytest.fixture
+def blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(app3, "BLOBS_FOLDER", str(tmp_path / "blobs"))
+    monkeypatch.setattr(app3, "BLOBS_TMP_FOLDER", str(tmp_path / "blobs" / "tmp"))
+    monkeypatch.setattr(app3, "WORKSPACES_FOLDER", str(tmp_path / "workspaces"))
+    (tmp_path / "blobs" / "tmp").mkdir(parents=True)
+    return tmp_path / "blobs"
+
+
+@pytest.fixture
+def batch_runs(monkeypatch):
+    """Replaces the batch pipeline with a record of what it was handed."""
+    runs = []
+
+    def run_batch(workspace_id, template_pdf, term, cohort, via_uploads, conflict_csv_path, progress=None,
+                  incremental=False):
+        runs.append({"via_uploads": via_uploads, "conflict_csv_path": conflict_csv_path})
+        return "done"
+
+    monkeypatch.setattr(app3, "run_batch", run_batch)
+    monkeypatch.setattr(app3, "ASYNC_JOBS_DEFAULT", "0")
+    return runs
+
+
+def _post_batch(via_files, csv=b"First and Last Name\nAmy Martin\n"):
+    return app3.app.test_client().post(
+        "/generate",
+        data={
+            "mode": "batch",
+            "template": "Open",
+            "batchDate": "Winter 2025",
+            "batchCohort": "A",
+            "conflictCSVBatch": (io.BytesIO(csv), "conflict.csv"),
+            "viaFiles": [(io.BytesIO(content), name) for name, content in via_files],
+        },
+        content_type="multipart/form-data",
+    )
+
+
+def _blob_files(blobs):
+    return sorted(
+        name for root, _, files in os.walk(blobs) if os.path.basename(root) != "tmp" for name in files
+    )
+
+
+def test_identical_uploads_share_one_blob(blobs):
+    paths = set()
+    for _ in range(2):
+        stream = app3.BlobUploadStream()
+        stream.write(b"%PDF same profile")
+        paths.add(stream.commit())
+    assert len(paths) == 1
+    assert len(_blob_files(blobs)) == 1
+    assert os.listdir(blobs / "tmp") == []
+
+
+def test_oversized_upload_is_refused_and_dropped(blobs, monkeypatch):
+    monkeypatch.setattr(app3, "UPLOAD_MAX_FILE_BYTES", 10)
+    stream = app3.BlobUploadStream()
+    stream.write(b"x" * 10)
+    with pytest.raises(RequestEntityTooLarge):
+        stream.write(b"x")
+    assert os.listdir(blobs / "tmp") == []
+
+
+def test_batch_uses_each_profile_once(blobs, batch_runs):
+    response = _post_batch([
+        ("Amy.pdf", b"%PDF Amy"),
+        ("Amy copy.pdf", b"%PDF Amy"),
+        ("profile.pdf", b"%PDF Jaime"),
+        ("profile.pdf", b"%PDF Christine"),
+    ])
+
+    assert response.status_code == 200
+    uploads = batch_runs[0]["via_uploads"]
+    assert [upload["filename"] for upload in uploads[:2]] == ["Amy.pdf", "profile.pdf"]
+    assert uploads[2]["filename"].endswith("_profile.pdf") and uploads[2]["filename"] != "profile.pdf"
+    assert len({upload["sha256"] for upload in uploads}) == 3
+    assert len(_blob_files(blobs)) == 4  # three profiles and the CSV
+
+
+def test_too_many_files_are_refused(blobs, batch_runs, monkeypatch):
+    monkeypatch.setattr(app3, "UPLOAD_MAX_FILES", 2)
+    response = _post_batch([(f"{i}.pdf", f"%PDF {i}".encode()) for i in range(3)])
+    assert response.status_code == 413
+    assert batch_runs == []
+    assert os.listdir(blobs / "tmp") == []
+    assert _blob_files(blobs) == []
+
+
+def test_oversized_file_in_a_request_is_refused(blobs, batch_runs, monkeypatch):
+    monkeypatch.setattr(app3, "UPLOAD_MAX_FILE_BYTES", 100)
+    response = _post_batch([("big.pdf", b"x" * 101)])
+    assert response.status_code == 413
+    assert batch_runs == []
+    assert os.listdir(blobs / "tmp") == []
@@ -0,0 +1,27 @@
+import glob
+import os
+
+import pytest
+
+from functions import parse_via_pdf, parse_via_pdf_fast
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDFS = sorted(glob.glob(os.path.join(REPO_ROOT, "output", "StrengthsProfile-*.pdf")))
+
+
+def test_sample_via_pdfs_are_present():
+    assert SAMPLE_VIA_PDFS
+
+
+@pytest.mark.parametrize("pdf_path", SAMPLE_VIA_PDFS, ids=os.path.basename)
+def test_fast_parser_matches_full_parser(pdf_path):
+    person_name, results = parse_via_pdf_fast(pdf_path)
+    assert (person_name, results) == parse_via_pdf(pdf_path)
+    assert not person_name.startswith("<image")
+    assert [rank for rank, _ in results] == list(range(1, 25))
+
+
+@pytest.mark.parametrize("pdf_path", SAMPLE_VIA_PDFS[:1], ids=os.path.basename)
+def test_fast_parser_accepts_pdf_bytes(pdf_path):
+    with open(pdf_path, "rb") as f:
+        assert parse_via_pdf_fast(f.read()) == parse_via_pdf_fast(pdf_path)
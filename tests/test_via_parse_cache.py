@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import functions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VIA_PDF = os.path.join(REPO_ROOT, "output", "StrengthsProfile-Amy-Martin.pdf")
+
+
+@pytest.fixture
+def parse_calls(monkeypatch, tmp_path):
+    """Empty memory and disk caches, and a record of every real parse."""
+    calls = []
+    real_parse = functions.parse_via_pdf_fast
+
+    def counting_parse(pdf_path):
+        calls.append(pdf_path)
+        return real_parse(pdf_path)
+
+    monkeypatch.setattr(functions, "parse_via_pdf_fast", counting_parse)
+    monkeypatch.setattr(functions, "VIA_PARSE_CACHE_DIR", str(tmp_path / "via_cache"))
+    monkeypatch.setattr(functions, "_via_parse_cache", functions.OrderedDict())
+    return calls
+
+
+def test_miss_then_hit(parse_calls):
+    first = functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)
+    second = functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)
+    assert first == second
+    assert first[0] == "Amy Martin"
+    assert parse_calls == [SAMPLE_VIA_PDF]
+
+
+def test_identical_bytes_under_another_name_reuse_the_entry(parse_calls, tmp_path):
+    copy = tmp_path / "renamed.pdf"
+    shutil.copyfile(SAMPLE_VIA_PDF, copy)
+    functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)
+    assert functions.parse_via_pdf_cached(str(copy))[0] == "Amy Martin"
+    assert parse_calls == [SAMPLE_VIA_PDF]
+
+
+def test_known_hash_skips_hashing(parse_calls, monkeypatch):
+    sha256 = functions._file_sha256(SAMPLE_VIA_PDF)
+    functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)
+    monkeypatch.setattr(functions, "_file_sha256", lambda path: pytest.fail("hashed again"))
+    assert functions.parse_via_pdf_cached(SAMPLE_VIA_PDF, sha256=sha256)[0] == "Amy Martin"
+    assert len(parse_calls) == 1
+
+
+def test_disk_entry_survives_a_cleared_memory_cache(parse_calls, monkeypatch):
+    functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)
+    monkeypatch.setattr(functions, "_via_parse_cache", functions.OrderedDict())
+    assert functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)[0] == "Amy Martin"
+    assert len(parse_calls) == 1
+
+
+def test_entries_from_an_older_parser_are_ignored(parse_calls):
+    sha256 = functions._file_sha256(SAMPLE_VIA_PDF)
+    os.makedirs(functions.VIA_PARSE_CACHE_DIR)
+    stale = {"person_name": "<image: DeviceRGB, width: 502, height: 108, bpc: 8>", "results": []}
+    for file_name in (f"{sha256}.json", f"{sha256}-v{functions.VIA_PARSER_VERSION}.json"):
+        with open(os.path.join(functions.VIA_PARSE_CACHE_DIR, file_name), "w") as f:
+            json.dump(stale, f)
+
+    assert functions.parse_via_pdf_cached(SAMPLE_VIA_PDF)[0] == "Amy Martin"
+    assert parse_calls == [SAMPLE_VIA_PDF]
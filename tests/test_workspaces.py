@@ -0,0 +1,109 @@
+import os
+
+import pytest
+
+import app3
+
+NOW = 1_000_000_000
+TTL = 100
+STALE = 1000
+
+
+@pytest.fixture
+def folders(tmp_path, monkeypatch):
+    monkeypatch.setattr(app3, "WORKSPACES_FOLDER", str(tmp_path / "workspaces"))
+    monkeypatch.setattr(app3, "JOBS_FOLDER", str(tmp_path / "jobs"))
+    monkeypatch.setattr(app3, "BLOBS_FOLDER", str(tmp_path / "blobs"))
+    monkeypatch.setattr(app3, "BLOBS_TMP_FOLDER", str(tmp_path / "blobs" / "tmp"))
+    monkeypatch.setattr(app3, "WORKSPACE_TTL_SECONDS", TTL)
+    monkeypatch.setattr(app3, "WORKSPACE_STALE_SECONDS", STALE)
+    monkeypatch.setattr(app3, "WORKSPACE_QUOTA_BYTES", 10 ** 9)
+    for folder in ("workspaces", "jobs", "blobs/tmp"):
+        (tmp_path / folder).mkdir(parents=True)
+    return tmp_path
+
+
+def _workspace(size=10, last_used=None, created=NOW):
+    """A workspace holding `size` bytes, finished at `last_used` (None: still running)."""
+    workspace_id = app3.create_workspace()
+    with open(app3.workspace_path(workspace_id, "workbook.pdf"), "wb") as f:
+        f.write(b"x" * size)
+    if last_used is not None:
+        app3.finish_workspace(workspace_id)
+        os.utime(app3.workspace_path(workspace_id, app3.WORKSPACE_FINISHED_MARKER), (last_used, last_used))
+    os.utime(app3.workspace_path(workspace_id), (created, created))
+    return workspace_id
+
+
+def _remaining():
+    return sorted(os.listdir(app3.WORKSPACES_FOLDER))
+
+
+def test_expired_and_abandoned_workspaces_are_evicted(folders):
+    _workspace(size=30, last_used=NOW - TTL - 1)
+    recent = _workspace(last_used=NOW - TTL + 1)
+    running = _workspace(created=NOW - STALE + 1)
+    _workspace(size=20, created=NOW - STALE - 1)
+
+    assert app3.evict_workspaces(now=NOW) == {"evicted": 2, "bytes_freed": 50}
+    assert _remaining() == sorted([recent, running])
+
+
+def test_least_recently_used_workspaces_go_when_over_quota(folders, monkeypatch):
+    monkeypatch.setattr(app3, "WORKSPACE_QUOTA_BYTES", 25)
+    _workspace(last_used=NOW - 30)
+    middle = _workspace(last_used=NOW - 20)
+    newest = _workspace(last_used=NOW - 10)
+    running = _workspace(size=100)
+
+    assert app3.evict_workspaces(now=NOW)["evicted"] == 1
+    assert _remaining() == sorted([middle, newest, running])
+
+
+def test_downloads_keep_a_workspace_alive(folders):
+    workspace_id = _workspace(last_used=NOW - TTL - 1)
+    app3.touch_workspace(workspace_id)
+    assert app3.evict_workspaces()["evicted"] == 0
+
+
+def test_eviction_removes_the_job_files(folders):
+    workspace_id = _workspace(last_used=NOW - TTL - 1)
+    for path in (app3.job_state_path(workspace_id), app3.job_report_path(workspace_id)):
+        open(path, "w").close()
+    app3.evict_workspaces(now=NOW)
+    assert os.listdir(app3.JOBS_FOLDER) == []
+
+
+def test_other_folders_are_left_alone(folders):
+    os.makedirs(os.path.join(app3.WORKSPACES_FOLDER, "not-a-workspace"))
+    os.utime(os.path.join(app3.WORKSPACES_FOLDER, "not-a-workspace"), (0, 0))
+    assert app3.evict_workspaces(now=NOW)["evicted"] == 0
+    assert _remaining() == ["not-a-workspace"]
+
+
+def test_a_failed_job_still_finishes_its_workspace(folders):
+    workspace_id = app3.create_workspace()
+
+    def failing_job(progress=None):
+        raise RuntimeError("LibreOffice crashed")
+
+    with pytest.raises(RuntimeError):
+        app3.workspace_job(failing_job, workspace_id)()
+    assert os.path.exists(app3.workspace_path(workspace_id, app3.WORKSPACE_FINISHED_MARKER))
+
+
+def test_old_blobs_and_stale_partial_uploads_are_evicted(folders):
+    def blob(folder, name, age):
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        os.utime(path, (NOW - age, NOW - age))
+        return path
+
+    blob(app3.BLOBS_FOLDER, "old", TTL + 1)
+    fresh = blob(app3.BLOBS_FOLDER, "fresh", TTL - 1)
+    blob(app3.BLOBS_TMP_FOLDER, "abandoned", STALE + 1)
+    uploading = blob(app3.BLOBS_TMP_FOLDER, "uploading", TTL + 1)
+
+    assert app3.evict_blobs(now=NOW) == {"evicted": 2, "bytes_freed": 20}
+    assert os.path.exists(fresh) and os.path.exists(uploading)